@@ -0,0 +1,67 @@
+from typing import Any, Dict, List, Tuple
+
+from config import BOUNDARY_CHAIN_DEPTH, BOUNDARY_SEARCH_LIMIT, START_SYNC_MARKER
+
+# Blocks are handed to workers as nominal byte ranges; each worker moves both
+# ends onto real frames with aligned_cut(). The function only depends on the
+# buffer and the cut, so the worker ending a block and the worker starting
+# the next one agree on the cut without any serial prescan in the parent.
+
+
+def split_range(first: int, last: int, block_size: int) -> List[Tuple[int, int]]:
+    """Nominal blocks covering [first, last)."""
+    return [(start, min(start + block_size, last)) for start in range(first, last, max(block_size, 1))]
+
+
+def frame_chain(buf: Any, pos: int, lengths: Dict[int, int], depth: int = BOUNDARY_CHAIN_DEPTH) -> bool:
+    """
+    True if *depth* frames follow each other from *pos*: each starts with
+    the marker and a known type, and the next one starts FMT Length later.
+    A chain that runs into the end of the buffer counts as confirmed.
+    """
+    size = len(buf)
+    for _ in range(depth):
+        if pos >= size:
+            return True
+        if pos + 3 > size or buf[pos : pos + 2] != START_SYNC_MARKER:
+            return False
+        length = lengths.get(buf[pos + 2])
+        if not length:
+            return False
+        pos += length
+    return True
+
+
+def aligned_cut(
+    buf: Any,
+    cut: int,
+    lengths: Dict[int, int],
+    depth: int = BOUNDARY_CHAIN_DEPTH,
+    limit: int = BOUNDARY_SEARCH_LIMIT,
+) -> int:
+    """
+    First offset at or after *cut* where a chain of *depth* frames starts,
+    so a marker inside a payload is never taken for a block start.
+    The search stops *limit* bytes after the cut (a corrupt region) and
+    returns that offset: still the same answer for both neighbours.
+    """
+    size = len(buf)
+    if cut <= 0:
+        return 0
+    if cut >= size:
+        return size
+
+    stop = min(size, cut + limit)
+    pos = cut
+    while True:
+        pos = buf.find(START_SYNC_MARKER, pos, stop)
+        if pos == -1:
+            return stop
+        if frame_chain(buf, pos, lengths, depth):
+            return pos
+        pos += 1
+
+
+def align_block(buf: Any, start: int, end: int, lengths: Dict[int, int]) -> Tuple[int, int]:
+    """The nominal block [start, end) moved onto confirmed frames at both ends."""
+    return aligned_cut(buf, start, lengths), aligned_cut(buf, end, lengths)
@@ -0,0 +1,193 @@
+import json
+import mmap
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # optional dependency
+    pa = None  # type: ignore[assignment]
+    feather = None  # type: ignore[assignment]
+
+from config import COLUMN_CACHE_SUFFIX, MAX_WORKERS
+from business_logic.columnar import Columns, gather_columns, np, require_numpy
+from business_logic.log_index import LogIndex, file_key
+
+# cache_dir/manifest.json  {"version", "format", "source": {size, mtime_ns, digest}, "types": {name: {rows, columns}}}
+# cache_dir/<TYPE>.arrow   one Arrow IPC (Feather v2, uncompressed) file per type, or
+# cache_dir/<TYPE>/<col>.npy  one .npy per column when pyarrow is not available
+_VERSION = 1
+_MANIFEST = "manifest.json"
+
+
+def default_cache_dir(path: str) -> str:
+    return os.path.abspath(path) + COLUMN_CACHE_SUFFIX
+
+
+def _source_key(path: str) -> Dict[str, Any]:
+    size, mtime_ns, digest = file_key(path)
+    return {"size": size, "mtime_ns": mtime_ns, "digest": digest.hex()}
+
+
+def _to_arrow(columns: Columns) -> "pa.Table":
+    arrays = []
+    for values in columns.values():
+        if values.ndim == 2 and values.dtype == np.uint8:  # binary field
+            width = values.shape[1]
+            buf = pa.py_buffer(np.ascontiguousarray(values))
+            arrays.append(pa.Array.from_buffers(pa.binary(width), len(values), [None, buf]))
+        elif values.ndim == 2:  # int16[32] array field
+            arrays.append(pa.FixedSizeListArray.from_arrays(pa.array(values.reshape(-1)), values.shape[1]))
+        else:
+            arrays.append(pa.array(values))
+    return pa.Table.from_arrays(arrays, names=list(columns))
+
+
+def _from_arrow(table: "pa.Table") -> Columns:
+    """NumPy views over a memory-mapped table (strings are the only copies)."""
+    columns: Columns = {}
+    for name, chunked in zip(table.column_names, table.columns):
+        arr = chunked.chunk(0) if chunked.num_chunks == 1 else chunked.combine_chunks()
+        if pa.types.is_fixed_size_binary(arr.type):
+            width = arr.type.byte_width
+            data = np.frombuffer(arr.buffers()[1], dtype=np.uint8)
+            values = data[arr.offset * width : (arr.offset + len(arr)) * width].reshape(-1, width)
+        elif pa.types.is_fixed_size_list(arr.type):
+            values = arr.flatten().to_numpy().reshape(-1, arr.type.list_size)
+        elif pa.types.is_string(arr.type):
+            values = arr.to_numpy(zero_copy_only=False).astype(str)
+        else:
+            values = arr.to_numpy()
+        columns[name] = values
+    return columns
+
+
+class ColumnCache:
+    """
+    Parsed columns of a log, written once per message type and reloaded by
+    memory-mapping instead of reparsing. Values are stored as recv_columns()
+    returns them: correct dtypes, strings decoded, L / CHAR_TO_DIVIDE
+    scaling applied. Arrow IPC files are written when pyarrow is installed,
+    otherwise one .npy file per column (.npz archives cannot be mapped).
+    """
+
+    def __init__(self, cache_dir: str, manifest: Dict[str, Any]):
+        self.cache_dir = cache_dir
+        self.manifest = manifest
+
+    @property
+    def types(self) -> List[str]:
+        return sorted(self.manifest["types"])
+
+    def rows(self, msg_name: str) -> int:
+        return self._entry(msg_name)["rows"]
+
+    def columns(self, msg_name: str) -> Columns:
+        """Columns of *msg_name*, memory-mapped from the cache."""
+        entry = self._entry(msg_name)
+        if self.manifest["format"] == "arrow":
+            table = feather.read_table(os.path.join(self.cache_dir, msg_name + ".arrow"), memory_map=True)
+            return _from_arrow(table)
+        type_dir = os.path.join(self.cache_dir, msg_name)
+        return {col: np.load(os.path.join(type_dir, col + ".npy"), mmap_mode="r") for col in entry["columns"]}
+
+    def _entry(self, msg_name: str) -> Dict[str, Any]:
+        entry = self.manifest["types"].get(msg_name)
+        if entry is None:
+            raise ValueError(f"Unknown message type: {msg_name}")
+        return entry
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        cache_dir: Optional[str] = None,
+        msg_names: Optional[Iterable[str]] = None,
+        max_workers: int = MAX_WORKERS,
+        fmt: str = "auto",
+    ) -> "ColumnCache":
+        """
+        Export every message type of *path* (or only *msg_names*).
+        One indexing pass finds the frames of all types; types are then
+        gathered and written in parallel. *fmt* is "arrow", "npy" or "auto".
+        """
+        require_numpy()
+        if fmt == "auto":
+            fmt = "arrow" if pa is not None else "npy"
+        if fmt not in ("arrow", "npy"):
+            raise ValueError(f"Unknown cache format: {fmt}")
+        if fmt == "arrow" and pa is None:
+            raise ImportError("Arrow output requires pyarrow (pip install pyarrow)")
+
+        path = os.path.abspath(path)
+        cache_dir = cache_dir or default_cache_dir(path)
+        source = _source_key(path)
+        index = LogIndex.load(path) or LogIndex.build(path)
+
+        infos = {
+            typ: {"Length": length, "name": name, "columns": cols.split(","), "format_chars": list(fmt_raw)}
+            for typ, length, name, fmt_raw, cols in index.fmt_table
+        }
+        names = set(msg_names) if msg_names is not None else None
+        wanted = [
+            typ
+            for typ, count in index.counts.items()
+            if count and typ in infos and (names is None or infos[typ]["name"] in names)
+        ]
+
+        tmp = cache_dir + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+
+            def export(typ: int) -> Tuple[str, Dict[str, Any]]:
+                info = infos[typ]
+                columns = gather_columns(mm, index.offsets_for(typ), info)
+                if fmt == "arrow":
+                    table = _to_arrow(columns)
+                    feather.write_feather(table, os.path.join(tmp, info["name"] + ".arrow"), compression="uncompressed")
+                else:
+                    type_dir = os.path.join(tmp, info["name"])
+                    os.makedirs(type_dir)
+                    for col, values in columns.items():
+                        np.save(os.path.join(type_dir, col + ".npy"), values)
+                return info["name"], {"rows": len(index.offsets_for(typ)), "columns": list(columns)}
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                types = dict(executor.map(export, wanted))
+
+        manifest = {"version": _VERSION, "format": fmt, "source": source, "types": types}
+        with open(os.path.join(tmp, _MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        os.replace(tmp, cache_dir)
+        return cls(cache_dir, manifest)
+
+    @classmethod
+    def load(cls, path: str, cache_dir: Optional[str] = None) -> Optional["ColumnCache"]:
+        """Open the cache, or return None if it is missing, stale or unreadable here."""
+        cache_dir = cache_dir or default_cache_dir(path)
+        try:
+            with open(os.path.join(cache_dir, _MANIFEST), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if manifest.get("version") != _VERSION or manifest.get("source") != _source_key(path):
+            return None
+        if manifest.get("format") == "arrow" and pa is None:
+            return None
+        return cls(cache_dir, manifest)
+
+    @classmethod
+    def load_or_build(cls, path: str, cache_dir: Optional[str] = None, **kwargs: Any) -> "ColumnCache":
+        """Return a valid cache, (re)exporting the log when it is missing or stale."""
+        cache = cls.load(path, cache_dir)
+        if cache is not None:
+            return cache
+        return cls.build(path, cache_dir, **kwargs)
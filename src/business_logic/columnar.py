@@ -0,0 +1,146 @@
+import mmap
+from array import array
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None  # type: ignore[assignment]
+
+from config import (
+    AP_TO_NUMPY,
+    BINARY_FIELDS,
+    CHAR_TO_DIVIDE,
+    START_SYNC_MARKER,
+)
+from business_logic.boundaries import align_block
+
+Columns = Dict[str, Any]  # column name → np.ndarray
+MsgColumns = Dict[str, Optional[Sequence[str]]]  # type name → column names (None: all of them)
+
+
+def require_numpy() -> None:
+    if np is None:
+        raise ImportError("Columnar output requires numpy (pip install numpy)")
+
+
+def fmt_dtype(info: Dict[str, Any]) -> "np.dtype":
+    """
+    Structured dtype for one whole frame (3-byte header included) of an FMT
+    definition, so a gathered frame can be viewed as one record.
+    BINARY_FIELDS are uint8 rows rather than "S" strings, which would drop
+    trailing NUL bytes. Columns whose format char is unknown take no space
+    and are left out, as in decoders.field_actions.
+    """
+    require_numpy()
+    names: List[str] = []
+    formats: List[Any] = []
+    offsets: List[int] = []
+    pos = 3
+    for col, fmt_char in zip(info["columns"], info["format_chars"]):
+        if fmt_char not in AP_TO_NUMPY:
+            continue
+        dt = np.dtype(AP_TO_NUMPY[fmt_char])
+        if dt.kind == "S" and col in BINARY_FIELDS:
+            dt = np.dtype(("u1", (dt.itemsize,)))
+        if col not in names:
+            names.append(col)
+            formats.append(dt)
+            offsets.append(pos)
+        pos += dt.itemsize
+    return np.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": pos})
+
+
+def scan_offsets(mm: Any, start: int, end: int, lengths: Dict[int, int], wanted_type: int, size: int) -> array:
+    """
+    Walk frames in [start, end) and return the offsets of *wanted_type*.
+    *size* is the full frame size needed to read a wanted frame.
+    """
+    offsets = array("Q")
+    file_size = len(mm)
+    pos = start
+    while pos < end:
+        pos = mm.find(START_SYNC_MARKER, pos)
+        if pos == -1 or pos + 3 > end:
+            break
+
+        msg_type = mm[pos + 2]
+        length = lengths.get(msg_type)
+        if length is None:
+            pos += 1
+            continue
+
+        if msg_type == wanted_type:
+            if pos + size > file_size:
+                pos += 1
+                continue
+            offsets.append(pos)
+        pos += length
+
+    return offsets
+
+
+def gather_columns(
+    buf: Any, offsets: Sequence[int], info: Dict[str, Any], names: Sequence[str] | None = None
+) -> Columns:
+    """
+    Copy the frames at *offsets* into one structured array and return one
+    array per column (or per column in *names*), with string decoding and
+    scaling applied vectorized.
+    """
+    require_numpy()
+    dtype = fmt_dtype(info)
+    data = np.frombuffer(buf, dtype=np.uint8)
+    offs = np.asarray(offsets, dtype=np.int64)
+
+    # One vectorized gather per byte column keeps temporaries at len(offs) ints
+    rows = np.empty((len(offs), dtype.itemsize), dtype=np.uint8)
+    for j in range(dtype.itemsize):
+        rows[:, j] = data[offs + j]
+    records = rows.view(dtype).reshape(-1)
+
+    chars = dict(zip(info["columns"], info["format_chars"]))
+    columns: Columns = {}
+    for col in dtype.names if names is None else names:
+        values = records[col]
+        fmt_char = chars[col]
+        if fmt_char == "L":
+            values = values / 1e7
+        elif fmt_char in CHAR_TO_DIVIDE:
+            values = values / 100.0
+        elif values.dtype.kind == "S" and col not in BINARY_FIELDS:
+            values = np.char.decode(values, "ascii", errors="ignore")
+        columns[col] = np.ascontiguousarray(values)
+    return columns
+
+
+def concat_columns(parts: List[Columns], info: Dict[str, Any]) -> Columns:
+    """Concatenate per-block column dicts (in block order)."""
+    require_numpy()
+    parts = [p for p in parts if p and len(next(iter(p.values())))]
+    if not parts:
+        return gather_columns(b"", [], info)
+    if len(parts) == 1:
+        return parts[0]
+    return {col: np.concatenate([p[col] for p in parts]) for col in parts[0]}
+
+
+def columns_block(
+    path: str,
+    start: int,
+    end: int,
+    lengths: Dict[int, int],
+    wanted_type: int,
+    info: Dict[str, Any],
+) -> Columns:
+    """Columns of *wanted_type* for one (nominal) block of the file (pool worker)."""
+    size = fmt_dtype(info).itemsize
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start, end = align_block(mm, start, end, lengths)
+        offsets = scan_offsets(mm, start, end, lengths, wanted_type, size)
+        columns = gather_columns(mm, offsets, info)
+    return columns
+
+
+def frame_lengths(fmt_cache: Dict[int, Dict[str, Any]]) -> Dict[int, int]:
+    return {typ: info["Length"] for typ, info in fmt_cache.items()}
@@ -0,0 +1,186 @@
+import struct
+import sys
+from array import array
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Tuple
+
+from config import AP_TO_STRUCT, BINARY_FIELDS, CHAR_TO_DIVIDE
+
+Decoder = Callable[[Any, int], Dict[str, Any]]
+
+STRING_CHARS = {"n", "N", "Z"}
+
+
+def _decode_str(b: bytes) -> str:
+    """Fast ASCII decode + strip NULs."""
+    return b.decode("ascii", errors="ignore").rstrip("\x00")
+
+
+def _value_count(fmt_char: str) -> int:
+    """Number of values struct produces for one format char ("32h" → 32)."""
+    code = AP_TO_STRUCT.get(fmt_char, "")
+    if not code:
+        return 0
+    return 1 if code.endswith("s") else struct.calcsize("<" + code) // struct.calcsize("<" + code[-1])
+
+
+def field_actions(columns: List[str], format_chars: List[str]) -> List[Tuple[str, str, int, int, int]]:
+    """
+    (column, action, value index, byte offset, size) for every column.
+    action is one of "raw", "str", "div100", "div1e7" for fields that are
+    unpacked (value index into the unpacked tuple), or "array" ('a',
+    int16[32]) and "binary" (BINARY_FIELDS) for fields that are returned as
+    views over the buffer and skipped by the struct (value index -1).
+    Columns whose format char is unknown take no space and are left out.
+    """
+    actions = []
+    idx = 0
+    offset = 0
+    for col, fmt_char in zip(columns, format_chars):
+        code = AP_TO_STRUCT.get(fmt_char, "")
+        if not code:
+            continue
+        size = struct.calcsize("<" + code)
+        if _value_count(fmt_char) > 1:
+            actions.append((col, "array", -1, offset, size))
+        elif fmt_char in STRING_CHARS and col in BINARY_FIELDS:
+            actions.append((col, "binary", -1, offset, size))
+        else:
+            if fmt_char in STRING_CHARS:
+                action = "str"
+            elif fmt_char in CHAR_TO_DIVIDE:
+                action = "div100"
+            elif fmt_char == "L":
+                action = "div1e7"
+            else:
+                action = "raw"
+            actions.append((col, action, idx, offset, size))
+            idx += 1
+        offset += size
+    return actions
+
+
+def _int16_array(buf: Any, start: int, end: int) -> array:
+    """Copy of an int16[] field as one array.array (no per-element ints)."""
+    values = array("h")
+    values.frombytes(memoryview(buf)[start:end])
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def _binary(buf: Any, start: int, end: int) -> bytes:
+    return bytes(memoryview(buf)[start:end])
+
+
+def _int16_view(buf: Any, start: int, end: int) -> memoryview:
+    return memoryview(buf)[start:end].cast("h")
+
+
+def _binary_view(buf: Any, start: int, end: int) -> memoryview:
+    return memoryview(buf)[start:end]
+
+
+_EXPRESSIONS = {
+    "raw": "v[{i}]",
+    "str": "_dec(v[{i}])",
+    "div100": "v[{i}] / 100.0",
+    "div1e7": "v[{i}] / 1e7",
+    "array": "_arr(buf, offset + {start}, offset + {end})",
+    "binary": "_bin(buf, offset + {start}, offset + {end})",
+}
+
+
+@lru_cache(maxsize=None)
+def _compile(
+    name: str,
+    columns: Tuple[str, ...],
+    format_chars: Tuple[str, ...],
+    detach: bool,
+    fields: Tuple[str, ...] | None = None,
+) -> Decoder:
+    actions = field_actions(list(columns), list(format_chars))
+    keep = None if fields is None else set(fields)
+
+    # Array/binary fields and the fields left out of the projection become
+    # pad bytes: struct never builds them, and the payload size is still checked
+    chars = [c for c in format_chars if AP_TO_STRUCT.get(c)]  # aligned with actions
+    struct_parts = []
+    items = []
+    idx = 0
+    for fmt_char, (col, action, _, start, size) in zip(chars, actions):
+        wanted = keep is None or col in keep
+        if action in ("array", "binary") or not wanted:
+            struct_parts.append(f"{size}x")
+        else:
+            struct_parts.append(AP_TO_STRUCT[fmt_char])
+            idx += 1
+        if wanted:
+            items.append(f"{col!r}: " + _EXPRESSIONS[action].format(i=idx - 1, start=start, end=start + size))
+    struct_obj = struct.Struct("<" + "".join(struct_parts))
+    items.append(f"'mavpackettype': {name!r}")
+
+    source = (
+        "def decode(buf, offset):\n"
+        "    v = _unpack(buf, offset)\n"
+        "    return {" + ", ".join(items) + "}\n"
+    )
+    # Views are only zero-copy when the host byte order matches the log
+    views = not detach and sys.byteorder == "little"
+    namespace: Dict[str, Any] = {
+        "_unpack": struct_obj.unpack_from,
+        "_dec": _decode_str,
+        "_arr": _int16_view if views else _int16_array,
+        "_bin": _binary_view if not detach else _binary,
+    }
+    exec(compile(source, f"<decoder {name}>", "exec"), namespace)
+    decode = namespace["decode"]
+    decode.source = source
+    decode.unpack = struct_obj.unpack_from  # the raw unpack step alone (instrumentation)
+    return decode
+
+
+def compile_decoder(info: Dict[str, Any], detach: bool = False, fields: Tuple[str, ...] | None = None) -> Decoder:
+    """
+    Specialized decode function for one FMT definition.
+    decoder(buf, offset) unpacks the payload at *offset* (just past the
+    3-byte header) and returns the message dict: exactly the string fields
+    are decoded, exactly the L/c/C/e/E fields are scaled, everything else
+    is passed through. Raises struct.error on a truncated payload.
+
+    Array ('a') and BINARY_FIELDS columns are returned as memoryviews over
+    *buf* (int16 and bytes), with no per-element objects. Such views keep
+    the buffer exported, so with *detach* they are copied instead, to an
+    array.array("h") / bytes, for results that must be pickled or outlive
+    the buffer. Decoders are cached, so identical FMT definitions share one
+    function.
+
+    With *fields* (see resolve_fields), the dict only has those of the
+    columns (and mavpackettype): the others are skipped as pad bytes, so
+    they are neither unpacked, decoded nor scaled.
+    """
+    return _compile(info["name"], tuple(info["columns"]), tuple(info["format_chars"]), detach, fields)
+
+
+def resolve_fields(
+    fmt_cache: Dict[int, Dict[str, Any]],
+    wanted_types: FrozenSet[int] | None,
+    fields: str | Iterable[str] | None,
+    keep: Iterable[str] = (),
+) -> Tuple[str, ...] | None:
+    """
+    The projection of a recv_match() query as decoders take it: one tuple
+    of column names (None: every column). Types lacking some of them just
+    leave them out, but a name that is a column of none of the *wanted_types*
+    raises ValueError. The columns of *keep* are added: those the consumer
+    selects on (TimeUS for time-window queries).
+    """
+    if fields is None:
+        return None
+    names = tuple(dict.fromkeys([fields] if isinstance(fields, str) else fields))
+    if wanted_types is not None:
+        known = {col for typ in wanted_types for col in fmt_cache[typ]["columns"]}
+        unknown = [col for col in names if col not in known]
+        if unknown:
+            raise ValueError(f"Unknown fields: {unknown}")
+    return names + tuple(col for col in dict.fromkeys(keep) if col not in names)
@@ -0,0 +1,194 @@
+import json
+import math
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict
+
+from config import (
+    BLOCKS_PER_WORKER,
+    BOUNDARY_SEARCH_LIMIT,
+    CALIBRATION_PATH,
+    CALIBRATION_SAMPLE,
+    DEFAULT_CALIBRATION,
+    MAX_BLOCK_SIZE,
+    MIN_BLOCK_SIZE,
+    PARALLEL_EFFICIENCY,
+)
+from business_logic.multi_processing import ParserMultiprocessing, _parse_range
+from business_logic.parser_sync import ParserSync
+from business_logic.stream_parser import ParserStream, is_stream_source
+from business_logic.thread_parser import ParserThreadPool
+
+
+def _machine_key() -> str:
+    return f"cpu{os.cpu_count() or 1}-py{sys.version_info.major}.{sys.version_info.minor}"
+
+
+def _gil_enabled() -> bool:
+    is_enabled = getattr(sys, "_is_gil_enabled", None)
+    return True if is_enabled is None else bool(is_enabled())
+
+
+def load_calibration(path: str = CALIBRATION_PATH) -> Dict[str, float] | None:
+    """Stored calibration for this machine, or None."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get(_machine_key())
+    except (OSError, ValueError):
+        return None
+
+
+def calibrate(log_path: str, path: str = CALIBRATION_PATH, sample_bytes: int = CALIBRATION_SAMPLE) -> Dict[str, float]:
+    """
+    Time a short pass over the start of *log_path* (decode, filtered walk,
+    unpickling the decoded result and starting a pool) and store the
+    measured rates for this machine.
+    """
+    parser = ParserSync(log_path)
+    end = min(parser.file_size, sample_bytes)
+    parser._scan_fmts(end + BOUNDARY_SEARCH_LIMIT)
+    counts: Dict[int, int] = {}
+
+    start = time.perf_counter()
+    messages = _parse_range(parser._mm, 0, end, parser._fmt_cache, None)
+    decode_time = time.perf_counter() - start
+    for msg in messages:
+        typ = msg.get("mavpackettype")
+        counts[typ] = counts.get(typ, 0) + 1
+
+    # Filter on the rarest type seen, so the walk dominates
+    rare_name = min(counts, key=counts.get) if counts else None
+    rare_type = next((t for t, i in parser._fmt_cache.items() if i["name"] == rare_name), None)
+    start = time.perf_counter()
+    _parse_range(parser._mm, 0, end, parser._fmt_cache, frozenset([rare_type]))
+    walk_time = time.perf_counter() - start
+
+    blob = pickle.dumps(messages, protocol=pickle.HIGHEST_PROTOCOL)
+    start = time.perf_counter()
+    pickle.loads(blob)
+    ipc_time = time.perf_counter() - start
+
+    workers = os.cpu_count() or 1
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(os.getpid) for _ in range(workers)]:
+            future.result()
+    startup = time.perf_counter() - start
+
+    tiny = 1e-6
+    result = {
+        "sync_rate": end / max(decode_time, tiny),
+        "filtered_rate": end / max(walk_time, tiny),
+        "ipc_rate": end / max(ipc_time, tiny),
+        "pool_startup": startup,
+    }
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = {}
+    stored[_machine_key()] = result
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2)
+    except OSError:
+        pass  # read-only home: use the result for this process only
+    return result
+
+
+def plan(
+    file_size: int,
+    filtered: bool = False,
+    cpu_count: int | None = None,
+    calibration: Dict[str, float] | None = None,
+) -> Dict[str, Any]:
+    """
+    Pick a backend and size blocks/workers for one query.
+    Every backend gets an estimated run time from the (calibrated) rates:
+    sync decodes serially; processes add pool startup and the cost of
+    unpickling results in the parent; threads only scale when the GIL is
+    off, since decoding is pure Python. The fastest estimate wins.
+    """
+    cal = dict(DEFAULT_CALIBRATION)
+    cal.update(calibration or {})
+    cpus = cpu_count or os.cpu_count() or 1
+
+    rate = cal["filtered_rate"] if filtered else cal["sync_rate"]
+    # With a type filter only a small share of the decoded data crosses the pipe
+    result_share = 0.1 if filtered else 1.0
+
+    workers = max(1, min(cpus, math.ceil(file_size / MIN_BLOCK_SIZE)))
+    block_size = file_size // (workers * BLOCKS_PER_WORKER) if workers > 1 else file_size
+    block_size = max(MIN_BLOCK_SIZE, min(MAX_BLOCK_SIZE, block_size))
+
+    parallel_rate = rate * workers * PARALLEL_EFFICIENCY
+    thread_rate = parallel_rate if not _gil_enabled() else rate
+    estimates = {
+        "sync": file_size / rate,
+        "threads": file_size / thread_rate + 0.001 * workers,
+        "processes": cal["pool_startup"]
+        + file_size / parallel_rate
+        + file_size * result_share / cal["ipc_rate"],
+    }
+    if workers == 1:
+        estimates.pop("threads")
+        estimates.pop("processes")
+
+    backend = min(estimates, key=estimates.get)
+    return {
+        "backend": backend,
+        "block_size": block_size,
+        "max_workers": workers,
+        "estimates": estimates,
+    }
+
+
+def open_parser(
+    path: str,
+    msg_name: str | None = None,
+    calibrate_first: bool = False,
+    use_index: bool = False,
+    records: bool = False,
+    stats: bool = False,
+) -> ParserSync | ParserThreadPool | ParserMultiprocessing | ParserStream:
+    """
+    Return the parser best suited to reading *path* (optionally filtered
+    on *msg_name*). Compressed logs, "-" (stdin), pipes and file objects
+    cannot be mapped and get a ParserStream (without index or stats). With
+    *calibrate_first*, a calibration pass is run on this log if none is
+    stored for the machine yet; it is reused afterwards.
+    *records* and *stats* are passed on to the parser (lazy record objects,
+    not dicts; instrumentation in parser.stats).
+    """
+    if is_stream_source(path):
+        return ParserStream(path, records=records)
+
+    calibration = load_calibration()
+    if calibration is None and calibrate_first:
+        calibration = calibrate(path)
+
+    chosen = plan(os.path.getsize(path), filtered=msg_name is not None, calibration=calibration)
+    if chosen["backend"] == "sync":
+        return ParserSync(path, use_index=use_index, records=records, stats=stats)
+    if chosen["backend"] == "threads":
+        return ParserThreadPool(
+            path,
+            block_size=chosen["block_size"],
+            max_workers=chosen["max_workers"],
+            use_index=use_index,
+            records=records,
+            stats=stats,
+        )
+    return ParserMultiprocessing(
+        path,
+        use_index=use_index,
+        block_size=chosen["block_size"],
+        max_workers=chosen["max_workers"],
+        records=records,
+        stats=stats,
+    )
@@ -0,0 +1,378 @@
+import ast
+import math
+import struct
+from fractions import Fraction
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Mapping, Set, Tuple
+
+from config import AP_TO_STRUCT
+from business_logic.decoders import Decoder, _decode_str, field_actions
+
+# Filter expressions are Python expressions over the columns of a type:
+#   "Status >= 3 and NSats > 6", "Volt < 14", "Mode in (3, 4)", "changed(Mode)"
+# with and/or/not, comparisons (chained too), in / not in a tuple of
+# constants, + - * / on columns and constants. changed(col, ...) holds for a
+# frame whose columns differ from the previous frame of its type that passed
+# the rest of the expression; it may only appear once, as a term of the
+# top-level "and".
+#
+# A filter is compiled per FMT definition into a test that unpacks the
+# columns it reads (the others are pad bytes) and compares raw values:
+# constants are converted to the raw integer scale of L/c/C/e/E columns
+# instead of scaling every frame. Rejected frames stop there, before any
+# string decoding, scaling or message construction.
+WhereFilter = str | Mapping[str, str] | None  # recv_match where: one expression, or one per type name
+Where = Tuple[Tuple[str | None, str], ...]  # normalized (type name or None for all, expression) pairs
+
+_CHANGED = "changed"
+_UNSET = object()  # changed() state before the first frame
+_COMPARISONS = {
+    ast.Eq: "==",
+    ast.NotEq: "!=",
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Gt: ">",
+    ast.GtE: ">=",
+    ast.In: "in",
+    ast.NotIn: "not in",
+}
+_FLIPPED = {"<": ">", "<=": ">=", ">": "<", ">=": "<=", "==": "==", "!=": "!="}
+_ARITHMETIC = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/"}
+_SCALES = {"div100": 100.0, "div1e7": 1e7}
+_VALUES = {"raw": "{p}", "str": "_dec({p})", "div100": "{p} / 100.0", "div1e7": "{p} / 1e7"}
+
+
+def _constant(node: ast.AST) -> Any:
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError):
+        return _UNSET
+
+
+def _check(node: ast.AST, top: bool = False) -> None:
+    """Raise ValueError for anything outside the expression language."""
+    if isinstance(node, ast.BoolOp):
+        for value in node.values:
+            _check(value, top and isinstance(node.op, ast.And))
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub, ast.UAdd)):
+        _check(node.operand)
+    elif isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC:
+        _check(node.left)
+        _check(node.right)
+    elif isinstance(node, ast.Compare) and all(type(op) in _COMPARISONS for op in node.ops):
+        for operand in (node.left, *node.comparators):
+            if _constant(operand) is _UNSET:
+                _check(operand)
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == _CHANGED:
+        if not top:
+            raise ValueError(f"{_CHANGED}() must be a term of the top-level 'and'")
+        if not node.args or node.keywords or not all(isinstance(arg, ast.Name) for arg in node.args):
+            raise ValueError(f"{_CHANGED}() takes column names")
+    elif not isinstance(node, (ast.Name, ast.Constant)):
+        raise ValueError(f"Unsupported filter expression: {ast.unparse(node)}")
+
+
+@lru_cache(maxsize=None)
+def _parse(expr: str) -> Tuple[ast.expr, Tuple[str, ...], FrozenSet[str]]:
+    """(the expression without its changed() term, the changed() columns, every column it reads)."""
+    try:
+        body = ast.parse(expr.strip(), mode="eval").body
+    except SyntaxError as e:
+        raise ValueError(f"Invalid filter expression {expr!r}: {e.msg}") from None
+    _check(body, top=True)
+
+    terms = body.values if isinstance(body, ast.BoolOp) and isinstance(body.op, ast.And) else [body]
+    calls = [term for term in terms if isinstance(term, ast.Call)]
+    if len(calls) > 1:
+        raise ValueError(f"{_CHANGED}() may only be used once")
+    changed = tuple(arg.id for arg in calls[0].args) if calls else ()  # type: ignore[attr-defined]
+    rest = [term for term in terms if not isinstance(term, ast.Call)]
+    condition = ast.BoolOp(op=ast.And(), values=rest) if len(rest) > 1 else rest[0] if rest else ast.Constant(True)
+
+    columns = {node.id for node in ast.walk(body) if isinstance(node, ast.Name) and node.id != _CHANGED}
+    return condition, changed, frozenset(columns)
+
+
+def parse_where(where: WhereFilter) -> Where | None:
+    """
+    Normalize a recv_match *where*: one expression for every type, or a
+    mapping of type name → expression (other types are not filtered).
+    Raises ValueError for an invalid expression.
+    """
+    if where is None:
+        return None
+    items = [(None, where)] if isinstance(where, str) else sorted(where.items())
+    for _, expr in items:
+        _parse(expr)
+    return tuple(items)
+
+
+def expression_for(where: Where, name: str) -> str | None:
+    """The expression that applies to type *name*, if any."""
+    exprs = dict(where)
+    return exprs.get(name, exprs.get(None))
+
+
+def changed_columns(where: Where | None) -> Tuple[str, ...]:
+    """Every column of the changed() terms of *where*."""
+    if where is None:
+        return ()
+    return tuple(dict.fromkeys(col for _, expr in where for col in _parse(expr)[1]))
+
+
+def filter_types(
+    fmt_cache: Dict[int, Dict[str, Any]],
+    wanted_types: FrozenSet[int] | None,
+    where: Where | None,
+    scan_rest: Callable[[], Any] | None = None,
+) -> FrozenSet[int] | None:
+    """
+    *wanted_types* less the types a filter can never match. An expression
+    for every type leaves out the types lacking one of its columns (so they
+    are not walked at all); if no type has them all, or if the expression of
+    a named type reads a column it lacks, this raises ValueError. Without a
+    type filter, *scan_rest* is called first to read the log's remaining FMT
+    records, like resolve_types.
+    """
+    if where is None:
+        return wanted_types
+    exprs = dict(where)
+    default = exprs.get(None)
+    if wanted_types is None and default is not None and scan_rest is not None:
+        scan_rest()
+
+    kept: Set[int] = set()
+    for typ in fmt_cache if wanted_types is None else wanted_types:
+        info = fmt_cache[typ]
+        expr = exprs.get(info["name"], default)
+        if expr is None:
+            kept.add(typ)
+            continue
+        missing = sorted(_parse(expr)[2] - set(info["columns"]))
+        if not missing:
+            _compile(tuple(info["columns"]), tuple(info["format_chars"]), expr)  # errors here, not in a worker
+            kept.add(typ)
+        elif info["name"] in exprs:
+            raise ValueError(f"Unknown columns of {info['name']}: {missing}")
+    if default is not None and not any(exprs.get(fmt_cache[typ]["name"]) is None for typ in kept):
+        raise ValueError(f"No message type has the columns of {default!r}")
+    return None if wanted_types is None and default is None else frozenset(kept)
+
+
+def _threshold(value: float, scale: float, strict: bool, low: int, high: int) -> int:
+    """
+    Smallest raw integer k in [low, high] with k / scale >= value (> value if
+    *strict*); low if every raw value of the column passes, high + 1 if none
+    does. k is computed exactly, then settled on the rounding of the float
+    division recv_match scales with, which moves it a step at most.
+    """
+    exact = Fraction(value) * Fraction(scale)
+    k = min(max(math.floor(exact) + 1 if strict else math.ceil(exact), low), high + 1)
+    while k > low and ((k - 1) / scale > value or (not strict and (k - 1) / scale == value)):
+        k -= 1
+    while k <= high and (k / scale < value or (strict and k / scale == value)):
+        k += 1
+    return k
+
+
+def _raw_range(fmt_char: str) -> Tuple[int, int]:
+    """Range of the raw integers of a column."""
+    code = AP_TO_STRUCT[fmt_char]
+    bits = 8 * struct.calcsize("<" + code)
+    return (-(2 ** (bits - 1)), 2 ** (bits - 1) - 1) if code.islower() else (0, 2**bits - 1)
+
+
+class _Source:
+    """Python source of one filter for one FMT definition, over the unpacked tuple p."""
+
+    def __init__(self, columns: Tuple[str, ...], format_chars: Tuple[str, ...], read: FrozenSet[str]):
+        chars = [c for c in format_chars if AP_TO_STRUCT.get(c)]  # aligned with field_actions
+        parts = []
+        self.fields: Dict[str, Tuple[str, str]] = {}  # column → (action, p[i])
+        self.ranges: Dict[str, Tuple[int, int]] = {}  # column → range of its raw integers
+        for fmt_char, (col, action, _, _, size) in zip(chars, field_actions(list(columns), list(format_chars))):
+            if col not in read or col in self.fields:
+                parts.append(f"{size}x")
+                continue
+            if action in ("array", "binary"):
+                raise ValueError(f"Cannot filter on array or binary column {col}")
+            self.fields[col] = (action, f"p[{len(self.fields)}]")
+            if action in _SCALES:
+                self.ranges[col] = _raw_range(fmt_char)
+            parts.append(AP_TO_STRUCT[fmt_char])
+        self.struct_obj = struct.Struct("<" + "".join(parts))
+        self.constants: Dict[str, Any] = {}
+
+    def constant(self, value: Any) -> str:
+        name = f"_k{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def value(self, node: ast.AST) -> str:
+        """Scaled / decoded value of an operand, as recv_match returns it."""
+        value = _constant(node)
+        if value is not _UNSET:
+            return self.constant(value)
+        if isinstance(node, ast.Name):
+            action, p = self.fields[node.id]
+            return "(" + _VALUES[action].format(p=p) + ")"
+        if isinstance(node, ast.UnaryOp):
+            return f"({'-' if isinstance(node.op, ast.USub) else '+'}{self.value(node.operand)})"
+        assert isinstance(node, ast.BinOp)
+        return f"({self.value(node.left)} {_ARITHMETIC[type(node.op)]} {self.value(node.right)})"
+
+    def compare(self, left: ast.AST, op: str, right: ast.AST) -> str:
+        if _constant(left) is not _UNSET and isinstance(right, ast.Name) and op in _FLIPPED:
+            left, op, right = right, _FLIPPED[op], left
+        value = _constant(right)
+        if isinstance(left, ast.Name) and value is not _UNSET:
+            action, p = self.fields[left.id]
+            scale = _SCALES.get(action)
+            bounds = self.ranges.get(left.id, (0, 0))
+            if op in ("in", "not in") and isinstance(value, (tuple, list, set, frozenset)):
+                values = list(value)
+                if scale is not None:
+                    values = [_threshold(v, scale, False, *bounds) for v in values if self._exact(v, scale, bounds)]
+                    return f"{p} {op} {self.constant(frozenset(values))}"
+                return f"{self.value(left)} {op} {self.constant(frozenset(values))}"
+            if scale is not None and self._finite(value, scale) and op in _FLIPPED:
+                # Compare the raw integer with the constant on the raw scale (out of range: always or never)
+                low, high = _threshold(value, scale, False, *bounds), _threshold(value, scale, True, *bounds)
+                raw = {
+                    "<": f"{p} < {low}",
+                    "<=": f"{p} < {high}",
+                    ">=": f"{p} >= {low}",
+                    ">": f"{p} >= {high}",
+                    "==": f"{low} <= {p} < {high}",
+                    "!=": f"not {low} <= {p} < {high}",
+                }
+                return raw[op]
+        return f"{self.value(left)} {op} {self.value(right)}"
+
+    @staticmethod
+    def _finite(value: Any, scale: float) -> bool:
+        return isinstance(value, (int, float)) and math.isfinite(value * scale)
+
+    @classmethod
+    def _exact(cls, value: Any, scale: float, bounds: Tuple[int, int]) -> bool:
+        """Whether some raw integer of the column scales to exactly *value*."""
+        if not cls._finite(value, scale):
+            return False
+        return _threshold(value, scale, False, *bounds) < _threshold(value, scale, True, *bounds)
+
+    def condition(self, node: ast.AST) -> str:
+        if isinstance(node, ast.BoolOp):
+            joiner = " and " if isinstance(node.op, ast.And) else " or "
+            return "(" + joiner.join(self.condition(value) for value in node.values) + ")"
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return f"(not {self.condition(node.operand)})"
+        if isinstance(node, ast.Compare):
+            operands = [node.left, *node.comparators]
+            pairs = [
+                self.compare(operands[i], _COMPARISONS[type(op)], operands[i + 1]) for i, op in enumerate(node.ops)
+            ]
+            return "(" + " and ".join(pairs) + ")"
+        return f"bool({self.value(node)})"
+
+    def key(self, changed: Tuple[str, ...]) -> str:
+        values = [self.value(ast.Name(id=col)) for col in changed]
+        return values[0] if len(values) == 1 else "(" + ", ".join(values) + ")"
+
+
+@lru_cache(maxsize=None)
+def _compile(columns: Tuple[str, ...], format_chars: Tuple[str, ...], expr: str) -> Tuple[Callable[..., Any], Any]:
+    """(bind, test) of one expression for one FMT definition, compiled once and cached."""
+    condition, changed, read = _parse(expr)
+    source = _Source(columns, format_chars, read)
+    cond = source.condition(condition)
+
+    lines = [
+        "def test(buf, offset):",
+        "    p = _unpack(buf, offset)",
+        f"    return {cond}",
+        "",
+        "def bind(_decode, _last):",
+        "    def decode(buf, offset):",
+        "        p = _unpack(buf, offset)",
+        f"        if not {cond}:",
+        "            return None",
+    ]
+    if changed:
+        lines += [
+            f"        key = {source.key(changed)}",
+            "        if key == _last[0]:",
+            "            return None",
+            "        _last[0] = key",
+        ]
+    lines += ["        return _decode(buf, offset)", "    return decode"]
+
+    namespace: Dict[str, Any] = {"_unpack": source.struct_obj.unpack_from, "_dec": _decode_str, **source.constants}
+    exec(compile("\n".join(lines) + "\n", f"<filter {expr!r}>", "exec"), namespace)
+    return namespace["bind"], namespace["test"]
+
+
+def filter_tests(fmt_cache: Dict[int, Dict[str, Any]], where: Where) -> Dict[int, Any]:
+    """
+    type → test(buf, offset) of the types *where* applies to: the filter
+    without its changed() term, for workers that ship raw frames.
+    """
+    tests = {}
+    for typ, info in fmt_cache.items():
+        expr = expression_for(where, info["name"])
+        if expr is not None and _parse(expr)[2] <= set(info["columns"]):
+            tests[typ] = _compile(tuple(info["columns"]), tuple(info["format_chars"]), expr)[1]
+    return tests
+
+
+class FrameFilter:
+    """
+    A where clause for one read: wrap() puts its compiled tests in front of
+    the decoders, which then return None for rejected frames. The changed()
+    state lives in the FrameFilter, so a read keeps one across its steps;
+    pool workers build their own per block, and the consumer drops the
+    repeats where blocks meet with changes().
+    """
+
+    def __init__(self, where: Where):
+        self.where = where
+        self._last: Dict[int, List[Any]] = {}  # type → [changed() key of the last frame passed]
+        self._changed = changed_columns(where)
+        self._keys: Dict[str, Tuple[str, ...]] = {}  # type name → its changed() columns
+        self._seen: Dict[str, Any] = {}  # changes(): type name → last key
+
+    def wrap(self, fmt_cache: Dict[int, Dict[str, Any]], decoders: Dict[int, Decoder]) -> Dict[int, Decoder]:
+        """*decoders* (type → decoder) with the filter of every type it applies to in front."""
+        wrapped = dict(decoders)
+        for typ, decode in decoders.items():
+            info = fmt_cache[typ]
+            expr = expression_for(self.where, info["name"])
+            if expr is None or not _parse(expr)[2] <= set(info["columns"]):
+                continue  # such types are not wanted (see filter_types)
+            bind = _compile(tuple(info["columns"]), tuple(info["format_chars"]), expr)[0]
+            wrapped[typ] = bind(decode, self._last.setdefault(typ, [_UNSET]))
+        return wrapped
+
+    def changes(self, messages: Iterable[Any]) -> Iterator[Any]:
+        """
+        Drop the messages whose changed() columns equal those of the last
+        message of their type: the first frame of every pool block passes
+        changed(), not knowing the previous block's.
+        """
+        if not self._changed:
+            yield from messages
+            return
+        for msg in messages:
+            name = msg["mavpackettype"] if isinstance(msg, dict) else msg.get_type()
+            columns = self._keys.get(name)
+            if columns is None:
+                expr = expression_for(self.where, name)
+                columns = self._keys[name] = _parse(expr)[1] if expr is not None else ()
+            if columns:
+                if isinstance(msg, dict):
+                    key = tuple(msg[col] for col in columns)
+                else:
+                    key = tuple(getattr(msg, col) for col in columns)
+                if self._seen.get(name, _UNSET) == key:
+                    continue
+                self._seen[name] = key
+            yield msg
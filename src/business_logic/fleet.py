@@ -0,0 +1,230 @@
+import argparse
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Tuple
+
+from config import (
+    AP_TO_STRUCT,
+    FLEET_BLOCK_SIZE,
+    FLEET_PATTERN,
+    FMT_LENGTH,
+    FMT_MSG_TYPE,
+    MAX_WORKERS,
+    START_SYNC_MARKER,
+)
+from business_logic.boundaries import align_block, split_range
+from business_logic.schema import scan_fmt_records
+
+# type → (name, Length, full frame size, has a leading uint64 TimeUS)
+Schema = Dict[int, Tuple[str, int, int, bool]]
+
+_TIME_US = struct.Struct("<Q")
+
+
+def find_logs(target: str, pattern: str = FLEET_PATTERN) -> List[str]:
+    """Logs named by *target*: a directory (searched recursively for *pattern*), a glob, or one file."""
+    if os.path.isdir(target):
+        paths = glob.glob(os.path.join(target, "**", pattern), recursive=True)
+    elif os.path.isfile(target):
+        paths = [target]
+    else:
+        paths = glob.glob(target, recursive=True)
+    return sorted(os.path.abspath(p) for p in paths if os.path.isfile(p))
+
+
+def _file_schema(path: str, block_size: int) -> Tuple[Schema, List[Tuple[int, int]]]:
+    """(schema, blocks) of one log; the blocks are nominal, aligned on frames by their workers."""
+    schema: Schema = {FMT_MSG_TYPE: ("FMT", FMT_LENGTH, FMT_LENGTH, False)}
+    blocks: List[Tuple[int, int]] = []
+    if os.path.getsize(path) == 0:
+        return schema, blocks
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for typ, length, name, fmt_raw, cols in scan_fmt_records(mm):
+            size = 3 + struct.calcsize("<" + "".join(AP_TO_STRUCT.get(c, "") for c in fmt_raw))
+            timed = cols.split(",")[:1] == ["TimeUS"] and fmt_raw[:1] == "Q"
+            schema[typ] = (name, length, size, timed)
+
+        blocks = split_range(0, len(mm), block_size)
+
+    return schema, blocks
+
+
+def _summarize_block(path: str, start: int, end: int, schema: Schema) -> Dict[str, Any]:
+    """Per-type counts, TimeUS span and bytes skipped while resyncing, for one block."""
+    counts: Dict[str, int] = {}
+    first_us: Optional[int] = None
+    last_us: Optional[int] = None
+    skipped = 0
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        file_size = len(mm)
+        start, end = align_block(mm, start, end, {typ: entry[1] for typ, entry in schema.items()})
+        pos = start
+        while pos < end:
+            nxt = mm.find(START_SYNC_MARKER, pos, end)
+            if nxt == -1:
+                skipped += end - pos
+                break
+            skipped += nxt - pos
+            pos = nxt
+
+            entry = schema.get(mm[pos + 2]) if pos + 3 <= file_size else None
+            if entry is None or pos + entry[2] > file_size:
+                skipped += 1
+                pos += 1
+                continue
+
+            name, length, _, timed = entry
+            counts[name] = counts.get(name, 0) + 1
+            if timed:
+                t = _TIME_US.unpack_from(mm, pos + 3)[0]
+                first_us = t if first_us is None else min(first_us, t)
+                last_us = t if last_us is None else max(last_us, t)
+            pos += length
+
+    return {"counts": counts, "start_us": first_us, "end_us": last_us, "skipped_bytes": skipped}
+
+
+def _new_summary(path: str) -> Dict[str, Any]:
+    return {
+        "path": path,
+        "size": os.path.getsize(path),
+        "messages": 0,
+        "counts": {},
+        "start_us": None,
+        "end_us": None,
+        "skipped_bytes": 0,
+        "errors": [],
+        "elapsed": time.perf_counter(),  # start time until the file is done
+    }
+
+
+def _merge(summary: Dict[str, Any], part: Dict[str, Any]) -> None:
+    for name, n in part["counts"].items():
+        summary["counts"][name] = summary["counts"].get(name, 0) + n
+        summary["messages"] += n
+    for key, pick in (("start_us", min), ("end_us", max)):
+        if part[key] is not None:
+            summary[key] = part[key] if summary[key] is None else pick(summary[key], part[key])
+    summary["skipped_bytes"] += part["skipped_bytes"]
+
+
+def iter_fleet(
+    target: str,
+    max_workers: int = MAX_WORKERS,
+    block_size: int = FLEET_BLOCK_SIZE,
+    executor: Optional[Executor] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Summarize every log of *target* (see find_logs) and yield one summary
+    per file as soon as its last block is done, so in completion order:
+    path, size, messages, counts per type, start_us / end_us (TimeUS span),
+    skipped_bytes, errors and elapsed seconds.
+
+    Files are first split into blocks of about *block_size* (one task per
+    file), then their blocks run on the same pool. Largest files are
+    submitted first so the pool is not left waiting on one big file at the
+    end. Pass a running *executor* (e.g. ParserSession.executor) to reuse it.
+    """
+    paths = sorted(find_logs(target), key=os.path.getsize, reverse=True)
+    pool: ContextManager[Executor] = (
+        nullcontext(executor) if executor is not None else ProcessPoolExecutor(max_workers=max_workers)
+    )
+
+    summaries: Dict[str, Dict[str, Any]] = {}
+    pending_blocks: Dict[str, int] = {}
+    futures: Dict[Future, str] = {}
+
+    def finish(path: str) -> Dict[str, Any]:
+        summary = summaries.pop(path)
+        summary["elapsed"] = time.perf_counter() - summary["elapsed"]
+        return summary
+
+    with pool as ex:
+        for path in paths:
+            summaries[path] = _new_summary(path)
+            futures[ex.submit(_file_schema, path, block_size)] = path
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = futures.pop(future)
+                summary = summaries[path]
+                try:
+                    result = future.result()
+                except Exception as e:  # unreadable file or worker failure: report, keep going
+                    summary["errors"].append(f"{type(e).__name__}: {e}")
+                    result = None
+
+                if path not in pending_blocks:  # schema task
+                    if result is None or not result[1]:
+                        yield finish(path)
+                        continue
+                    schema, blocks = result
+                    pending_blocks[path] = len(blocks)
+                    for start, end in blocks:
+                        futures[ex.submit(_summarize_block, path, start, end, schema)] = path
+                    continue
+
+                if result is not None:
+                    _merge(summary, result)
+                pending_blocks[path] -= 1
+                if pending_blocks[path] == 0:
+                    del pending_blocks[path]
+                    yield finish(path)
+
+
+def run_fleet(
+    target: str,
+    sink: Callable[[Dict[str, Any]], None],
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    """Send every file summary of iter_fleet() to *sink* as it arrives; return fleet totals."""
+    totals = {"files": 0, "failed": 0, "bytes": 0, "messages": 0}
+    for summary in iter_fleet(target, **kwargs):
+        sink(summary)
+        totals["files"] += 1
+        totals["failed"] += bool(summary["errors"])
+        totals["bytes"] += summary["size"]
+        totals["messages"] += summary["messages"]
+    return totals
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point; writes one JSON summary per line as files finish:
+        cd src && python -m business_logic.fleet LOG_DIR_OR_GLOB [--workers N] [--output FILE]
+    """
+    parser = argparse.ArgumentParser(description="Summarize a fleet of DataFlash logs on one process pool.")
+    parser.add_argument("target", help="directory, glob pattern or single log")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--block-size", type=int, default=FLEET_BLOCK_SIZE)
+    parser.add_argument("--output", help="JSON lines file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+
+        def sink(summary: Dict[str, Any]) -> None:
+            out.write(json.dumps(summary) + "\n")
+            out.flush()
+
+        totals = run_fleet(args.target, sink, max_workers=args.workers, block_size=args.block_size)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(json.dumps(totals), file=sys.stderr)
+    return 1 if totals["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
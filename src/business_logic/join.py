@@ -0,0 +1,144 @@
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import MAX_WORKERS
+from business_logic.columnar import Columns, MsgColumns, fmt_dtype, gather_columns, np, require_numpy
+from business_logic.log_index import LogIndex
+from business_logic.time_window import timed_types
+
+# Joined table layout: "TimeUS" of the base type, then "<TYPE>.<col>" for
+# every column of every type. Each joined type also gets "<TYPE>.TimeUS"
+# (the time of the matched frame) and "<TYPE>.matched"; unmatched rows hold
+# NaN in float columns and zeros / empty strings in the others.
+DIRECTIONS = ("backward", "forward", "nearest")
+
+
+def asof_indices(
+    left_us: Any, right_us: Any, tolerance_us: int | None = None, direction: str = "backward"
+) -> Tuple[Any, Any]:
+    """
+    For every time in *left_us*, the index of the matching time in the
+    sorted array *right_us*, and whether there is one:
+    "backward" takes the last time at or before it (as-of), "forward" the
+    first at or after it, "nearest" the closer of the two (the earlier on
+    a tie). With *tolerance_us*, matches further away than that do not count.
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {DIRECTIONS}")
+    left_us = np.asarray(left_us, dtype=np.int64)
+    right_us = np.asarray(right_us, dtype=np.int64)
+    if not len(right_us):
+        return np.zeros(len(left_us), dtype=np.int64), np.zeros(len(left_us), dtype=bool)
+
+    before = np.searchsorted(right_us, left_us, side="right") - 1
+    after = np.searchsorted(right_us, left_us, side="left")
+    has_before, has_after = before >= 0, after < len(right_us)
+    before, after = np.clip(before, 0, None), np.clip(after, None, len(right_us) - 1)
+    if direction == "backward":
+        idx, matched = before, has_before
+    elif direction == "forward":
+        idx, matched = after, has_after
+    else:
+        take_after = has_after & (~has_before | (right_us[after] - left_us < left_us - right_us[before]))
+        idx, matched = np.where(take_after, after, before), has_before | has_after
+
+    if tolerance_us is not None:
+        matched = matched & (np.abs(right_us[idx] - left_us) <= tolerance_us)
+    return idx, matched
+
+
+def _take(values: Any, idx: Any, matched: Any) -> Any:
+    """values[idx], with NaN (floats) or zeros (anything else) where nothing matched."""
+    if not len(values):
+        out = np.zeros((len(idx),) + values.shape[1:], dtype=values.dtype)
+    else:
+        out = values[idx]
+    out[~matched] = np.nan if out.dtype.kind == "f" else np.zeros((), dtype=out.dtype)
+    return out
+
+
+def asof_join(
+    left: Columns,
+    right: Columns,
+    name: str,
+    tolerance_us: int | None = None,
+    direction: str = "backward",
+) -> Columns:
+    """
+    The columns of *right* aligned on left["TimeUS"] (see asof_indices),
+    named "<name>.<col>", plus "<name>.matched". Rows of *right* are put in
+    TimeUS order first (stable, so equal times keep file order and the last
+    of them wins a backward match).
+    """
+    require_numpy()
+    right_us = np.asarray(right["TimeUS"])
+    if len(right_us) > 1 and np.any(right_us[1:] < right_us[:-1]):
+        order = np.argsort(right_us, kind="stable")
+        right = {col: np.asarray(values)[order] for col, values in right.items()}
+        right_us = right["TimeUS"]
+
+    idx, matched = asof_indices(left["TimeUS"], right_us, tolerance_us, direction)
+    joined = {f"{name}.{col}": _take(np.asarray(values), idx, matched) for col, values in right.items()}
+    joined[f"{name}.matched"] = matched
+    return joined
+
+
+def _gather(path: str, index: LogIndex, msg_columns: MsgColumns, max_workers: int) -> Dict[str, Columns]:
+    """Columns (TimeUS first) of every requested type, gathered in parallel through the offset index."""
+    wanted: Dict[str, Tuple[int, Dict[str, Any], List[str]]] = {}
+    for msg_name, cols in msg_columns.items():
+        typ, info = index.type_info(msg_name)
+        if typ is None:
+            raise ValueError(f"Unknown message type: {msg_name}")
+        if typ not in timed_types({typ: info}):
+            raise ValueError(f"{msg_name} has no TimeUS column")
+        known = fmt_dtype(info).names  # columns of unknown format chars are left out
+        names = [col for col in known if col != "TimeUS"] if cols is None else list(cols)
+        unknown = set(names) - set(known)
+        if unknown:
+            raise ValueError(f"Unknown columns of {msg_name}: {sorted(unknown)}")
+        wanted[msg_name] = (typ, info, ["TimeUS", *(col for col in names if col != "TimeUS")])
+
+    if not os.path.getsize(path):
+        return {name: gather_columns(b"", [], info, cols) for name, (_, info, cols) in wanted.items()}
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+
+        def gather(msg_name: str) -> Columns:
+            typ, info, cols = wanted[msg_name]
+            return gather_columns(mm, index.offsets_for(typ), info, cols)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(wanted, executor.map(gather, wanted)))
+
+
+def join_log(
+    path: str,
+    base: str,
+    others: MsgColumns,
+    base_columns: Optional[Sequence[str]] = None,
+    tolerance_us: int | None = None,
+    direction: str = "backward",
+    max_workers: int = MAX_WORKERS,
+) -> Columns:
+    """
+    One table with a row per *base* message: its columns (*base_columns*,
+    default all) and, for every type of *others* (type → columns, None for
+    all), the columns of its frame matched on TimeUS (see asof_indices).
+    Types are read with one index pass and gathered in parallel; the join
+    itself is a binary search per type, all vectorized.
+    """
+    require_numpy()
+    if base in others:
+        raise ValueError(f"{base} is the base type")
+    path = os.path.abspath(path)
+    index = LogIndex.load_or_build(path)
+    columns = _gather(path, index, {base: base_columns, **others}, max_workers)
+
+    left = columns[base]
+    table: Columns = {"TimeUS": left["TimeUS"]}
+    table.update((f"{base}.{col}", values) for col, values in left.items() if col != "TimeUS")
+    for name in others:
+        table.update(asof_join(left, columns[name], name, tolerance_us, direction))
+    return table
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import (
+    AP_TO_STRUCT,
+    FMT_LENGTH,
+    FMT_MSG_TYPE,
+    INDEX_HASH_BYTES,
+    INDEX_SUFFIX,
+    START_SYNC_MARKER,
+)
+from business_logic.schema import FmtEntry, scan_fmt_records
+
+# Sidecar layout (little endian):
+#   header    magic | offset typecode | file size | mtime_ns | digest | fmt json length | type count
+#   fmt json  [[type, length, name, format, columns], ...]
+#   directory type count × (type, message count)
+#   offsets   one offset array per directory entry, same order
+_MAGIC = b"APIDX\x00\x01\x00"
+_HEADER = struct.Struct("<8s1sQq16sII")
+_DIR_ENTRY = struct.Struct("<BQ")
+
+FileKey = Tuple[int, int, bytes]
+
+
+def default_sidecar_path(path: str) -> str:
+    return os.path.abspath(path) + INDEX_SUFFIX
+
+
+def file_key(path: str) -> FileKey:
+    """
+    Identity of a log file: (size, mtime_ns, digest).
+    The digest covers the first and last INDEX_HASH_BYTES only, so checking
+    a multi-GB log costs two small reads instead of a full pass.
+    """
+    st = os.stat(path)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(st.st_size.to_bytes(8, "little"))
+    with open(path, "rb") as f:
+        h.update(f.read(INDEX_HASH_BYTES))
+        if st.st_size > INDEX_HASH_BYTES:
+            f.seek(max(INDEX_HASH_BYTES, st.st_size - INDEX_HASH_BYTES))
+            h.update(f.read(INDEX_HASH_BYTES))
+    return st.st_size, st.st_mtime_ns, h.digest()
+
+
+class LogIndex:
+    """
+    Offsets of every message in a log, grouped by message type, plus the
+    FMT table. Built with one pass over the file and persisted in a sidecar
+    so later filtered reads can jump straight to the frames they need.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        key: FileKey,
+        fmt_table: List[FmtEntry],
+        offsets: Dict[int, array],
+    ):
+        self.path = os.path.abspath(path)
+        self.key = key
+        self.fmt_table = fmt_table
+        self._offsets = offsets
+
+    @property
+    def counts(self) -> Dict[int, int]:
+        return {typ: len(offs) for typ, offs in self._offsets.items()}
+
+    def offsets_for(self, typ: int) -> array:
+        """Start offsets (in file order) of every message of type *typ*."""
+        return self._offsets.get(typ, array("Q"))
+
+    def type_info(self, msg_name: str) -> Tuple[int | None, Dict[str, Any]]:
+        """Type id and column info (Length, name, columns, format_chars) of *msg_name*; None if not defined."""
+        for typ, length, name, fmt_raw, cols in self.fmt_table:
+            if name == msg_name:
+                return typ, {"Length": length, "name": name, "columns": cols.split(","), "format_chars": list(fmt_raw)}
+        return None, {}
+
+    def offsets_for_types(self, types: Iterable[int]) -> array:
+        """Start offsets (in file order) of every message of any of *types*."""
+        parts = [offs for offs in map(self.offsets_for, types) if len(offs)]
+        if len(parts) == 1:
+            return parts[0]
+        return array("Q", sorted(pos for offs in parts for pos in offs))
+
+    @classmethod
+    def build(cls, path: str) -> "LogIndex":
+        path = os.path.abspath(path)
+        key = file_key(path)
+        typecode = "I" if key[0] < 2**32 else "Q"
+
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            fmt_table = scan_fmt_records(mm)
+
+            # (Length, payload size) per type, FMT itself included
+            lengths: Dict[int, Tuple[int, int]] = {FMT_MSG_TYPE: (FMT_LENGTH, FMT_LENGTH - 3)}
+            for typ, length, _, fmt_raw, _ in fmt_table:
+                struct_fmt = "<" + "".join(AP_TO_STRUCT.get(c, "") for c in fmt_raw)
+                lengths[typ] = (length, struct.calcsize(struct_fmt))
+
+            offsets: Dict[int, array] = {}
+            pos = 0
+            end = len(mm)
+            while pos < end:
+                pos = mm.find(START_SYNC_MARKER, pos)
+                if pos == -1 or pos + 3 > end:
+                    break
+
+                msg_type = mm[pos + 2]
+                info = lengths.get(msg_type)
+                if info is None or pos + 3 + info[1] > end:
+                    pos += 1
+                    continue
+
+                offs = offsets.get(msg_type)
+                if offs is None:
+                    offs = offsets[msg_type] = array(typecode)
+                offs.append(pos)
+                pos += info[0]
+
+        return cls(path, key, fmt_table, offsets)
+
+    def save(self, sidecar: Optional[str] = None) -> str:
+        sidecar = sidecar or default_sidecar_path(self.path)
+        size, mtime_ns, digest = self.key
+        typecode = "I" if size < 2**32 else "Q"
+        fmt_json = json.dumps([list(e) for e in self.fmt_table]).encode("utf-8")
+        types = sorted(self._offsets)
+
+        tmp = sidecar + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(
+                _HEADER.pack(
+                    _MAGIC, typecode.encode("ascii"), size, mtime_ns, digest, len(fmt_json), len(types)
+                )
+            )
+            f.write(fmt_json)
+            for typ in types:
+                f.write(_DIR_ENTRY.pack(typ, len(self._offsets[typ])))
+            for typ in types:
+                offs = self._offsets[typ]
+                if offs.typecode != typecode:
+                    offs = array(typecode, offs)
+                f.write(offs.tobytes())
+        os.replace(tmp, sidecar)
+        return sidecar
+
+    @classmethod
+    def load(cls, path: str, sidecar: Optional[str] = None) -> Optional["LogIndex"]:
+        """Load the sidecar, or return None if it is missing, corrupt or stale."""
+        path = os.path.abspath(path)
+        sidecar = sidecar or default_sidecar_path(path)
+        try:
+            with open(sidecar, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        try:
+            magic, typecode_b, size, mtime_ns, digest, json_len, n_types = _HEADER.unpack_from(data, 0)
+            if magic != _MAGIC:
+                return None
+            if (size, mtime_ns, digest) != file_key(path):
+                return None
+
+            pos = _HEADER.size
+            fmt_table = [tuple(e) for e in json.loads(data[pos : pos + json_len])]
+            pos += json_len
+
+            directory = []
+            for _ in range(n_types):
+                directory.append(_DIR_ENTRY.unpack_from(data, pos))
+                pos += _DIR_ENTRY.size
+
+            typecode = typecode_b.decode("ascii")
+            itemsize = array(typecode).itemsize
+            offsets: Dict[int, array] = {}
+            for typ, count in directory:
+                offs = array(typecode)
+                offs.frombytes(data[pos : pos + count * itemsize])
+                offsets[typ] = offs
+                pos += count * itemsize
+        except (struct.error, ValueError, OSError):
+            return None
+
+        return cls(path, (size, mtime_ns, digest), fmt_table, offsets)  # type: ignore[arg-type]
+
+    @classmethod
+    def load_or_build(cls, path: str, sidecar: Optional[str] = None) -> "LogIndex":
+        """Return a valid index, rebuilding (and re-saving) it when the log changed."""
+        index = cls.load(path, sidecar)
+        if index is not None:
+            return index
+
+        index = cls.build(path)
+        try:
+            index.save(sidecar)
+        except OSError:
+            pass  # read-only location: keep the in-memory index
+        return index
@@ -1,19 +1,74 @@
+import asyncio
+import hashlib
+import json
 import mmap
 import os
 import struct
-from concurrent.futures import ProcessPoolExecutor
-from typing import Any, Dict, Iterator, List, Tuple
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import aclosing, nullcontext
+from multiprocessing import shared_memory
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    ContextManager,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 from config import (
     AP_TO_STRUCT,
     BINARY_FIELDS,
     BLOCK_SIZE,
+    BOUNDARY_SEARCH_LIMIT,
+    FMT_FORMAT,
     FMT_LENGTH,
     FMT_MSG_TYPE,
+    MAX_IN_FLIGHT,
     MAX_WORKERS,
     CHAR_TO_DIVIDE,
     START_SYNC_MARKER,
 )
+from business_logic.boundaries import align_block, split_range
+from business_logic.columnar import Columns, columns_block, concat_columns, frame_lengths, gather_columns
+from business_logic.decoders import compile_decoder, resolve_fields
+from business_logic.filters import (
+    FrameFilter,
+    Where,
+    WhereFilter,
+    changed_columns,
+    filter_tests,
+    filter_types,
+    parse_where,
+)
+from business_logic.log_index import LogIndex
+from business_logic.records import compile_message_factory
+from business_logic.schema import FmtScanner, compile_struct
+from business_logic.scheduling import (
+    Query,
+    aflatten,
+    aiter_batches,
+    aiter_ordered,
+    iter_ordered,
+    shutting_down,
+    window_for_memory,
+)
+from business_logic.stats import ParseStats, acollect, collect, iter_offsets, iter_range, timed
+from business_logic.time_window import TimeSeeker, in_window, message_time, narrow_window, select_window
+from business_logic.type_search import MsgFilter, iter_type_hits, prefer_direct_search, resolve_types, search_hits
+
+if TYPE_CHECKING:
+    from business_logic.session import ParserSession
 
 
 def _decode_str(b: bytes) -> str:
@@ -26,20 +81,8 @@ def _ap_fmt_to_struct(fmt_chars: List[str]) -> str:
     return "<" + "".join(AP_TO_STRUCT.get(c, "") for c in fmt_chars)
 
 
-def _process_block(
-    path: str,
-    start: int,
-    end: int,
-    fmt_cache_raw: Dict[int, Dict[str, Any]],
-    wanted_type: int | None,
-) -> List[Dict[str, Any]]:
-    """
-    Parse one block of the file.
-    Rebuilds struct.Struct objects locally to avoid pickling.
-    """
-    messages: List[Dict[str, Any]] = []
-
-    # Rebuild struct objects inside worker (not picklable across processes)
+def _rebuild_fmt_cache(fmt_cache_raw: Dict[int, Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """Rebuild struct objects inside worker (not picklable across processes)."""
     fmt_cache = {}
     for typ, info in fmt_cache_raw.items():
         struct_fmt = _ap_fmt_to_struct(info["format_chars"])
@@ -49,45 +92,406 @@ def _process_block(
             "struct_obj": struct.Struct(struct_fmt),
             "columns": info["columns"],
             "format_chars": info["format_chars"],
+            "decoder": compile_decoder(info, detach=True),
+        }
+    return fmt_cache
+
+
+# messages, or (messages, block stats as a dict) when the block is instrumented
+BlockResult = Union[List[Dict[str, Any]], Tuple[List[Dict[str, Any]], Dict[str, Any]]]
+
+
+def _decoders(
+    fmt_cache: Dict[int, Dict[str, Any]],
+    fields: Tuple[str, ...] | None = None,
+    records: bool = False,
+    frame_filter: FrameFilter | None = None,
+) -> Dict[int, Any]:
+    """
+    type → decoder, for the projection *fields* if given (compiled once per
+    FMT definition), behind the tests of *frame_filter* if given.
+    """
+    if fields is None:
+        decoders = {typ: info["decoder"] for typ, info in fmt_cache.items()}
+    else:
+        decoders = {
+            typ: compile_message_factory(info, records, detach=True, fields=fields) for typ, info in fmt_cache.items()
         }
+    return decoders if frame_filter is None else frame_filter.wrap(fmt_cache, decoders)
+
+
+def _block_filter(where: Where | None) -> FrameFilter | None:
+    """A block's own filter: changed() starts over in every block (the parent drops the repeats)."""
+    return FrameFilter(where) if where is not None else None
+
+
+def _process_block(
+    path: str,
+    start: int,
+    end: int,
+    fmt_cache_raw: Dict[int, Dict[str, Any]],
+    wanted_types: FrozenSet[int] | None,
+    with_stats: bool = False,
+    direct: bool = False,
+    fields: Tuple[str, ...] | None = None,
+    where: Where | None = None,
+) -> BlockResult:
+    """
+    Parse one block of the file, its ends first moved onto real frames.
+    Rebuilds struct.Struct objects locally to avoid pickling.
+    """
+    fmt_cache = _rebuild_fmt_cache(fmt_cache_raw)
 
     with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
-        pos = start
-        while pos < end:
-            pos = mm.find(START_SYNC_MARKER, pos)
-            if pos == -1 or pos + 3 > end:
-                break
+        start, end = align_block(mm, start, end, frame_lengths(fmt_cache))
+        return _parse_range(mm, start, end, fmt_cache, wanted_types, with_stats, direct, fields, where)
 
-            msg_type = mm[pos + 2]
-            fmt = fmt_cache.get(msg_type)
-            if fmt is None:
-                pos += 1
-                continue
 
-            if wanted_type is not None and wanted_type != msg_type:
-                pos += fmt["Length"]
-                continue
+def _parse_range(
+    mm: Any,
+    start: int,
+    end: int,
+    fmt_cache: Dict[int, Dict[str, Any]],
+    wanted_types: FrozenSet[int] | None,
+    with_stats: bool = False,
+    direct: bool = False,
+    fields: Tuple[str, ...] | None = None,
+    where: Where | None = None,
+) -> BlockResult:
+    """
+    Parse the frames starting in [start, end) of an open buffer.
+    With *with_stats*, returns (messages, block stats) for the parent to merge.
+    With *direct*, the wanted types are searched for instead of walking
+    every frame (see type_search). With *fields*, messages only have those
+    columns (see decoders.resolve_fields), and with *where* only the frames
+    the filter matches are decoded (see filters): the rest never crosses the pool.
+    """
+    if direct:
+        stats = ParseStats() if with_stats else None
+        hits = search_hits(mm, start, end, wanted_types, frame_lengths(fmt_cache), stats)
+        return _parse_offsets(mm, hits, fmt_cache, with_stats, fields, where, stats)
+    decoders = _decoders(fmt_cache, fields, frame_filter=_block_filter(where))
+    if with_stats:
+        stats = ParseStats()
+        return list(iter_range(mm, start, end, fmt_cache, decoders, wanted_types, stats)), stats.to_dict()
 
-            try:
-                values = fmt["struct_obj"].unpack_from(mm, pos + 3)
-            except struct.error:
-                pos += 1
-                continue
+    messages: List[Dict[str, Any]] = []
+
+    pos = start
+    while pos < end:
+        pos = mm.find(START_SYNC_MARKER, pos)
+        if pos == -1 or pos + 3 > end:
+            break
 
-            msg = dict(zip(fmt["columns"], values))
+        msg_type = mm[pos + 2]
+        fmt = fmt_cache.get(msg_type)
+        if fmt is None:
+            pos += 1
+            continue
 
-            msg = _apply_scaling_and_decode(msg, fmt)
+        if wanted_types is not None and msg_type not in wanted_types:
+            pos += fmt["Length"]
+            continue
+
+        try:
+            msg = decoders[msg_type](mm, pos + 3)
+        except struct.error:
+            pos += 1
+            continue
 
-            msg["mavpackettype"] = fmt["name"]
+        if msg is not None:
             messages.append(msg)
+        pos += fmt["Length"]
+
+    return messages
 
-            pos += fmt["Length"]
+
+def _process_offsets(
+    path: str,
+    offsets: Sequence[int],
+    fmt_cache_raw: Dict[int, Dict[str, Any]],
+    with_stats: bool = False,
+    fields: Tuple[str, ...] | None = None,
+    where: Where | None = None,
+) -> BlockResult:
+    """Decode the messages at the given (indexed) offsets."""
+    fmt_cache = _rebuild_fmt_cache(fmt_cache_raw)
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return _parse_offsets(mm, offsets, fmt_cache, with_stats, fields, where)
+
+
+def _parse_offsets(
+    mm: Any,
+    offsets: Sequence[int],
+    fmt_cache: Dict[int, Dict[str, Any]],
+    with_stats: bool = False,
+    fields: Tuple[str, ...] | None = None,
+    where: Where | None = None,
+    stats: ParseStats | None = None,
+) -> BlockResult:
+    """Decode the messages at *offsets*; with *with_stats*, recorded in *stats* (default new ones)."""
+    decoders = _decoders(fmt_cache, fields, frame_filter=_block_filter(where))
+    if with_stats:
+        stats = ParseStats() if stats is None else stats
+        return list(iter_offsets(mm, offsets, fmt_cache, decoders, stats)), stats.to_dict()
+
+    messages: List[Dict[str, Any]] = []
+    for pos in offsets:
+        msg_type = mm[pos + 2]
+        if msg_type not in fmt_cache:
+            continue
+        try:
+            msg = decoders[msg_type](mm, pos + 3)
+        except struct.error:
+            continue
+        if msg is not None:
+            messages.append(msg)
 
     return messages
 
 
+# Per-worker state, filled by _init_worker and on first use
+_WORKER_SCHEMAS: Dict[str, Dict[int, Dict[str, Any]]] = {}  # schema key → fmt cache
+_WORKER_MMAPS: Dict[str, Tuple[Tuple[int, int], Any, mmap.mmap]] = {}  # path → ((size, mtime), file, mmap)
+
+
+def schema_key(fmt_cache_raw: Dict[int, Dict[str, Any]]) -> str:
+    """Content hash of a picklable FMT cache; equal schemas share compiled structs."""
+    blob = json.dumps(sorted(fmt_cache_raw.items()), sort_keys=True).encode("utf-8")
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+
+def _init_worker(schemas: Dict[str, Dict[int, Dict[str, Any]]]) -> None:
+    """Pool initializer: compile every known schema once per worker."""
+    for key, fmt_cache_raw in schemas.items():
+        _WORKER_SCHEMAS[key] = _rebuild_fmt_cache(fmt_cache_raw)
+
+
+def _worker_schema(key: str, fmt_cache_raw: Optional[Dict[int, Dict[str, Any]]]) -> Dict[int, Dict[str, Any]]:
+    fmt_cache = _WORKER_SCHEMAS.get(key)
+    if fmt_cache is None:
+        if fmt_cache_raw is None:
+            raise KeyError(f"Schema {key} is not installed in this worker")
+        fmt_cache = _WORKER_SCHEMAS[key] = _rebuild_fmt_cache(fmt_cache_raw)
+    return fmt_cache
+
+
+def _worker_mmap(path: str) -> mmap.mmap:
+    """mmap of *path*, kept open for the worker's lifetime and remapped when the file changes."""
+    st = os.stat(path)
+    stamp = (st.st_size, st.st_mtime_ns)
+    cached = _WORKER_MMAPS.get(path)
+    if cached is not None:
+        if cached[0] == stamp:
+            return cached[2]
+        cached[2].close()
+        cached[1].close()
+
+    f = open(path, "rb")
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _WORKER_MMAPS[path] = (stamp, f, mm)
+    return mm
+
+
+def _session_block(
+    path: str,
+    start: int,
+    end: int,
+    key: str,
+    fmt_cache_raw: Optional[Dict[int, Dict[str, Any]]],
+    wanted_types: FrozenSet[int] | None,
+    with_stats: bool = False,
+    direct: bool = False,
+    fields: Tuple[str, ...] | None = None,
+    where: Where | None = None,
+) -> BlockResult:
+    """_process_block using the worker's cached schema and mmap."""
+    mm = _worker_mmap(path)
+    fmt_cache = _worker_schema(key, fmt_cache_raw)
+    start, end = align_block(mm, start, end, frame_lengths(fmt_cache))
+    return _parse_range(mm, start, end, fmt_cache, wanted_types, with_stats, direct, fields, where)
+
+
+def _session_offsets(
+    path: str,
+    offsets: Sequence[int],
+    key: str,
+    fmt_cache_raw: Optional[Dict[int, Dict[str, Any]]],
+    with_stats: bool = False,
+    fields: Tuple[str, ...] | None = None,
+    where: Where | None = None,
+) -> BlockResult:
+    """_process_offsets using the worker's cached schema and mmap."""
+    fmt_cache = _worker_schema(key, fmt_cache_raw)
+    return _parse_offsets(_worker_mmap(path), offsets, fmt_cache, with_stats, fields, where)
+
+
+def _iter_frames(
+    mm: Any,
+    start: int,
+    end: int,
+    frame_sizes: Dict[int, Tuple[int, int]],
+    wanted_types: FrozenSet[int] | None,
+    direct: bool = False,
+    tests: Dict[int, Any] | None = None,
+) -> Iterator[Tuple[int, int]]:
+    """
+    (offset, frame size) of every complete matching frame starting in [start, end).
+    With *direct*, the wanted types are searched for instead of walking every frame.
+    Frames of the types of *tests* (see filters.filter_tests) must pass theirs.
+    """
+    file_size = len(mm)
+    tests = tests or {}
+    if direct:
+        lengths = {typ: length for typ, (length, _) in frame_sizes.items()}
+        for pos in iter_type_hits(mm, start, end, wanted_types, lengths):
+            frame_size = frame_sizes[mm[pos + 2]][1]
+            test = tests.get(mm[pos + 2])
+            if pos + frame_size <= file_size and (test is None or test(mm, pos + 3)):
+                yield pos, frame_size
+        return
+
+    pos = start
+    while pos < end:
+        pos = mm.find(START_SYNC_MARKER, pos)
+        if pos == -1 or pos + 3 > end:
+            break
+
+        sizes = frame_sizes.get(mm[pos + 2])
+        if sizes is None:
+            pos += 1
+            continue
+
+        length, frame_size = sizes
+        if wanted_types is not None and mm[pos + 2] not in wanted_types:
+            pos += length
+            continue
+
+        if pos + frame_size > file_size:
+            pos += 1
+            continue
+
+        test = tests.get(mm[pos + 2])
+        if test is None or test(mm, pos + 3):
+            yield pos, frame_size
+        pos += length
+
+
+def _frame_tests(where: Where | None, schema: Dict[int, Dict[str, Any]] | None) -> Dict[int, Any] | None:
+    """Tests of the raw-frame workers: the filter without changed(), which the parent's decoders apply."""
+    return filter_tests(schema, where) if where is not None and schema is not None else None
+
+
+def _pack_block(
+    path: str,
+    start: int,
+    end: int,
+    frame_sizes: Dict[int, Tuple[int, int]],
+    wanted_types: FrozenSet[int] | None,
+    shm_name: str,
+    direct: bool = False,
+    where: Where | None = None,
+    schema: Dict[int, Dict[str, Any]] | None = None,
+) -> int:
+    """
+    Shared-memory variant of _process_block.
+    Copies every matching raw frame (header + payload) back to back into the
+    shared-memory segment *shm_name* and returns the number of bytes used.
+    Decoding is left to the consumer, so nothing is pickled but one int.
+    With *where*, frames the filter rejects (tested against the FMT *schema*)
+    are not copied.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    used = 0
+    try:
+        out = shm.buf
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            src = memoryview(mm)
+            start, end = align_block(mm, start, end, {typ: length for typ, (length, _) in frame_sizes.items()})
+            tests = _frame_tests(where, schema)
+            for pos, frame_size in _iter_frames(mm, start, end, frame_sizes, wanted_types, direct, tests):
+                out[used : used + frame_size] = src[pos : pos + frame_size]
+                used += frame_size
+            src.release()
+        del out
+    finally:
+        shm.close()
+    return used
+
+
+def _pack_frames(
+    path: str,
+    start: int,
+    end: int,
+    frame_sizes: Dict[int, Tuple[int, int]],
+    wanted_types: FrozenSet[int] | None,
+    direct: bool = False,
+    where: Where | None = None,
+    schema: Dict[int, Dict[str, Any]] | None = None,
+) -> bytes:
+    """Record-mode variant of _process_block: the matching raw frames, back to back."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start, end = align_block(mm, start, end, {typ: length for typ, (length, _) in frame_sizes.items()})
+        frames = _iter_frames(mm, start, end, frame_sizes, wanted_types, direct, _frame_tests(where, schema))
+        return b"".join(mm[pos : pos + size] for pos, size in frames)
+
+
+def _pack_offsets(
+    path: str,
+    offsets: Sequence[int],
+    frame_sizes: Dict[int, Tuple[int, int]],
+    where: Where | None = None,
+    schema: Dict[int, Dict[str, Any]] | None = None,
+) -> bytes:
+    """Record-mode variant of _process_offsets."""
+    tests = _frame_tests(where, schema) or {}
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        frames = []
+        for pos in offsets:
+            sizes = frame_sizes.get(mm[pos + 2])
+            if sizes is None or pos + sizes[1] > len(mm):
+                continue
+            test = tests.get(mm[pos + 2])
+            if test is None or test(mm, pos + 3):
+                frames.append(mm[pos : pos + sizes[1]])
+        return b"".join(frames)
+
+
+def _iter_packed(
+    buf: Any,
+    used: int,
+    fmt_cache: Dict[int, Dict[str, Any]],
+    stats: ParseStats | None = None,
+    decoders: Dict[int, Any] | None = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Decode frames packed by _pack_block / _pack_frames, building each
+    message on demand (with *decoders*, default the FMT cache's own).
+    """
+    decoders = _decoders(fmt_cache) if decoders is None else decoders
+    pos = 0
+    if stats is not None:
+        offsets = []
+        while pos < used:
+            offsets.append(pos)
+            pos += 3 + fmt_cache[buf[pos + 2]]["struct_obj"].size
+        yield from iter_offsets(buf, offsets, fmt_cache, decoders, stats)
+        return
+
+    while pos < used:
+        msg_type = buf[pos + 2]
+        msg = decoders[msg_type](buf, pos + 3)
+        if msg is not None:
+            yield msg
+        pos += 3 + fmt_cache[msg_type]["struct_obj"].size
+
+
 def _apply_scaling_and_decode(msg: dict, fmt: dict) -> dict:
-    """Decode bytes and apply scaling factors."""
+    """
+    Decode bytes and apply scaling factors.
+    Generic reference for the specialized decoders (see decoders.py).
+    """
     for col, val in msg.items():
         if isinstance(val, bytes) and col not in BINARY_FIELDS:
             msg[col] = _decode_str(val)
@@ -105,28 +509,284 @@ def _apply_scaling_and_decode(msg: dict, fmt: dict) -> dict:
 
 
 class ParserMultiprocessing:
-    def __init__(self, path: str):
+    def __init__(
+        self,
+        path: str,
+        use_index: bool = False,
+        transport: str = "pickle",
+        block_size: int | None = None,
+        max_workers: int = MAX_WORKERS,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        memory_limit: int | None = None,
+        session: "ParserSession | None" = None,
+        records: bool = False,
+        stats: bool = False,
+    ):
+        """
+        *transport* selects how block results come back from the workers:
+        "pickle" returns lists of dicts, "shm" has workers copy matching raw
+        frames into shared memory that the parent decodes lazily.
+        At most *max_in_flight* blocks are parsed ahead of the consumer;
+        *memory_limit* (bytes) caps that window further, shrinking blocks
+        if needed, so decoded-but-unread results stay under the limit.
+        With a *session*, work runs on the session's warm pool instead of a
+        pool created per call (see ParserSession.open).
+        With *records*, workers send back the matching raw frames and the
+        parent wraps them in lazy record objects (see
+        records.compile_record_class): per-type classes cannot be pickled.
+        With *stats*, recv_match() records what it reads in self.stats (see
+        stats.ParseStats): pickle-transport workers measure their blocks and
+        the parent's waits on the pool count as ipc_wait. The shm transport
+        and records mode, which ship raw frames, are measured in the parent
+        only: counts, decode and waits, but no worker-side search or resyncs.
+        """
+        if transport not in ("pickle", "shm"):
+            raise ValueError(f"Unknown transport: {transport}")
         self.path = os.path.abspath(path)
+        self._session = session
         self._fmt_cache: Dict[int, Dict[str, Any]] = {}
-        self.max_workers = MAX_WORKERS
-        self._build_fmt_cache()
-
-    def recv_match(self, msg_name: str | None = None) -> Iterator[Dict[str, Any]]:
+        self.max_workers = max_workers
+        self.block_size, self.max_in_flight = window_for_memory(
+            block_size or BLOCK_SIZE, memory_limit, max_in_flight
+        )
+        self.transport = transport
+        self.records = records
+        self.stats: ParseStats | None = ParseStats() if stats else None
+        self._seeker: TimeSeeker | None = None
+        self._seeker_key: Any = None
+        self.window_stats: Dict[str, int] = {}  # lookup/read cost of the last time-window query
+        self._index: LogIndex | None = None
+        self._fmts: FmtScanner | None = None  # FMT records beyond the header are read block by block
+        if use_index:
+            self._index = LogIndex.load_or_build(self.path)
+            for entry in self._index.fmt_table:
+                self._add_fmt(*entry)
+        elif os.path.getsize(self.path) == 0:
+            self._fmts = FmtScanner(b"", self._add_fmt)
+        else:
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                self._fmts = FmtScanner(mm, self._add_fmt)
+        self._add_fmt_self()
+
+    def recv_match(
+        self,
+        msg_name: MsgFilter = None,
+        start_us: int | None = None,
+        end_us: int | None = None,
+        fields: str | Iterable[str] | None = None,
+        where: WhereFilter = None,
+    ) -> Iterator[Dict[str, Any]]:
         """
         Yield messages in file order.
-        If msg_name is given, only return messages of that type.
+        If msg_name is given (one name or several), only return messages of
+        those types; workers search for rare types directly instead of
+        walking every frame (see type_search).
+        With *start_us* and/or *end_us*, only messages with
+        start_us <= TimeUS < end_us are returned: the parent finds the window
+        by binary search on TimeUS and only its blocks go to the workers
+        (self.window_stats reports the bytes touched).
+        With *fields*, messages only have those columns (TimeUS is kept for
+        time-window queries): pickle-transport workers neither decode nor
+        send back the others (see decoders.resolve_fields).
+        With *where* (an expression, or one per type name; see filters), the
+        workers only decode, or copy, the frames it matches: the others are
+        rejected on their raw values and never cross the pool.
         """
-        wanted_type = None
-        if msg_name:
-            for typ, info in self._fmt_cache.items():
-                if info["name"] == msg_name:
-                    wanted_type = typ
-                    break
-
-        blocks = self._make_blocks()
-
-        # Picklable version of fmt_cache (no struct objects)
-        fmt_cache_raw = {
+        messages = self._recv_match(msg_name, start_us, end_us, fields, where)
+        if self.stats is not None:
+            return timed(messages, self.stats, "total")
+        return messages
+
+    def arecv_match(
+        self,
+        msg_name: MsgFilter = None,
+        start_us: int | None = None,
+        end_us: int | None = None,
+        batches: bool = False,
+        fields: str | Iterable[str] | None = None,
+        where: WhereFilter = None,
+    ) -> AsyncIterator[Any]:
+        """
+        recv_match() for asyncio: the same messages, for `async for`.
+        Pickle-transport blocks are awaited on the pool, so the event loop
+        never waits on them; the shm transport and records mode decode in
+        the parent, which then runs on a helper thread a batch at a time.
+        With *batches*, messages come as lists (one per block).
+        Cancelling the consuming task, or closing the iterator (e.g. with
+        contextlib.aclosing), cancels the blocks not started yet.
+        Concurrent queries share a *session*'s pool.
+        """
+        if self.records or self.transport == "shm":
+            results = aiter_batches(self.recv_match(msg_name, start_us, end_us, fields, where))
+        else:
+            results = self._arecv_batches(msg_name, start_us, end_us, fields, where)
+        return results if batches else aflatten(results)
+
+    async def _arecv_batches(
+        self,
+        msg_name: MsgFilter,
+        start_us: int | None,
+        end_us: int | None,
+        fields: str | Iterable[str] | None,
+        where: WhereFilter,
+    ) -> AsyncIterator[List[Any]]:
+        clause = parse_where(where)
+        # Planning reads the file (time search, selectivity samples): off the loop too
+        query = await asyncio.to_thread(self._query, msg_name, start_us, end_us, clause)
+        if query is None:
+            return
+        fn, tasks = self._tasks(*query, self._projection(query, fields, start_us, end_us, clause), clause)
+        frame_filter = FrameFilter(clause) if clause is not None else None
+        with self._pool(wait=False) as executor:
+            results = acollect(aiter_ordered(executor, fn, tasks, self.max_in_flight), self.stats)
+            async with aclosing(results):
+                async for batch in results:
+                    if frame_filter is not None:
+                        batch = list(frame_filter.changes(batch))
+                    batch = select_window(batch, start_us, end_us)
+                    if batch:
+                        yield batch
+
+    def _recv_match(
+        self,
+        msg_name: MsgFilter,
+        start_us: int | None,
+        end_us: int | None,
+        fields: str | Iterable[str] | None,
+        where: WhereFilter,
+    ) -> Iterator[Dict[str, Any]]:
+        clause = parse_where(where)
+        query = self._query(msg_name, start_us, end_us, clause)
+        if query is None:
+            return
+        projection = self._projection(query, fields, start_us, end_us, clause)
+
+        if start_us is None and end_us is None:
+            yield from self._recv(*query, projection, clause)
+            return
+
+        for msg in self._recv(*query, projection, clause):
+            if in_window(message_time(msg), start_us, end_us):
+                yield msg
+
+    def _query(
+        self, msg_name: MsgFilter, start_us: int | None, end_us: int | None, where: Where | None = None
+    ) -> Query | None:
+        """What to read for a query (see scheduling.Query); None if nothing can match."""
+        wanted_types = resolve_types(self._fmt_cache, msg_name, self._scan_all_fmts)
+        if wanted_types is not None and not wanted_types:
+            return None
+        wanted_types = filter_types(self._fmt_cache, wanted_types, where, self._scan_all_fmts)
+        indexed = wanted_types is not None and self._index is not None
+
+        if start_us is None and end_us is None:
+            if indexed:
+                return wanted_types, self._index.offsets_for_types(wanted_types), None, False
+            return wanted_types, None, self._make_blocks(), self._prefer_direct_search(wanted_types)
+
+        st = os.stat(self.path)
+        key = (st.st_size, st.st_mtime_ns, len(self._fmt_cache))
+        if self._seeker is None or self._seeker_key != key:
+            self._seeker, self._seeker_key = TimeSeeker(self._fmt_cache), key
+        if wanted_types is not None:
+            wanted_types = wanted_types & self._seeker.timed.keys()
+            if not wanted_types:
+                self.window_stats = {"start": 0, "end": 0, "probes": 0, "bytes_touched": 0}
+                return None
+
+        indexed_offsets = None
+        length = 0
+        if indexed:
+            indexed_offsets = self._index.offsets_for_types(wanted_types)
+            length = max(self._fmt_cache[typ]["Length"] for typ in wanted_types)
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            offsets, start, end, self.window_stats = narrow_window(
+                mm, self._seeker, start_us, end_us, indexed_offsets, length
+            )
+        if offsets is not None:
+            return wanted_types, offsets, None, False
+        return wanted_types, None, self._make_blocks(start, end), self._prefer_direct_search(wanted_types)
+
+    def _projection(
+        self,
+        query: Query,
+        fields: str | Iterable[str] | None,
+        start_us: int | None,
+        end_us: int | None,
+        where: Where | None,
+    ) -> Tuple[str, ...] | None:
+        """
+        The decoders' projection for a planned query (see decoders.resolve_fields),
+        with the columns the consumer selects on: TimeUS and those of changed().
+        """
+        keep = ("TimeUS",) if start_us is not None or end_us is not None else ()
+        return resolve_fields(self._fmt_cache, query[0], fields, keep + changed_columns(where))
+
+    def _recv(
+        self,
+        wanted_types: FrozenSet[int] | None,
+        offsets: Sequence[int] | None,
+        blocks: List[Tuple[int, int]] | None,
+        direct: bool,
+        fields: Tuple[str, ...] | None = None,
+        where: Where | None = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Messages of a query, in file order."""
+        if self.records and (offsets is not None or self.transport == "pickle"):
+            yield from self._recv_match_records(wanted_types, offsets, blocks, direct, fields, where)
+            return
+
+        if offsets is None and self.transport == "shm":
+            yield from self._recv_match_shm(blocks, wanted_types, direct, fields, where)
+            return
+
+        fn, tasks = self._tasks(wanted_types, offsets, blocks, direct, fields, where)
+        with self._pool() as executor:
+            # Collect results in order
+            messages = collect(iter_ordered(executor, fn, tasks, self.max_in_flight), self.stats)
+            # Blocks filter changed() on their own: drop the repeats where they meet
+            yield from messages if where is None else FrameFilter(where).changes(messages)
+
+    def _tasks(
+        self,
+        wanted_types: FrozenSet[int] | None,
+        offsets: Sequence[int] | None,
+        blocks: List[Tuple[int, int]] | None,
+        direct: bool,
+        fields: Tuple[str, ...] | None = None,
+        where: Where | None = None,
+    ) -> Tuple[Callable[..., Any], Iterator[Tuple[Any, ...]]]:
+        """Pickle-transport worker function and its arguments, block by block in file order."""
+        fmt_cache_raw = self._fmt_cache_raw()
+        if self._session is not None:
+            # Workers keep compiled schemas by key; ship the raw schema only if needed
+            schema = self._session.schema_args(fmt_cache_raw)
+        with_stats = self.stats is not None
+
+        if offsets is not None:
+            step = max(1, self.block_size // max(self._fmt_cache[typ]["Length"] for typ in wanted_types))
+            chunks = (offsets[i : i + step] for i in range(0, len(offsets), step))
+            if self._session is not None:
+                return _session_offsets, ((self.path, chunk, *schema, with_stats, fields, where) for chunk in chunks)
+            return _process_offsets, ((self.path, chunk, fmt_cache_raw, with_stats, fields, where) for chunk in chunks)
+
+        def block_tasks() -> Iterator[Tuple[Any, ...]]:
+            raw = fmt_cache_raw
+            for start, end in blocks:
+                # FMT records up to where the worker may move the block end
+                if self._scan_fmts(end + BOUNDARY_SEARCH_LIMIT):
+                    raw = self._fmt_cache_raw()
+                if self._session is not None:
+                    schema_args = self._session.schema_args(raw)
+                    yield self.path, start, end, *schema_args, wanted_types, with_stats, direct, fields, where
+                else:
+                    yield self.path, start, end, raw, wanted_types, with_stats, direct, fields, where
+
+        return (_process_block if self._session is None else _session_block), block_tasks()
+
+    def _fmt_cache_raw(self) -> Dict[int, Dict[str, Any]]:
+        """Picklable version of fmt_cache (no struct objects)."""
+        return {
             typ: {
                 "Length": info["Length"],
                 "name": info["name"],
@@ -136,80 +796,203 @@ class ParserMultiprocessing:
             for typ, info in self._fmt_cache.items()
         }
 
-        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = [
-                executor.submit(
-                    _process_block,
-                    self.path,
-                    start,
-                    end,
-                    fmt_cache_raw,
-                    wanted_type,
-                )
-                for start, end in blocks
-            ]
-            # Collect results in order
-            for future in futures:
-                yield from future.result()
-
-    def _build_fmt_cache(self) -> None:
-        marker = START_SYNC_MARKER + bytes([FMT_MSG_TYPE])  # b'\xA3\x95\x80'
-        fmt_struct = struct.Struct("<BB4s16s64s")
+    def _scan_fmts(self, end: int) -> bool:
+        """Read the FMT records before *end* not read yet; True if there were any."""
+        if self._fmts is None or end <= self._fmts.scanned:
+            return False
+        size = os.path.getsize(self.path)
+        if self._fmts.complete(size):
+            return False
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return self._fmts.advance(mm, end)
 
+    def _scan_all_fmts(self, names: Iterable[str] | None = None) -> None:
+        """
+        Read the log's remaining FMT records, or, for a type lookup by *names*,
+        only up to theirs when the schema cache knows them (FmtScanner.seek).
+        """
+        if names is not None and self._fmts is not None and os.path.getsize(self.path):
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if self._fmts.seek(mm, names):
+                    return
+        self._scan_fmts(os.path.getsize(self.path))
+
+    def _pool(self, wait: bool = True) -> ContextManager[Executor]:
+        """The session's pool (left running), or a pool for this call only."""
+        if self._session is not None:
+            return nullcontext(self._session.executor)
+        return shutting_down(ProcessPoolExecutor(max_workers=self.max_workers), wait)
+
+    def _prefer_direct_search(self, wanted_types: FrozenSet[int] | None) -> bool:
+        """Selectivity heuristic of type_search, sampled in the parent."""
+        if not wanted_types or os.path.getsize(self.path) == 0:
+            return False
         with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
-            pos = 0
-            while True:
-                pos = mm.find(marker, pos)
-                if pos == -1:
-                    break
-                try:
-                    typ, length, name_b, fmt_b, cols_b = fmt_struct.unpack_from(mm, pos + 3)
-                except struct.error:
-                    pos += 1
-                    continue
-
-                name = _decode_str(name_b)
-                if not name.isalnum():
-                    pos += 1
-                    continue
-
-                fmt_raw = _decode_str(fmt_b)
-                cols_raw = _decode_str(cols_b)
-
-                struct_fmt = _ap_fmt_to_struct(list(fmt_raw))
-                struct_obj = struct.Struct(struct_fmt)
-
-                self._fmt_cache[typ] = {
-                    "Length": length,
-                    "name": name,
-                    "struct_obj": struct_obj,
-                    "columns": cols_raw.split(","),
-                    "format_chars": list(fmt_raw),
-                }
-                pos += FMT_LENGTH
+            return prefer_direct_search(mm, wanted_types, frame_lengths(self._fmt_cache))
+
+    def _frame_sizes(self) -> Dict[int, Tuple[int, int]]:
+        """type → (FMT Length, full frame size) for the raw-frame workers."""
+        return {typ: (info["Length"], 3 + info["struct_obj"].size) for typ, info in self._fmt_cache.items()}
+
+    def _recv_match_records(
+        self,
+        wanted_types: FrozenSet[int] | None,
+        offsets: Sequence[int] | None,
+        blocks: List[Tuple[int, int]] | None,
+        direct: bool = False,
+        fields: Tuple[str, ...] | None = None,
+        where: Where | None = None,
+    ) -> Iterator[Any]:
+        frame_sizes = self._frame_sizes()
+        # Workers test the raw frames; changed() needs the frames in order, so the parent's decoders apply it
+        schema = self._fmt_cache_raw() if where is not None else None
+        frame_filter = FrameFilter(where) if where is not None else None
+        if offsets is not None:
+            step = max(1, self.block_size // max(self._fmt_cache[typ]["Length"] for typ in wanted_types))
+            fn: Any = _pack_offsets
+            tasks: Iterator[Tuple[Any, ...]] = (
+                (self.path, offsets[i : i + step], frame_sizes, where, schema) for i in range(0, len(offsets), step)
+            )
+        else:
+
+            def block_tasks() -> Iterator[Tuple[Any, ...]]:
+                sizes, raw = frame_sizes, schema
+                for start, end in blocks:
+                    if self._scan_fmts(end + BOUNDARY_SEARCH_LIMIT):
+                        sizes = self._frame_sizes()
+                        raw = self._fmt_cache_raw() if where is not None else None
+                    yield self.path, start, end, sizes, wanted_types, direct, where, raw
+
+            fn, tasks = _pack_frames, block_tasks()
+
+        with self._pool() as executor:
+            results = iter_ordered(executor, fn, tasks, self.max_in_flight)
+            if self.stats is not None:
+                results = timed(results, self.stats, "ipc_wait")
+            for data in results:
+                decoders = _decoders(self._fmt_cache, fields, self.records, frame_filter)
+                yield from _iter_packed(data, len(data), self._fmt_cache, self.stats, decoders)
+
+    def _recv_match_shm(
+        self,
+        blocks: List[Tuple[int, int]],
+        wanted_types: FrozenSet[int] | None,
+        direct: bool = False,
+        fields: Tuple[str, ...] | None = None,
+        where: Where | None = None,
+    ) -> Iterator[Dict[str, Any]]:
+        # The parent owns every segment: it creates one per submitted block
+        # and unlinks it once read, so only in-flight blocks hold shared memory
+        segments: Deque[shared_memory.SharedMemory] = deque()
+        frame_filter = FrameFilter(where) if where is not None else None
+
+        def tasks() -> Iterator[Tuple[Any, ...]]:
+            frame_sizes: Dict[int, Tuple[int, int]] = {}
+            schema = None
+            for start, end in blocks:
+                if self._scan_fmts(end + BOUNDARY_SEARCH_LIMIT) or not frame_sizes:
+                    frame_sizes = self._frame_sizes()
+                    schema = self._fmt_cache_raw() if where is not None else None
+                    max_frame = max(size for _, size in frame_sizes.values())
+                    # Packed frames can only outgrow the block if a FMT Length is shorter than its payload
+                    growth = max(size / max(length, 1) for length, size in frame_sizes.values())
+                # The worker may move the block end up to BOUNDARY_SEARCH_LIMIT further
+                span = end - start + BOUNDARY_SEARCH_LIMIT
+                shm = shared_memory.SharedMemory(create=True, size=int(span * max(growth, 1.0)) + max_frame)
+                segments.append(shm)
+                yield self.path, start, end, frame_sizes, wanted_types, shm.name, direct, where, schema
+
+        try:
+            with self._pool() as executor:
+                results = iter_ordered(executor, _pack_block, tasks(), self.max_in_flight)
+                if self.stats is not None:
+                    results = timed(results, self.stats, "ipc_wait")
+                for used in results:
+                    shm = segments[0]
+                    # Records outlive the segment, so they get a private copy of it
+                    buf = bytes(shm.buf[:used]) if self.records else shm.buf
+                    decoders = _decoders(self._fmt_cache, fields, self.records, frame_filter)
+                    yield from _iter_packed(buf, used, self._fmt_cache, self.stats, decoders)
+                    del buf
+                    segments.popleft()
+                    shm.close()
+                    shm.unlink()
+        finally:
+            for shm in segments:
+                shm.close()
+                shm.unlink()
+
+    def recv_columns(self, msg_name: str) -> Columns:
+        """
+        Return every message of type *msg_name* as one NumPy array per column,
+        with strings decoded and scaling applied. Blocks are gathered in
+        parallel and concatenated in file order. Requires numpy.
+        """
+        self._scan_all_fmts()  # every block is walked
+        wanted_type = None
+        for typ, info in self._fmt_cache.items():
+            if info["name"] == msg_name:
+                wanted_type = typ
+                break
+        if wanted_type is None:
+            raise ValueError(f"Unknown message type: {msg_name}")
+
+        info = self._fmt_cache[wanted_type]
+        info_raw = {
+            "Length": info["Length"],
+            "name": info["name"],
+            "columns": info["columns"],
+            "format_chars": info["format_chars"],
+        }
+
+        if self._index is not None:
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                columns = gather_columns(mm, self._index.offsets_for(wanted_type), info_raw)
+            return columns
 
+        lengths = frame_lengths(self._fmt_cache)
+        with self._pool() as executor:
+            futures = [
+                executor.submit(columns_block, self.path, start, end, lengths, wanted_type, info_raw)
+                for start, end in self._make_blocks()
+            ]
+            parts = [future.result() for future in futures]
+        return concat_columns(parts, info_raw)
+
+    def _add_fmt(self, typ: int, length: int, name: str, fmt_raw: str, cols_raw: str) -> None:
+        struct_fmt = _ap_fmt_to_struct(list(fmt_raw))
+        struct_obj = compile_struct(struct_fmt)
+
+        info = {
+            "Length": length,
+            "name": name,
+            "struct_obj": struct_obj,
+            "columns": cols_raw.split(","),
+            "format_chars": list(fmt_raw),
+        }
+        # Parent decodes shared-memory segments that are released after each block
+        info["decoder"] = compile_message_factory(info, self.records, detach=True)
+        self._fmt_cache[typ] = info
+
+    def _add_fmt_self(self) -> None:
         # Add FMT message itself
+        fmt_struct = struct.Struct("<BB4s16s64s")
         if FMT_MSG_TYPE not in self._fmt_cache:
             self._fmt_cache[FMT_MSG_TYPE] = {
                 "Length": FMT_LENGTH,
                 "name": "FMT",
                 "struct_obj": fmt_struct,
                 "columns": ["Type", "Length", "Name", "Format", "Columns"],
-                "format_chars": [],
+                "format_chars": list(FMT_FORMAT),
             }
+            self._fmt_cache[FMT_MSG_TYPE]["decoder"] = compile_message_factory(
+                self._fmt_cache[FMT_MSG_TYPE], self.records, detach=True
+            )
 
-    def _make_blocks(self) -> List[Tuple[int, int]]:
-        file_size = os.path.getsize(self.path)
-        blocks: List[Tuple[int, int]] = []
-        start = 0
-
-        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
-            while start < file_size:
-                end = min(start + BLOCK_SIZE, file_size)
-                next_marker = mm.find(START_SYNC_MARKER, end)
-                if next_marker != -1:
-                    end = next_marker
-                blocks.append((start, end))
-                start = end
-
-        return blocks
+    def _make_blocks(self, first: int = 0, last: int | None = None) -> List[Tuple[int, int]]:
+        """
+        Nominal blocks covering [first, last) (default: the whole file).
+        Workers move each cut onto a real frame themselves (boundaries.align_block).
+        """
+        last = os.path.getsize(self.path) if last is None else last
+        return split_range(first, last, self.block_size)
@@ -1,16 +1,33 @@
 import mmap
 import os
 import struct
-from typing import Any, Dict, Iterator
+import time
+from typing import Any, AsyncIterator, Dict, FrozenSet, Iterable, Iterator, Tuple
 
 from config import (
     AP_TO_STRUCT,
-    BINARY_FIELDS,
+    BOUNDARY_SEARCH_LIMIT,
+    FMT_FORMAT,
     FMT_LENGTH,
     FMT_MSG_TYPE,
+    FMT_SCAN_STEP,
+    FOLLOW_POLL_INTERVAL,
     START_SYNC_MARKER,
-    CHAR_TO_DIVIDE,
 )
+from business_logic.boundaries import aligned_cut, split_range
+from business_logic.columnar import Columns, fmt_dtype, frame_lengths, gather_columns, scan_offsets
+from business_logic.decoders import resolve_fields
+from business_logic.filters import FrameFilter, WhereFilter, filter_types, parse_where
+from business_logic.log_index import LogIndex
+from business_logic.records import compile_message_factory
+from business_logic.scheduling import aflatten, aiter_batches
+from business_logic.schema import FmtScanner, compile_struct
+from business_logic.stats import ParseStats, iter_offsets, iter_range, timed
+from business_logic.time_window import TimeSeeker, in_window, message_time, narrow_window
+from business_logic.type_search import MsgFilter, iter_type_hits, prefer_direct_search, resolve_types
+
+
+_FMT_STRUCT = struct.Struct("<BB4s16s64s")
 
 
 def _decode_str(b: bytes) -> str:
@@ -19,84 +36,369 @@ def _decode_str(b: bytes) -> str:
 
 
 class ParserSync:
-    def __init__(self, path: str):
+    def __init__(self, path: str, use_index: bool = False, records: bool = False, stats: bool = False):
+        """
+        If *use_index* is set, the offset index sidecar is loaded (or built
+        and saved on first use) and filtered reads jump straight to the
+        offsets of the wanted type.
+        With *records*, messages are lazy record objects over the mapped
+        file (see records.compile_record_class) instead of dicts.
+        With *stats*, recv_match() records what it reads in self.stats
+        (see stats.ParseStats); otherwise self.stats is None and nothing
+        is measured.
+        """
         self.path = os.path.abspath(path)
-        self.file_size = os.path.getsize(self.path)
+        self.records = records
+        self.stats: ParseStats | None = ParseStats() if stats else None
         self._file = open(self.path, "rb")
-        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mm: Any = None
+        self._remap()
+        self.cursor = 0  # resume offset of follow()
+        self._seeker: TimeSeeker | None = None
+        self._seeker_key: Any = None
+        self.window_stats: Dict[str, int] = {}  # lookup/read cost of the last time-window query
 
         self._fmt_cache: Dict[int, Dict[str, Any]] = {}
-        self._build_fmt_cache()
+        self._index: LogIndex | None = None
+        self._fmts: FmtScanner | None = None  # FMT records beyond the header are read as parsing gets there
+        if use_index:
+            self._index = LogIndex.load_or_build(self.path)
+            for entry in self._index.fmt_table:
+                self._add_fmt(*entry)
+        else:
+            self._fmts = FmtScanner(self._mm, self._add_fmt)
+        self._add_fmt_self()
 
     def __del__(self) -> None:
         try:
-            self._mm.close()
+            # Records reference the map: it is released with the last of them
+            if isinstance(self._mm, mmap.mmap) and not self.records:
+                self._mm.close()
             self._file.close()
         except Exception:
             pass
 
-    def recv_match(self, msg_name: str | None = None) -> Iterator[Dict[str, Any]]:
+    def _remap(self) -> None:
+        """(Re)map the file at its current size; an empty file maps to b""."""
+        old = self._mm
+        self.file_size = os.path.getsize(self.path)
+        if self.file_size:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._mm = b""
+        if isinstance(old, mmap.mmap) and not self.records:
+            try:
+                old.close()
+            except BufferError:
+                pass  # still exported by decoded views: closed when they are gone
+
+    def follow(
+        self,
+        msg_name: str | None = None,
+        poll_interval: float = FOLLOW_POLL_INTERVAL,
+        idle_timeout: float | None = None,
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Yield messages in file order.
-        If msg_name is given, only return messages of that type.
+        Yield messages of a log that is still being written.
+        Starts at self.cursor (0 for a new parser) and, after the last
+        complete frame, waits for the file to grow, remaps it and continues
+        with the new bytes only. FMT records found on the way are added to
+        the cache, so types defined late are picked up. self.cursor always
+        points just past the last consumed frame, so a later call resumes
+        there. Returns after *idle_timeout* seconds without new data
+        (never, if None). A file that shrinks is followed from the start.
         """
-        wanted_type = None
-        if msg_name:
-            for typ, info in self._fmt_cache.items():
-                if info["name"] == msg_name:
-                    wanted_type = typ
+        idle_since = time.monotonic()
+        while True:
+            size = os.path.getsize(self.path)
+            if size < self.cursor:
+                self.cursor = 0
+            if size != self.file_size:
+                self._remap()
+
+            before = self.cursor
+            mm = self._mm
+            end = self.file_size
+            pos = self.cursor
+            while True:
+                nxt = mm.find(START_SYNC_MARKER, pos)
+                if nxt == -1:
+                    # Keep the last byte: it may be the first half of a marker
+                    pos = max(pos, end - 1)
+                    break
+                pos = nxt
+                if pos + 3 > end:
                     break
 
-        yield from self._parse_all(wanted_type)
+                msg_type = mm[pos + 2]
+                fmt = self._fmt_cache.get(msg_type)
+                if fmt is None:
+                    pos += 1
+                    continue
 
-    def _build_fmt_cache(self) -> None:
-        marker = START_SYNC_MARKER + bytes([FMT_MSG_TYPE])
-        fmt_struct = struct.Struct("<BB4s16s64s")
+                if pos + max(fmt["Length"], 3 + fmt["struct_obj"].size) > end:
+                    break  # frame not complete yet
 
-        pos = 0
-        while True:
-            pos = self._mm.find(marker, pos)
-            if pos == -1:
+                if msg_type == FMT_MSG_TYPE:
+                    self._add_fmt_from(mm, pos)
+
+                if msg_name is None or fmt["name"] == msg_name:
+                    msg = fmt["decoder"](mm, pos + 3)
+                    self.cursor = pos + fmt["Length"]
+                    yield msg
+
+                pos += fmt["Length"]
+                self.cursor = pos
+            self.cursor = pos
+
+            if self.cursor != before:
+                idle_since = time.monotonic()
+            elif idle_timeout is not None and time.monotonic() - idle_since >= idle_timeout:
+                return
+            else:
+                time.sleep(poll_interval)
+
+    def recv_match(
+        self,
+        msg_name: MsgFilter = None,
+        start_us: int | None = None,
+        end_us: int | None = None,
+        fields: str | Iterable[str] | None = None,
+        where: WhereFilter = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield messages in file order.
+        If msg_name is given (one name or several), only return messages of
+        those types. Rare types are found by searching for their marker +
+        type bytes instead of walking every frame (see type_search).
+        With *start_us* and/or *end_us*, only messages with
+        start_us <= TimeUS < end_us are returned (messages without a TimeUS
+        never match). The window is found by binary search on TimeUS, and
+        only that part of the file is decoded; self.window_stats reports the
+        bytes touched.
+        With *fields*, messages only have those columns (TimeUS is kept for
+        time-window queries): the others are not unpacked nor decoded (see
+        decoders.resolve_fields).
+        With *where* (an expression, or one per type name; see filters),
+        only the frames it matches are decoded: the others are rejected on
+        their raw values, before any string decoding, scaling or dict.
+        """
+        messages = self._recv_match(msg_name, start_us, end_us, fields, where)
+        if self.stats is not None:
+            return timed(messages, self.stats, "total")
+        return messages
+
+    def arecv_match(
+        self,
+        msg_name: MsgFilter = None,
+        start_us: int | None = None,
+        end_us: int | None = None,
+        batches: bool = False,
+        fields: str | Iterable[str] | None = None,
+        where: WhereFilter = None,
+    ) -> AsyncIterator[Any]:
+        """
+        recv_match() for asyncio, for `async for`: the parser runs on a
+        helper thread a batch of messages at a time (ASYNC_BATCH_SIZE), so
+        the event loop never blocks on it. With *batches*, messages come as
+        lists. Closing the iterator or cancelling its consumer stops parsing.
+        """
+        results = aiter_batches(self.recv_match(msg_name, start_us, end_us, fields, where))
+        return results if batches else aflatten(results)
+
+    def _recv_match(
+        self,
+        msg_name: MsgFilter,
+        start_us: int | None,
+        end_us: int | None,
+        fields: str | Iterable[str] | None,
+        where: WhereFilter,
+    ) -> Iterator[Dict[str, Any]]:
+        clause = parse_where(where)
+        wanted_types = resolve_types(self._fmt_cache, msg_name, self._scan_all_fmts)
+        if wanted_types is not None and not wanted_types:
+            return
+        wanted_types = filter_types(self._fmt_cache, wanted_types, clause, self._scan_all_fmts)
+        windowed = start_us is not None or end_us is not None
+        projection = resolve_fields(self._fmt_cache, wanted_types, fields, ("TimeUS",) if windowed else ())
+        frame_filter = FrameFilter(clause) if clause is not None else None
+
+        if windowed:
+            yield from self._parse_window(wanted_types, start_us, end_us, projection, frame_filter)
+            return
+
+        if wanted_types is not None and self._index is not None:
+            offsets = self._index.offsets_for_types(wanted_types)
+            yield from self._parse_offsets(offsets, projection, frame_filter)
+            return
+
+        yield from self._parse_all(wanted_types, fields=projection, frame_filter=frame_filter)
+
+    def _time_seeker(self) -> TimeSeeker:
+        """Seeker for the current file; its checkpoints are reused until the file or FMT table changes."""
+        key = (self.file_size, len(self._fmt_cache))
+        if self._seeker is None or self._seeker_key != key:
+            self._seeker = TimeSeeker(self._fmt_cache)
+            self._seeker_key = key
+        return self._seeker
+
+    def _parse_window(
+        self,
+        wanted_types: FrozenSet[int] | None,
+        start_us: int | None,
+        end_us: int | None,
+        fields: Tuple[str, ...] | None = None,
+        frame_filter: FrameFilter | None = None,
+    ) -> Iterator[Dict[str, Any]]:
+        seeker = self._time_seeker()
+        if wanted_types is not None:
+            wanted_types = wanted_types & seeker.timed.keys()
+            if not wanted_types:
+                self.window_stats = {"start": 0, "end": 0, "probes": 0, "bytes_touched": 0}
+                return
+
+        indexed = None
+        length = 0
+        if wanted_types is not None and self._index is not None:
+            indexed = self._index.offsets_for_types(wanted_types)
+            length = max(self._fmt_cache[typ]["Length"] for typ in wanted_types)
+        offsets, start, end, self.window_stats = narrow_window(
+            self._mm, seeker, start_us, end_us, indexed, length
+        )
+
+        if offsets is not None:
+            messages = self._parse_offsets(offsets, fields, frame_filter)
+        else:
+            messages = self._parse_all(wanted_types, start, end, fields, frame_filter)
+        for msg in messages:
+            if in_window(message_time(msg), start_us, end_us):
+                yield msg
+
+    def recv_columns(self, msg_name: str) -> Columns:
+        """
+        Return every message of type *msg_name* as one NumPy array per column,
+        with strings decoded and scaling applied. Requires numpy.
+        """
+        self._scan_all_fmts()  # the whole file is walked
+        wanted_type = None
+        for typ, info in self._fmt_cache.items():
+            if info["name"] == msg_name:
+                wanted_type = typ
                 break
-            try:
-                typ, length, name_b, fmt_b, cols_b = fmt_struct.unpack_from(self._mm, pos + 3)
-            except struct.error:
-                pos += 1
-                continue
+        if wanted_type is None:
+            raise ValueError(f"Unknown message type: {msg_name}")
 
-            name = _decode_str(name_b)
-            if not name.isalnum():
-                pos += 1
-                continue
+        info = self._fmt_cache[wanted_type]
+        if self._index is not None:
+            offsets = self._index.offsets_for(wanted_type)
+        else:
+            offsets = scan_offsets(
+                self._mm, 0, self.file_size, frame_lengths(self._fmt_cache), wanted_type, fmt_dtype(info).itemsize
+            )
+        return gather_columns(self._mm, offsets, info)
+
+    def _scan_fmts(self, end: int) -> bool:
+        """Read the FMT records before *end* not read yet; True if there were any."""
+        return self._fmts is not None and self._fmts.advance(self._mm, end)
+
+    def _scan_all_fmts(self, names: Iterable[str] | None = None) -> None:
+        """
+        Read the log's remaining FMT records, or, for a type lookup by *names*,
+        only up to theirs when the schema cache knows them (FmtScanner.seek).
+        """
+        if names is not None and self._fmts is not None and self._fmts.seek(self._mm, names):
+            return
+        self._scan_fmts(self.file_size)
 
-            fmt_raw = _decode_str(fmt_b)
-            cols_raw = _decode_str(cols_b)
+    def _add_fmt_from(self, buf: Any, pos: int) -> bool:
+        """Add the FMT record at *pos*; False if it is not a valid one."""
+        try:
+            typ, length, name_b, fmt_b, cols_b = _FMT_STRUCT.unpack_from(buf, pos + 3)
+        except struct.error:
+            return False
 
-            struct_fmt = "<" + "".join(AP_TO_STRUCT.get(c, "") for c in fmt_raw)
-            struct_obj = struct.Struct(struct_fmt)
+        name = _decode_str(name_b)
+        if not name.isalnum():
+            return False
 
-            self._fmt_cache[typ] = {
-                "Length": length,
-                "name": name,
-                "struct_obj": struct_obj,
-                "columns": cols_raw.split(","),
-                "format_chars": list(fmt_raw),
-            }
-            pos += FMT_LENGTH
+        self._add_fmt(typ, length, name, _decode_str(fmt_b), _decode_str(cols_b))
+        return True
 
+    def _add_fmt(self, typ: int, length: int, name: str, fmt_raw: str, cols_raw: str) -> None:
+        struct_fmt = "<" + "".join(AP_TO_STRUCT.get(c, "") for c in fmt_raw)
+        struct_obj = compile_struct(struct_fmt)
+
+        info = {
+            "Length": length,
+            "name": name,
+            "struct_obj": struct_obj,
+            "columns": cols_raw.split(","),
+            "format_chars": list(fmt_raw),
+        }
+        info["decoder"] = compile_message_factory(info, self.records)
+        self._fmt_cache[typ] = info
+
+    def _add_fmt_self(self) -> None:
         # Add FMT message itself
         if FMT_MSG_TYPE not in self._fmt_cache:
             self._fmt_cache[FMT_MSG_TYPE] = {
                 "Length": FMT_LENGTH,
                 "name": "FMT",
-                "struct_obj": fmt_struct,
+                "struct_obj": _FMT_STRUCT,
                 "columns": ["Type", "Length", "Name", "Format", "Columns"],
-                "format_chars": [],
+                "format_chars": list(FMT_FORMAT),
             }
+            self._fmt_cache[FMT_MSG_TYPE]["decoder"] = compile_message_factory(
+                self._fmt_cache[FMT_MSG_TYPE], self.records
+            )
+
+    def _parse_all(
+        self,
+        wanted_types: FrozenSet[int] | None,
+        start: int = 0,
+        end: int | None = None,
+        fields: Tuple[str, ...] | None = None,
+        frame_filter: FrameFilter | None = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Decode the frames starting in [start, end) (default: the whole file),
+        FMT_SCAN_STEP bytes at a time. The FMT records up to the end of a
+        step are read before it, so late types are known before their first
+        frame and the first messages come without a pass over the file.
+        Steps are cut on confirmed frames, like the blocks of the pools.
+        """
+        end = self.file_size if end is None else end
+        direct = prefer_direct_search(self._mm, wanted_types, frame_lengths(self._fmt_cache))
+        pos = start
+        for _, cut in split_range(start, end, FMT_SCAN_STEP):
+            # Frames, cut searches and direct-search chains reach past the cut
+            self._scan_fmts(cut + BOUNDARY_SEARCH_LIMIT)
+            if cut < end:
+                cut = max(pos, aligned_cut(self._mm, cut, frame_lengths(self._fmt_cache)))
+            yield from self._parse_step(wanted_types, pos, cut, direct, fields, frame_filter)
+            pos = cut
 
-    def _parse_all(self, wanted_type: int | None) -> Iterator[Dict[str, Any]]:
-        pos = 0
-        end = self.file_size
+    def _parse_step(
+        self,
+        wanted_types: FrozenSet[int] | None,
+        start: int,
+        end: int,
+        direct: bool,
+        fields: Tuple[str, ...] | None = None,
+        frame_filter: FrameFilter | None = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Decode the frames starting in [start, end)."""
+        pos = start
+        if direct:
+            hits = iter_type_hits(self._mm, start, end, wanted_types, frame_lengths(self._fmt_cache), stats=self.stats)
+            if self.stats is not None:
+                hits = timed(hits, self.stats, "search")
+            yield from self._parse_offsets(hits, fields, frame_filter)
+            return
+        decoders = self._decoders(fields, frame_filter)
+        if self.stats is not None:
+            yield from iter_range(self._mm, start, end, self._fmt_cache, decoders, wanted_types, self.stats)
+            return
 
         while pos < end:
             pos = self._mm.find(START_SYNC_MARKER, pos)
@@ -109,35 +411,55 @@ class ParserSync:
                 pos += 1
                 continue
 
-            if wanted_type is not None and wanted_type != msg_type:
+            if wanted_types is not None and msg_type not in wanted_types:
                 pos += fmt["Length"]
                 continue
 
             try:
-                values = fmt["struct_obj"].unpack_from(self._mm, pos + 3)
+                msg = decoders[msg_type](self._mm, pos + 3)
             except struct.error:
                 pos += 1
                 continue
 
-            msg = dict(zip(fmt["columns"], values))
+            if msg is not None:
+                yield msg
 
-            # Decode string fields
-            for col, val in msg.items():
-                if isinstance(val, bytes) and col not in BINARY_FIELDS:
-                    msg[col] = _decode_str(val)
+            pos += fmt["Length"]
 
-            # Apply scaling
-            for i, col in enumerate(fmt["columns"]):
-                val = msg[col]
-                if not isinstance(val, (int, float)):
-                    continue
-                fmt_char = fmt["format_chars"][i]
-                if fmt_char in CHAR_TO_DIVIDE:
-                    msg[col] = val / 100.0
-                elif fmt_char == "L":
-                    msg[col] = val / 1e7
+    def _parse_offsets(
+        self,
+        offsets: Iterable[int],
+        fields: Tuple[str, ...] | None = None,
+        frame_filter: FrameFilter | None = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Decode the messages starting at the given (indexed) offsets."""
+        decoders = self._decoders(fields, frame_filter)
+        if self.stats is not None:
+            yield from iter_offsets(self._mm, offsets, self._fmt_cache, decoders, self.stats)
+            return
 
-            msg["mavpackettype"] = fmt["name"]
-            yield msg
+        for pos in offsets:
+            msg_type = self._mm[pos + 2]
+            if msg_type not in self._fmt_cache:
+                continue
+            try:
+                msg = decoders[msg_type](self._mm, pos + 3)
+            except struct.error:
+                continue
+            if msg is not None:
+                yield msg
 
-            pos += fmt["Length"]
+    def _decoders(
+        self, fields: Tuple[str, ...] | None = None, frame_filter: FrameFilter | None = None
+    ) -> Dict[int, Any]:
+        """
+        type → decoder, for the projection *fields* if given (compiled once
+        per FMT definition), behind the tests of *frame_filter* if given.
+        """
+        if fields is None:
+            decoders = {typ: info["decoder"] for typ, info in self._fmt_cache.items()}
+        else:
+            decoders = {
+                typ: compile_message_factory(info, self.records, fields=fields) for typ, info in self._fmt_cache.items()
+            }
+        return decoders if frame_filter is None else frame_filter.wrap(self._fmt_cache, decoders)
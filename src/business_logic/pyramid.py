@@ -0,0 +1,307 @@
+import json
+import mmap
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import (
+    MAX_WORKERS,
+    PYRAMID_BASE_BUCKET_US,
+    PYRAMID_CHUNK_ROWS,
+    PYRAMID_FACTOR,
+    PYRAMID_MAX_POINTS,
+    PYRAMID_SUFFIX,
+    PYRAMID_TOP_BUCKETS,
+)
+from business_logic.columnar import Columns, MsgColumns, fmt_dtype, gather_columns, np, require_numpy
+from business_logic.log_index import LogIndex, file_key
+from business_logic.time_window import offsets_window, timed_types
+
+# pyramid_dir/manifest.json        {"version", "source", "base_us", "factor",
+#                                   "types": {name: {rows, columns, levels}}}
+# pyramid_dir/<TYPE>.<level>.npz   one level of one type: "bucket" (TimeUS // bucket_us),
+#                                  "count", and "<col>.min" / ".max" / ".mean" / ".last" per column
+# Level k has buckets of base_us * factor**k microseconds. Buckets without
+# frames are not stored; "last" is the last value in file order.
+_VERSION = 1
+_MANIFEST = "manifest.json"
+_STATS = ("min", "max", "sum", "last")
+
+
+def default_pyramid_dir(path: str) -> str:
+    return os.path.abspath(path) + PYRAMID_SUFFIX
+
+
+def _source_key(path: str) -> Dict[str, Any]:
+    size, mtime_ns, digest = file_key(path)
+    return {"size": size, "mtime_ns": mtime_ns, "digest": digest.hex()}
+
+
+def numeric_columns(info: Dict[str, Any]) -> List[str]:
+    """Scalar numeric columns of an FMT definition, TimeUS excluded."""
+    fields = fmt_dtype(info).fields
+    return [
+        col
+        for col in fields
+        if col != "TimeUS" and fields[col][0].kind in "iuf" and fields[col][0].shape == ()
+    ]
+
+
+def _reduce(part: Columns, cols: Sequence[str]) -> Columns:
+    """Merge the rows of *part* that share a bucket (rows of one bucket stay in file order)."""
+    if not len(part["bucket"]):
+        return part
+    order = np.argsort(part["bucket"], kind="stable")
+    bucket = part["bucket"][order]
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    lasts = np.r_[starts[1:], len(bucket)] - 1
+
+    out: Columns = {"bucket": bucket[starts], "count": np.add.reduceat(part["count"][order], starts)}
+    for col in cols:
+        # fmin / fmax: a NaN sample does not hide the rest of its bucket
+        out[col + ".min"] = np.fmin.reduceat(part[col + ".min"][order], starts)
+        out[col + ".max"] = np.fmax.reduceat(part[col + ".max"][order], starts)
+        out[col + ".sum"] = np.add.reduceat(part[col + ".sum"][order], starts)
+        out[col + ".last"] = part[col + ".last"][order][lasts]
+    return out
+
+
+def _reduce_frames(
+    buf: Any, offsets: Sequence[int], info: Dict[str, Any], cols: Sequence[str], bucket_us: int
+) -> Columns:
+    """Finest-level buckets of the frames at *offsets* (pool task)."""
+    columns = gather_columns(buf, offsets, info, ["TimeUS", *cols])
+    part: Columns = {
+        "bucket": (columns["TimeUS"] // bucket_us).astype(np.int64),
+        "count": np.ones(len(offsets), dtype=np.int64),
+    }
+    for col in cols:
+        values = columns[col].astype(np.float64)
+        for stat in _STATS:
+            part[f"{col}.{stat}"] = values
+    return _reduce(part, cols)
+
+
+def _concat(parts: List[Columns]) -> Columns:
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+
+class Pyramid:
+    """
+    Min / max / mean / last of chosen numeric columns per TimeUS bucket, at
+    several resolutions, stored next to the log. A plot reads the coarsest
+    level that still shows enough detail for its window, and the raw frames
+    of the window (found through the offset index) once it is zoomed in
+    far enough; the log is never decoded as a whole again.
+    """
+
+    def __init__(self, path: str, pyramid_dir: str, manifest: Dict[str, Any]):
+        self.path = os.path.abspath(path)
+        self.pyramid_dir = pyramid_dir
+        self.manifest = manifest
+        self._levels: Dict[Tuple[str, int], Columns] = {}
+        self._index: LogIndex | None = None
+
+    @property
+    def types(self) -> List[str]:
+        return sorted(self.manifest["types"])
+
+    def columns(self, msg_name: str) -> List[str]:
+        return self._entry(msg_name)["columns"]
+
+    def levels(self, msg_name: str) -> List[int]:
+        """Bucket width (µs) of each level of *msg_name*, finest first."""
+        base, factor = self.manifest["base_us"], self.manifest["factor"]
+        return [base * factor**k for k in range(self._entry(msg_name)["levels"])]
+
+    def level(self, msg_name: str, level: int) -> Columns:
+        """
+        One level of *msg_name*: TimeUS (bucket start), count, and
+        <col>.min / .max / .mean / .last for every column.
+        """
+        key = (msg_name, level)
+        if key not in self._levels:
+            if not 0 <= level < self._entry(msg_name)["levels"]:
+                raise ValueError(f"{msg_name} has no level {level}")
+            with np.load(os.path.join(self.pyramid_dir, f"{msg_name}.{level}.npz")) as data:
+                columns = {"TimeUS": data["bucket"] * self.levels(msg_name)[level]}
+                columns.update((name, data[name]) for name in data.files if name != "bucket")
+            self._levels[key] = columns
+        return self._levels[key]
+
+    def window(
+        self,
+        msg_name: str,
+        start_us: int | None = None,
+        end_us: int | None = None,
+        max_points: int = PYRAMID_MAX_POINTS,
+    ) -> Tuple[int, Columns]:
+        """
+        What to plot for start_us <= TimeUS < end_us: (bucket_us, columns).
+        The raw frames of the window (bucket_us 0, TimeUS plus the pyramid's
+        columns) if there are at most *max_points*, otherwise the finest
+        level with at most *max_points* buckets overlapping the window
+        (or the coarsest level).
+        """
+        cols = self.columns(msg_name)
+        if self._index is None:
+            self._index = LogIndex.load_or_build(self.path)
+        typ, info = self._index.type_info(msg_name)
+        if typ is not None and os.path.getsize(self.path):
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                offsets, _ = offsets_window(mm, self._index.offsets_for(typ), start_us, end_us)
+                if len(offsets) <= max_points:
+                    return 0, gather_columns(mm, offsets, info, ["TimeUS", *cols])
+
+        for k, bucket_us in enumerate(self.levels(msg_name)):
+            columns = self.level(msg_name, k)
+            # Buckets overlapping the window
+            lo, hi = 0, len(columns["TimeUS"])
+            if start_us is not None:
+                lo = int(np.searchsorted(columns["TimeUS"], start_us - start_us % bucket_us))
+            if end_us is not None:
+                hi = int(np.searchsorted(columns["TimeUS"], end_us))
+            if hi - lo <= max_points:
+                break
+        return bucket_us, {name: values[lo:hi] for name, values in columns.items()}
+
+    def covers(self, msg_columns: MsgColumns) -> bool:
+        """True if every requested type and column is in the pyramid."""
+        for msg_name, cols in msg_columns.items():
+            entry = self.manifest["types"].get(msg_name)
+            if entry is None or (cols is not None and not set(cols) <= set(entry["columns"])):
+                return False
+        return True
+
+    def _entry(self, msg_name: str) -> Dict[str, Any]:
+        entry = self.manifest["types"].get(msg_name)
+        if entry is None:
+            raise ValueError(f"Unknown message type: {msg_name}")
+        return entry
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        msg_columns: MsgColumns,
+        pyramid_dir: Optional[str] = None,
+        base_us: int = PYRAMID_BASE_BUCKET_US,
+        factor: int = PYRAMID_FACTOR,
+        max_workers: int = MAX_WORKERS,
+    ) -> "Pyramid":
+        """
+        Reduce the columns of *msg_columns* (None: every numeric column of
+        the type) and store the pyramid.
+        One indexing pass finds the frames; chunks of PYRAMID_CHUNK_ROWS
+        frames are then gathered and bucketed in parallel, and their
+        buckets merged. Coarser levels are merged from the finer ones.
+        """
+        require_numpy()
+        if factor < 2:
+            raise ValueError("factor must be at least 2")
+        path = os.path.abspath(path)
+        pyramid_dir = pyramid_dir or default_pyramid_dir(path)
+        source = _source_key(path)
+        index = LogIndex.load_or_build(path)
+
+        wanted: Dict[str, Tuple[int, Dict[str, Any], List[str]]] = {}
+        for msg_name, cols in msg_columns.items():
+            typ, info = index.type_info(msg_name)
+            if typ is None:
+                raise ValueError(f"Unknown message type: {msg_name}")
+            if typ not in timed_types({typ: info}):
+                raise ValueError(f"{msg_name} has no TimeUS column")
+            numeric = numeric_columns(info)
+            cols = numeric if cols is None else list(cols)
+            unknown = set(cols) - set(numeric)
+            if unknown:
+                raise ValueError(f"Not numeric columns of {msg_name}: {sorted(unknown)}")
+            wanted[msg_name] = (typ, info, cols)
+
+        tasks: List[Tuple[str, Sequence[int]]] = []
+        for msg_name, (typ, _, _) in wanted.items():
+            offsets = index.offsets_for(typ)
+            for i in range(0, len(offsets), PYRAMID_CHUNK_ROWS):
+                tasks.append((msg_name, offsets[i : i + PYRAMID_CHUNK_ROWS]))
+        parts: Dict[str, List[Columns]] = {msg_name: [] for msg_name in wanted}
+        if tasks:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+
+                def reduce_chunk(task: Tuple[str, Sequence[int]]) -> Columns:
+                    msg_name, offsets = task
+                    _, info, cols = wanted[msg_name]
+                    return _reduce_frames(mm, offsets, info, cols, base_us)
+
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    # map keeps task order: the chunks of a type stay in file order
+                    for (msg_name, _), part in zip(tasks, executor.map(reduce_chunk, tasks)):
+                        parts[msg_name].append(part)
+
+        tmp = pyramid_dir + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        types: Dict[str, Any] = {}
+        for msg_name, (_, info, cols) in wanted.items():
+            levels = [_reduce(_concat(parts[msg_name]), cols) if parts[msg_name] else _empty_level(cols)]
+            while len(levels[-1]["bucket"]) > PYRAMID_TOP_BUCKETS:
+                coarser = dict(levels[-1], bucket=levels[-1]["bucket"] // factor)
+                levels.append(_reduce(coarser, cols))
+            for k, level in enumerate(levels):
+                np.savez(os.path.join(tmp, f"{msg_name}.{k}.npz"), **_stored(level, cols))
+            types[msg_name] = {"rows": int(levels[0]["count"].sum()), "columns": cols, "levels": len(levels)}
+
+        manifest = {"version": _VERSION, "source": source, "base_us": base_us, "factor": factor, "types": types}
+        with open(os.path.join(tmp, _MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+        shutil.rmtree(pyramid_dir, ignore_errors=True)
+        os.replace(tmp, pyramid_dir)
+        pyramid = cls(path, pyramid_dir, manifest)
+        pyramid._index = index
+        return pyramid
+
+    @classmethod
+    def load(cls, path: str, pyramid_dir: Optional[str] = None) -> Optional["Pyramid"]:
+        """Open the pyramid, or return None if it is missing or stale."""
+        require_numpy()
+        pyramid_dir = pyramid_dir or default_pyramid_dir(path)
+        try:
+            with open(os.path.join(pyramid_dir, _MANIFEST), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if manifest.get("version") != _VERSION or manifest.get("source") != _source_key(path):
+            return None
+        return cls(path, pyramid_dir, manifest)
+
+    @classmethod
+    def load_or_build(
+        cls, path: str, msg_columns: MsgColumns, pyramid_dir: Optional[str] = None, **kwargs: Any
+    ) -> "Pyramid":
+        """Return a valid pyramid with (at least) *msg_columns*, rebuilding it otherwise."""
+        pyramid = cls.load(path, pyramid_dir)
+        if pyramid is not None and pyramid.covers(msg_columns):
+            return pyramid
+        return cls.build(path, msg_columns, pyramid_dir, **kwargs)
+
+
+def _empty_level(cols: Iterable[str]) -> Columns:
+    level: Columns = {"bucket": np.empty(0, dtype=np.int64), "count": np.empty(0, dtype=np.int64)}
+    for col in cols:
+        for stat in _STATS:
+            level[f"{col}.{stat}"] = np.empty(0, dtype=np.float64)
+    return level
+
+
+def _stored(level: Columns, cols: Iterable[str]) -> Columns:
+    """A level as written: means instead of sums."""
+    stored: Columns = {"bucket": level["bucket"], "count": level["count"]}
+    for col in cols:
+        stored[col + ".min"] = level[col + ".min"]
+        stored[col + ".max"] = level[col + ".max"]
+        stored[col + ".mean"] = level[col + ".sum"] / level["count"]
+        stored[col + ".last"] = level[col + ".last"]
+    return stored
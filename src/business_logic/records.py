@@ -0,0 +1,104 @@
+import keyword
+import struct
+import sys
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+from config import AP_TO_STRUCT
+from business_logic.decoders import (
+    Decoder,
+    _binary,
+    _binary_view,
+    _decode_str,
+    _int16_array,
+    _int16_view,
+    compile_decoder,
+    field_actions,
+)
+
+# Names the generated classes use themselves; such columns are only in to_dict()
+_RESERVED = {"get_type", "to_dict", "_fieldnames", "_type", "_buf", "_offset"}
+
+_GETTERS = {
+    "raw": "_u{n}(self._buf, self._offset + {start})[0]",
+    "str": "_dec(_u{n}(self._buf, self._offset + {start})[0])",
+    "div100": "_u{n}(self._buf, self._offset + {start})[0] / 100.0",
+    "div1e7": "_u{n}(self._buf, self._offset + {start})[0] / 1e7",
+    "array": "_arr(self._buf, self._offset + {start}, self._offset + {end})",
+    "binary": "_bin(self._buf, self._offset + {start}, self._offset + {end})",
+}
+
+
+@lru_cache(maxsize=None)
+def _compile(name: str, columns: Tuple[str, ...], format_chars: Tuple[str, ...], detach: bool) -> type:
+    actions = field_actions(list(columns), list(format_chars))
+    chars = [c for c in format_chars if AP_TO_STRUCT.get(c)]  # aligned with actions
+    size = sum(s for _, _, _, _, s in actions)
+    namespace: Dict[str, Any] = {
+        "_size_of": size,
+        "_error": struct.error,
+        "_dec": _decode_str,
+        "_arr": _int16_array if detach or sys.byteorder != "little" else _int16_view,
+        "_bin": _binary if detach else _binary_view,
+        "_to_dict": compile_decoder({"name": name, "columns": columns, "format_chars": format_chars}, detach),
+    }
+
+    lines = [
+        f"class {name if name.isidentifier() else 'Record'}:",
+        "    __slots__ = ('_buf', '_offset')",
+        f"    _type = {name!r}",
+        f"    _fieldnames = {list(columns)!r}",
+        "",
+        "    def __init__(self, buf, offset):",
+        "        if offset + _size_of > len(buf):",
+        "            raise _error('truncated payload')",
+        "        self._buf = buf",
+        "        self._offset = offset",
+        "",
+        "    def get_type(self):",
+        "        return self._type",
+        "",
+        "    def to_dict(self):",
+        "        return _to_dict(self._buf, self._offset)",
+        "",
+        "    def __repr__(self):",
+        "        fields = ', '.join(f'{k} : {v}' for k, v in self.to_dict().items() if k != 'mavpackettype')",
+        "        return f'{self._type} {{{fields}}}'",
+    ]
+
+    for n, ((col, action, _, start, width), fmt_char) in enumerate(zip(actions, chars)):
+        if not col.isidentifier() or keyword.iskeyword(col) or col in _RESERVED:
+            continue
+        if action not in ("array", "binary"):
+            namespace[f"_u{n}"] = struct.Struct("<" + AP_TO_STRUCT[fmt_char]).unpack_from
+        getter = _GETTERS[action].format(n=n, start=start, end=start + width)
+        lines += ["", "    @property", f"    def {col}(self):", f"        return {getter}"]
+
+    exec(compile("\n".join(lines) + "\n", f"<record {name}>", "exec"), namespace)
+    return namespace[name if name.isidentifier() else "Record"]
+
+
+def compile_record_class(info: Dict[str, Any], detach: bool = False) -> Decoder:
+    """
+    Lazy record class for one FMT definition, built once and cached.
+    Record(buf, offset) keeps a reference to *buf* and the payload offset
+    (just past the 3-byte header) in two slots; every field is unpacked,
+    decoded and scaled on attribute access only, so reading two fields of
+    a wide message costs two small unpacks. Records also offer pymavlink's
+    get_type() and to_dict(), plus _fieldnames.
+
+    The class is a drop-in for compile_decoder(): it raises struct.error on
+    a truncated payload. *detach* has the same meaning as there, for array
+    and binary fields. The buffer must stay open while records are in use.
+    """
+    return _compile(info["name"], tuple(info["columns"]), tuple(info["format_chars"]), detach)
+
+
+def compile_message_factory(
+    info: Dict[str, Any], records: bool, detach: bool = False, fields: Tuple[str, ...] | None = None
+) -> Decoder:
+    """
+    compile_record_class() if *records*, else compile_decoder(). Records
+    only decode the fields that are read, so *fields* applies to dicts only.
+    """
+    return compile_record_class(info, detach) if records else compile_decoder(info, detach, fields)
@@ -0,0 +1,143 @@
+import asyncio
+from collections import deque
+from concurrent.futures import Executor, Future
+from contextlib import aclosing, contextmanager
+from typing import Any, AsyncIterator, Callable, Deque, FrozenSet, Iterable, Iterator, List, Sequence, Tuple
+
+from config import ASYNC_BATCH_SIZE, RESULT_MEMORY_FACTOR
+
+# What a pool parser reads for one query: (wanted types, offsets of an
+# indexed read or None, nominal blocks or None, direct type search)
+Query = Tuple[FrozenSet[int] | None, Sequence[int] | None, List[Tuple[int, int]] | None, bool]
+
+
+def window_for_memory(block_size: int, memory_limit: int | None, max_in_flight: int) -> Tuple[int, int]:
+    """
+    Fit (block_size, max_in_flight) under *memory_limit* bytes.
+    Every block's decoded result is estimated at RESULT_MEMORY_FACTOR times
+    its size on disk, and the block being consumed counts against the limit
+    too. Blocks are shrunk when even one in flight would not fit.
+    """
+    if memory_limit is None:
+        return block_size, max_in_flight
+
+    per_block = block_size * RESULT_MEMORY_FACTOR
+    blocks_allowed = memory_limit // per_block
+    if blocks_allowed < 2:
+        block_size = max(64 * 1024, memory_limit // (2 * RESULT_MEMORY_FACTOR))
+        return block_size, 1
+    return block_size, max(1, min(max_in_flight, blocks_allowed - 1))
+
+
+def iter_ordered(
+    executor: Executor,
+    fn: Callable[..., Any],
+    tasks: Iterable[Tuple[Any, ...]],
+    max_in_flight: int,
+) -> Iterator[Any]:
+    """
+    Run fn(*args) for every task on *executor* and yield the results in
+    submission (= file) order, keeping at most *max_in_flight* tasks
+    submitted but not yet consumed. The next task is only submitted once
+    the consumer takes a result, so finished-but-unread results never pile up.
+    """
+    pending: Deque[Future] = deque()
+    try:
+        for args in tasks:
+            pending.append(executor.submit(fn, *args))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Consumer stopped early: drop whatever has not started yet
+        for future in pending:
+            future.cancel()
+
+
+@contextmanager
+def shutting_down(executor: Executor, wait: bool = True) -> Iterator[Executor]:
+    """
+    Use a pool created for one call and shut it down afterwards, dropping
+    tasks not started yet. Async callers pass wait=False so that cleanup
+    never blocks the event loop on a block still running.
+    """
+    try:
+        yield executor
+    finally:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+async def aiter_ordered(
+    executor: Executor,
+    fn: Callable[..., Any],
+    tasks: Iterable[Tuple[Any, ...]],
+    max_in_flight: int,
+) -> AsyncIterator[Any]:
+    """
+    Async iter_ordered(): the results are awaited instead of waited on, so
+    the event loop keeps running while blocks are parsed. If the consumer
+    is cancelled or closes the iterator, every task not started yet is
+    cancelled (a running one finishes, its result is dropped).
+    """
+    pending: Deque[asyncio.Future] = deque()
+    try:
+        for args in tasks:
+            pending.append(asyncio.wrap_future(executor.submit(fn, *args)))
+            if len(pending) >= max_in_flight:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _next_batch(items: Iterator[Any], size: int) -> List[Any]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            break
+    return batch
+
+
+async def aiter_batches(
+    items: Iterator[Any], batch_size: int = ASYNC_BATCH_SIZE, executor: Executor | None = None
+) -> AsyncIterator[List[Any]]:
+    """
+    Lists of up to *batch_size* items of a blocking iterator, each pulled on
+    *executor* (default: the loop's) so the event loop never blocks.
+    When the consumer is cancelled or stops, *items* is closed (on the
+    executor, once the batch being pulled is done), which runs its own
+    cleanup: a parser generator cancels its pending blocks.
+    """
+    loop = asyncio.get_running_loop()
+    step: asyncio.Future | None = None
+
+    def close(done: asyncio.Future | None = None) -> None:
+        if done is not None and not done.cancelled():
+            done.exception()  # an abandoned batch's error is not reported
+        loop.run_in_executor(executor, items.close)  # type: ignore[attr-defined]
+
+    try:
+        while True:
+            step = loop.run_in_executor(executor, _next_batch, items, batch_size)
+            # Shielded: a cancelled consumer must not close items while a batch is being pulled
+            batch = await asyncio.shield(step)
+            if not batch:
+                return
+            yield batch
+    finally:
+        if step is not None and not step.done():
+            step.add_done_callback(close)
+        else:
+            close()
+
+
+async def aflatten(batches: AsyncIterator[List[Any]]) -> AsyncIterator[Any]:
+    """The items of *batches*, one at a time; closing this closes *batches*."""
+    async with aclosing(batches):  # type: ignore[type-var]
+        async for batch in batches:
+            for item in batch:
+                yield item
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import struct
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from config import FMT_HEADER_BYTES, FMT_LENGTH, FMT_MSG_TYPE, SCHEMA_CACHE_DIR, START_SYNC_MARKER
+
+# FMT discovery. Most FMT records sit in the header of a log; firmware that
+# defines a type on first use writes its FMT record just before the first
+# message of that type, anywhere in the file. Parsers read the header region
+# when a log is opened and scan the rest only as far as parsing has got
+# (FmtScanner.advance), so opening a log costs the same whatever its size.
+#
+# The FMT table is cached per header, keyed by the hash of the header's FMT
+# records, together with every late record met in logs with that header (in
+# memory, and on disk under SCHEMA_CACHE_DIR). Late type ids are assigned on
+# first use, so they can differ between flights of the same firmware: only
+# the header is applied when a log is opened, and the cached late records are
+# hints. A type looked up by name is searched for as its exact cached record
+# (FmtScanner.seek), which stops at its first use instead of reading every
+# FMT record of the file; only records found in the log itself are applied.
+
+FmtEntry = Tuple[int, int, str, str, str]  # (type, length, name, format, columns)
+
+_FMT_MARKER = START_SYNC_MARKER + bytes([FMT_MSG_TYPE])
+_FMT_STRUCT = struct.Struct("<BB4s16s64s")
+
+_TABLES: Dict[str, List[FmtEntry]] = {}  # header key → FMT table, for this process
+
+
+def _decode_str(b: bytes) -> str:
+    """Fast ASCII decode + strip NULs."""
+    return b.decode("ascii", errors="ignore").rstrip("\x00")
+
+
+@lru_cache(maxsize=None)
+def compile_struct(struct_fmt: str) -> struct.Struct:
+    """struct.Struct for a format string, shared by every log (and parser) that uses it."""
+    return struct.Struct(struct_fmt)
+
+
+def scan_fmt_records(buf: Any, start: int = 0, end: int | None = None) -> List[FmtEntry]:
+    """Every FMT record starting in [start, end) of the buffer (default: all of it), in file order."""
+    end = len(buf) if end is None else min(end, len(buf))
+    entries: List[FmtEntry] = []
+
+    pos = start
+    while True:
+        pos = buf.find(_FMT_MARKER, pos, end + len(_FMT_MARKER) - 1)
+        if pos == -1:
+            break
+        try:
+            typ, length, name_b, fmt_b, cols_b = _FMT_STRUCT.unpack_from(buf, pos + 3)
+        except struct.error:
+            pos += 1
+            continue
+
+        name = _decode_str(name_b)
+        if not name.isalnum():
+            pos += 1
+            continue
+
+        entries.append((typ, length, name, _decode_str(fmt_b), _decode_str(cols_b)))
+        pos += FMT_LENGTH
+
+    return entries
+
+
+def fmt_record(entry: FmtEntry) -> bytes:
+    """The FMT record (header included) that scan_fmt_records reads as *entry*."""
+    typ, length, name, fmt_raw, cols = entry
+    return _FMT_MARKER + _FMT_STRUCT.pack(typ, length, name.encode(), fmt_raw.encode(), cols.encode())
+
+
+def header_key(entries: List[FmtEntry]) -> str:
+    """Content hash of a header's FMT records."""
+    return hashlib.blake2b(json.dumps(entries).encode(), digest_size=16).hexdigest()
+
+
+def _cache_path(key: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def load_table(key: str, cache_dir: str | None) -> List[FmtEntry] | None:
+    """Cached FMT table of a header (process memory first, then disk); None if unknown."""
+    table = _TABLES.get(key)
+    if table is not None or cache_dir is None:
+        return table
+    try:
+        with open(_cache_path(key, cache_dir)) as f:
+            table = [tuple(entry) for entry in json.load(f)["fmt_table"]]  # type: ignore[misc]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    _TABLES[key] = table
+    return table
+
+
+def save_table(key: str, table: List[FmtEntry], cache_dir: str | None) -> None:
+    """Cache the FMT table of a header; a failed write only costs the next log a scan."""
+    _TABLES[key] = table
+    if cache_dir is None:
+        return
+    path = _cache_path(key, cache_dir)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp, "w") as f:
+            json.dump({"fmt_table": table}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+class FmtScanner:
+    """
+    FMT records of one log, found front to back: the header region when the
+    log is opened, the rest as far as advance() (or seek()) is asked to go.
+    Every record is handed to *add* as add(type, length, name, format,
+    columns), in file order.
+    *cache_dir* defaults to SCHEMA_CACHE_DIR.
+    """
+
+    def __init__(
+        self,
+        buf: Any,
+        add: Callable[..., None],
+        header_bytes: int = FMT_HEADER_BYTES,
+        cache_dir: str | None = None,
+    ):
+        self._add = add
+        self._cache_dir = SCHEMA_CACHE_DIR if cache_dir is None else cache_dir
+        self.scanned = min(len(buf), header_bytes)  # [0, scanned) has been searched
+
+        header = scan_fmt_records(buf, 0, self.scanned)
+        self.key = header_key(header)
+        cached = load_table(self.key, self._cache_dir)
+        # A cached table extends the header with the late records of earlier logs
+        self._table = cached if cached is not None and cached[: len(header)] == header else header
+        self._known = set(self._table)
+        self._hints = self._table[len(header) :]  # until this log confirms them
+        for entry in header:
+            add(*entry)
+
+    def complete(self, size: int) -> bool:
+        return self.scanned >= size
+
+    def advance(self, buf: Any, end: int) -> bool:
+        """Search [scanned, end) for FMT records; True if any were found (and added)."""
+        end = min(end, len(buf))
+        if end <= self.scanned:
+            return False
+        entries = scan_fmt_records(buf, self.scanned, end)
+        self.scanned = end
+        for entry in entries:
+            self._add(*entry)
+
+        self._hints = [entry for entry in self._hints if entry not in entries]
+        learned = [entry for entry in entries if entry not in self._known]
+        if learned:
+            self._known.update(learned)
+            self._table = self._table + learned
+            save_table(self.key, self._table, self._cache_dir)
+        return bool(entries)
+
+    def seek(self, buf: Any, names: Iterable[str]) -> bool:
+        """
+        Advance up to the first record of each of *names* that earlier logs
+        with this header defined late, found as its exact bytes. True if
+        every name was found so; False (nothing read) if one has no hint in
+        this log, which only a full scan can tell.
+        """
+        end = self.scanned
+        for name in set(names):
+            found = [buf.find(fmt_record(entry), self.scanned) for entry in self._hints if entry[2] == name]
+            found = [pos for pos in found if pos != -1]
+            if not found:
+                return False
+            end = max(end, min(found) + 1)
+        self.advance(buf, end)
+        return True
@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from config import MAX_IN_FLIGHT, MAX_WORKERS
+from business_logic.multi_processing import ParserMultiprocessing, _init_worker, schema_key
+
+
+class ParserSession:
+    """
+    Long-lived process pool shared by many queries.
+
+    The pool starts once; schemas of the logs passed at construction are
+    compiled in every worker by the pool initializer, and schemas seen later
+    are compiled on a worker's first task. Workers keep one mmap per file.
+    Parsers returned by open() are cached per file (until it changes), so
+    repeated queries skip the FMT scan as well.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[str] = (),
+        max_workers: int = MAX_WORKERS,
+        max_in_flight: int = MAX_IN_FLIGHT,
+    ):
+        self.max_workers = max_workers
+        self.max_in_flight = max_in_flight
+        self._parsers: Dict[str, Tuple[Tuple[int, int], ParserMultiprocessing]] = {}
+        self._preloaded: set = set()
+
+        schemas: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        for path in paths:
+            raw = self.open(path)._fmt_cache_raw()
+            key = schema_key(raw)
+            schemas[key] = raw
+            self._preloaded.add(key)
+
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker, initargs=(schemas,)
+        )
+
+    def __enter__(self) -> "ParserSession":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def open(self, path: str, **kwargs: Any) -> ParserMultiprocessing:
+        """Parser for *path* that runs its blocks on this session's pool."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = (st.st_size, st.st_mtime_ns)
+        cached = self._parsers.get(path)
+        if cached is not None and cached[0] == stamp and not kwargs:
+            return cached[1]
+
+        parser = ParserMultiprocessing(
+            path, max_workers=self.max_workers, max_in_flight=self.max_in_flight, session=self, **kwargs
+        )
+        if not kwargs:
+            self._parsers[path] = (stamp, parser)
+        return parser
+
+    def schema_args(self, fmt_cache_raw: Dict[int, Dict[str, Any]]) -> Tuple[str, Optional[Dict[int, Dict[str, Any]]]]:
+        """(key, raw schema) to pass to a task; the raw schema is omitted when preinstalled."""
+        key = schema_key(fmt_cache_raw)
+        return key, (None if key in self._preloaded else fmt_cache_raw)
@@ -0,0 +1,252 @@
+import json
+import struct
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, FrozenSet, Iterator, List, Sequence
+
+from config import START_SYNC_MARKER, STATS_MAX_SKIPPED_RANGES
+
+_PHASES = ("search", "unpack", "decode", "ipc_wait", "total")
+
+
+class ParseStats:
+    """
+    What a parser did: per-type message counts and bytes, frames of other
+    types walked past, frames rejected by a where filter, resyncs (skipped
+    byte ranges, unknown types, payloads that failed to unpack) and time per
+    phase, in seconds:
+
+    search    marker search and frame header checks
+    unpack    the struct unpack of the payload
+    decode    string decoding, scaling and building the message (the
+              decoder's time less one unpack)
+    ipc_wait  pool backends: the consumer waiting on worker results
+    total     wall time of the parser calls
+
+    Worker timings are summed over workers, so with a pool they can exceed
+    total. Stats accumulate over calls; reset() starts over.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.counts: Dict[str, int] = {}
+        self.bytes: Dict[str, int] = {}
+        self.filtered = 0  # frames of other types walked past
+        self.rejected = 0  # frames of the wanted types a where filter rejected
+        self.resyncs = 0
+        self.skipped_bytes = 0
+        self.skipped_ranges: List[List[int]] = []
+        self.unknown_types: Dict[int, int] = {}
+        self.struct_errors = 0
+        self.timings: Dict[str, float] = dict.fromkeys(_PHASES, 0.0)
+
+    def message(self, name: str, length: int) -> None:
+        self.counts[name] = self.counts.get(name, 0) + 1
+        self.bytes[name] = self.bytes.get(name, 0) + length
+
+    def skip(self, start: int, end: int) -> None:
+        """Bytes [start, end) were skipped; adjacent skips form one resync."""
+        if end <= start:
+            return
+        self.skipped_bytes += end - start
+        if self.skipped_ranges and self.skipped_ranges[-1][1] == start:
+            self.skipped_ranges[-1][1] = end
+            return
+        self.resyncs += 1
+        if len(self.skipped_ranges) < STATS_MAX_SKIPPED_RANGES:
+            self.skipped_ranges.append([start, end])
+
+    def merge(self, other: "ParseStats | Dict[str, Any]") -> None:
+        """Add the stats of another parser run or block (a ParseStats or its to_dict())."""
+        data = other.to_dict() if isinstance(other, ParseStats) else other
+        for name, entry in data["types"].items():
+            self.counts[name] = self.counts.get(name, 0) + entry["count"]
+            self.bytes[name] = self.bytes.get(name, 0) + entry["bytes"]
+        self.filtered += data["filtered"]
+        self.rejected += data["rejected"]
+        self.resyncs += data["resyncs"]
+        self.skipped_bytes += data["skipped_bytes"]
+        room = STATS_MAX_SKIPPED_RANGES - len(self.skipped_ranges)
+        self.skipped_ranges.extend([list(r) for r in data["skipped_ranges"][: max(room, 0)]])
+        self.skipped_ranges.sort()
+        for typ, n in data["unknown_types"].items():
+            self.unknown_types[int(typ)] = self.unknown_types.get(int(typ), 0) + n
+        self.struct_errors += data["struct_errors"]
+        for phase, seconds in data["timings"].items():
+            self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "messages": sum(self.counts.values()),
+            "bytes": sum(self.bytes.values()),
+            "types": {name: {"count": n, "bytes": self.bytes[name]} for name, n in sorted(self.counts.items())},
+            "filtered": self.filtered,
+            "rejected": self.rejected,
+            "resyncs": self.resyncs,
+            "skipped_bytes": self.skipped_bytes,
+            "skipped_ranges": self.skipped_ranges,
+            "unknown_types": {str(typ): n for typ, n in sorted(self.unknown_types.items())},
+            "struct_errors": self.struct_errors,
+            "timings": dict(self.timings),
+        }
+
+    def to_json(self, **kwargs: Any) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+def iter_range(
+    buf: Any,
+    start: int,
+    end: int,
+    fmt_cache: Dict[int, Dict[str, Any]],
+    decoders: Dict[int, Any],
+    wanted_types: FrozenSet[int] | None,
+    stats: ParseStats,
+) -> Iterator[Any]:
+    """
+    Instrumented twin of the parsers' block loop: the same frames and the
+    same resync rules, with every step recorded in *stats*.
+    """
+    clock = time.perf_counter
+    timings = stats.timings
+    pos = start
+    while pos < end:
+        t0 = clock()
+        nxt = buf.find(START_SYNC_MARKER, pos)
+        if nxt == -1 or nxt + 3 > end:
+            stats.skip(pos, end if nxt == -1 else nxt)
+            timings["search"] += clock() - t0
+            break
+        stats.skip(pos, nxt)
+        pos = nxt
+
+        msg_type = buf[pos + 2]
+        fmt = fmt_cache.get(msg_type)
+        if fmt is None:
+            stats.unknown_types[msg_type] = stats.unknown_types.get(msg_type, 0) + 1
+            stats.skip(pos, pos + 1)
+            pos += 1
+            timings["search"] += clock() - t0
+            continue
+
+        if wanted_types is not None and msg_type not in wanted_types:
+            stats.filtered += 1
+            pos += fmt["Length"]
+            timings["search"] += clock() - t0
+            continue
+
+        decode = decoders[msg_type]
+        unpack = getattr(decode, "unpack", None)
+        t1 = clock()
+        timings["search"] += t1 - t0
+        try:
+            if unpack is not None:
+                unpack(buf, pos + 3)
+            t2 = clock()
+            msg = decode(buf, pos + 3)
+        except struct.error:
+            stats.struct_errors += 1
+            stats.skip(pos, pos + 1)
+            pos += 1
+            continue
+        t3 = clock()
+        timings["unpack"] += t2 - t1
+        timings["decode"] += max(0.0, (t3 - t2) - (t2 - t1))
+
+        pos += fmt["Length"]
+        if msg is None:
+            stats.rejected += 1
+            continue
+        stats.message(fmt["name"], fmt["Length"])
+        yield msg
+
+
+def iter_offsets(
+    buf: Any,
+    offsets: Sequence[int],
+    fmt_cache: Dict[int, Dict[str, Any]],
+    decoders: Dict[int, Any],
+    stats: ParseStats,
+) -> Iterator[Any]:
+    """Instrumented twin of the indexed (offsets) loop."""
+    clock = time.perf_counter
+    timings = stats.timings
+    for pos in offsets:
+        msg_type = buf[pos + 2]
+        fmt = fmt_cache.get(msg_type)
+        if fmt is None:
+            stats.unknown_types[msg_type] = stats.unknown_types.get(msg_type, 0) + 1
+            continue
+
+        decode = decoders[msg_type]
+        unpack = getattr(decode, "unpack", None)
+        t1 = clock()
+        try:
+            if unpack is not None:
+                unpack(buf, pos + 3)
+            t2 = clock()
+            msg = decode(buf, pos + 3)
+        except struct.error:
+            stats.struct_errors += 1
+            continue
+        t3 = clock()
+        timings["unpack"] += t2 - t1
+        timings["decode"] += max(0.0, (t3 - t2) - (t2 - t1))
+
+        if msg is None:
+            stats.rejected += 1
+            continue
+        stats.message(fmt["name"], fmt["Length"])
+        yield msg
+
+
+def timed(results: Iterator[Any], stats: ParseStats, phase: str) -> Iterator[Any]:
+    """Pass *results* through, adding the time spent producing each item to *phase*."""
+    clock = time.perf_counter
+    timings = stats.timings
+    while True:
+        t0 = clock()
+        try:
+            result = next(results)
+        except StopIteration:
+            return
+        finally:
+            timings[phase] += clock() - t0
+        yield result
+
+
+def collect(results: Iterator[Any], stats: ParseStats | None) -> Iterator[Any]:
+    """
+    Flatten the ordered results of a parser pool. With *stats*, each result
+    is a (messages, block stats) pair: the block stats are merged and the
+    waits on the pool are added to ipc_wait.
+    """
+    if stats is None:
+        for messages in results:
+            yield from messages
+        return
+    for messages, part in timed(results, stats, "ipc_wait"):
+        stats.merge(part)
+        yield from messages
+
+
+async def acollect(results: AsyncIterator[Any], stats: ParseStats | None) -> AsyncIterator[List[Any]]:
+    """Async collect(): each block's messages as one list; awaiting the pool counts as ipc_wait."""
+    async with aclosing(results):  # type: ignore[type-var]
+        if stats is None:
+            async for messages in results:
+                yield messages
+            return
+        clock = time.perf_counter
+        while True:
+            t0 = clock()
+            try:
+                messages, part = await results.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                stats.timings["ipc_wait"] += clock() - t0
+            stats.merge(part)
+            yield messages
@@ -0,0 +1,310 @@
+import gzip
+import io
+import lzma
+import os
+import queue
+import stat
+import struct
+import sys
+import threading
+from typing import Any, AsyncIterator, BinaryIO, Dict, FrozenSet, Generator, Iterator
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None  # type: ignore[assignment]
+
+from config import (
+    AP_TO_STRUCT,
+    FMT_FORMAT,
+    FMT_LENGTH,
+    FMT_MSG_TYPE,
+    START_SYNC_MARKER,
+    STREAM_CHUNK_SIZE,
+    STREAM_QUEUE_DEPTH,
+    STREAM_SUFFIXES,
+    TIME_WINDOW_SLACK_US,
+)
+from business_logic.records import compile_message_factory
+from business_logic.scheduling import aflatten, aiter_batches
+from business_logic.time_window import in_window, message_time
+from business_logic.type_search import MsgFilter
+
+_FMT_STRUCT = struct.Struct("<BB4s16s64s")
+
+# magic bytes → compression
+_MAGIC = {b"\x1f\x8b": "gz", b"\xfd7zXZ\x00": "xz", b"\x28\xb5\x2f\xfd": "zst"}
+
+_EOF = object()  # end of stream marker on the chunk queue
+
+
+def _decode_str(b: bytes) -> str:
+    """Fast ASCII decode + strip NULs."""
+    return b.decode("ascii", errors="ignore").rstrip("\x00")
+
+
+def require_zstandard() -> None:
+    if zstandard is None:
+        raise ImportError("Reading .zst logs requires zstandard (pip install zstandard)")
+
+
+def is_stream_source(source: Any) -> bool:
+    """True for inputs that cannot be memory-mapped: "-" (stdin), compressed logs, pipes and file objects."""
+    if source == "-":
+        return True
+    if not isinstance(source, (str, os.PathLike)):
+        return True
+    path = os.fspath(source)
+    if path.endswith(STREAM_SUFFIXES):
+        return True
+    return os.path.exists(path) and not stat.S_ISREG(os.stat(path).st_mode)
+
+
+def open_source(source: Any) -> BinaryIO:
+    """
+    Readable binary stream of the log bytes of *source*: a path, "-" for
+    stdin, or a binary file object. gzip, xz and zstd input is recognized
+    by its magic bytes (not its name) and decompressed on the fly.
+    """
+    if source == "-":
+        raw: Any = sys.stdin.buffer
+    elif isinstance(source, (str, os.PathLike)):
+        raw = open(source, "rb")
+    else:
+        raw = source
+    reader = raw if hasattr(raw, "peek") else io.BufferedReader(raw)
+
+    head = reader.peek(6)[:6]
+    kind = next((kind for magic, kind in _MAGIC.items() if head.startswith(magic)), None)
+    if kind == "gz":
+        return gzip.GzipFile(fileobj=reader)  # type: ignore[return-value]
+    if kind == "xz":
+        return lzma.LZMAFile(reader)  # type: ignore[return-value]
+    if kind == "zst":
+        require_zstandard()
+        return zstandard.ZstdDecompressor().stream_reader(reader, read_across_frames=True)
+    return reader
+
+
+def _put(chunks: "queue.Queue[Any]", item: Any, stop: threading.Event) -> None:
+    """Queue *item*, giving up once the consumer has stopped."""
+    while not stop.is_set():
+        try:
+            chunks.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _read_chunks(f: BinaryIO, chunk_size: int, chunks: "queue.Queue[Any]", stop: threading.Event) -> None:
+    """Reader thread: decompress *f* chunk by chunk into the bounded queue, then _EOF (or the error)."""
+    try:
+        while not stop.is_set():
+            data = f.read(chunk_size)
+            if not data:
+                break
+            _put(chunks, data, stop)
+        _put(chunks, _EOF, stop)
+    except Exception as e:  # handed to the consumer, raised there
+        _put(chunks, e, stop)
+
+
+class ParserStream:
+    def __init__(
+        self,
+        source: Any,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        queue_depth: int = STREAM_QUEUE_DEPTH,
+        records: bool = False,
+    ):
+        """
+        Parser for inputs that cannot be memory-mapped: compressed logs
+        (.gz / .xz / .zst), stdin ("-") or any binary file object.
+
+        A background thread reads and decompresses *chunk_size* chunks, at
+        most *queue_depth* ahead of the decoder, so decompression overlaps
+        with decoding and memory stays bounded whatever the log size.
+        Frames cut by a chunk boundary are carried over to the next chunk.
+        FMT records are picked up as they stream past.
+
+        A stream can only be read once: recv_match() may be called once.
+        """
+        self.source = source
+        self.chunk_size = chunk_size
+        self.queue_depth = queue_depth
+        self.records = records
+        self.bytes_read = 0  # decompressed bytes consumed so far
+        self._consumed = False
+        self._fmt_cache: Dict[int, Dict[str, Any]] = {}
+        self._add_fmt_self()
+
+    def recv_match(
+        self,
+        msg_name: MsgFilter = None,
+        start_us: int | None = None,
+        end_us: int | None = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield messages in stream order.
+        If msg_name is given (one name or several), only return messages of
+        those types. Types are matched by name as their FMT records arrive.
+        With *start_us* and/or *end_us*, only messages with
+        start_us <= TimeUS < end_us are returned. A stream cannot seek, so
+        the window is found by reading; reading stops once TimeUS passes
+        end_us by more than TIME_WINDOW_SLACK_US.
+        """
+        if self._consumed:
+            raise ValueError("A stream can only be read once")
+        self._consumed = True
+
+        names = None
+        if msg_name:
+            names = frozenset([msg_name] if isinstance(msg_name, str) else msg_name)
+        windowed = start_us is not None or end_us is not None
+        stop_us = None if end_us is None else end_us + TIME_WINDOW_SLACK_US
+        for msg in self._parse_stream(names):
+            if not windowed:
+                yield msg
+                continue
+            time_us = message_time(msg)
+            if stop_us is not None and time_us is not None and time_us >= stop_us:
+                return
+            if in_window(time_us, start_us, end_us):
+                yield msg
+
+    def arecv_match(
+        self,
+        msg_name: MsgFilter = None,
+        start_us: int | None = None,
+        end_us: int | None = None,
+        batches: bool = False,
+    ) -> AsyncIterator[Any]:
+        """
+        recv_match() for asyncio, for `async for`: decoding runs on a helper
+        thread a batch of messages at a time (ASYNC_BATCH_SIZE), so the event
+        loop never blocks on it. With *batches*, messages come as lists.
+        Closing the iterator or cancelling its consumer stops the reader.
+        """
+        results = aiter_batches(self.recv_match(msg_name, start_us, end_us))
+        return results if batches else aflatten(results)
+
+    def _chunks(self) -> Generator[bytes, None, None]:
+        """Decompressed chunks from the reader thread; stops the thread when the consumer stops."""
+        f = open_source(self.source)
+        chunks: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_depth)
+        stop = threading.Event()
+        reader = threading.Thread(target=_read_chunks, args=(f, self.chunk_size, chunks, stop), daemon=True)
+        reader.start()
+        try:
+            while True:
+                item = chunks.get()
+                if item is _EOF:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            # Close what was opened here; the caller's own file object / stdin stay
+            # open (a reader blocked on a pipe exits after its current read)
+            if isinstance(self.source, (str, os.PathLike)) and self.source != "-":
+                reader.join()
+                f.close()
+
+    def _parse_stream(self, names: FrozenSet[str] | None) -> Iterator[Dict[str, Any]]:
+        chunks = self._chunks()
+        try:
+            yield from self._parse_chunks(chunks, names)
+        finally:
+            chunks.close()  # stops the reader thread if the consumer stops early
+
+    def _parse_chunks(
+        self,
+        chunks: Generator[bytes, None, None],
+        names: FrozenSet[str] | None,
+    ) -> Iterator[Dict[str, Any]]:
+        buf = b""
+        pos = 0
+        final = False
+        while not final:
+            chunk = next(chunks, None)
+            final = chunk is None
+            # Unconsumed tail of the previous chunk (a cut frame) + the new chunk
+            self.bytes_read += pos
+            buf = buf[pos:] + (chunk or b"")
+            pos = 0
+            end = len(buf)
+
+            while True:
+                nxt = buf.find(START_SYNC_MARKER, pos)
+                if nxt == -1:
+                    # Keep the last byte: it may be the first half of a marker
+                    pos = max(pos, end - 1) if not final else end
+                    break
+                pos = nxt
+                if pos + 3 > end:
+                    if final:
+                        pos = end
+                    break
+
+                msg_type = buf[pos + 2]
+                fmt = self._fmt_cache.get(msg_type)
+                if fmt is None:
+                    pos += 1
+                    continue
+
+                if pos + fmt["frame_size"] > end:
+                    if not final:
+                        break  # frame continues in the next chunk
+                    if pos + 3 + fmt["struct_obj"].size > end:
+                        pos += 1  # truncated last frame
+                        continue
+
+                if msg_type == FMT_MSG_TYPE:
+                    self._add_fmt_from(buf, pos)
+
+                if names is None or fmt["name"] in names:
+                    try:
+                        msg = fmt["decoder"](buf, pos + 3)
+                    except struct.error:
+                        pos += 1
+                        continue
+                    yield msg
+
+                pos += fmt["Length"]
+
+        self.bytes_read += pos
+
+    def _add_fmt_from(self, buf: Any, pos: int) -> bool:
+        """Add the FMT record at *pos*; False if it is not a valid one."""
+        try:
+            typ, length, name_b, fmt_b, cols_b = _FMT_STRUCT.unpack_from(buf, pos + 3)
+        except struct.error:
+            return False
+
+        name = _decode_str(name_b)
+        if not name.isalnum():
+            return False
+
+        self._add_fmt(typ, length, name, _decode_str(fmt_b), _decode_str(cols_b))
+        return True
+
+    def _add_fmt(self, typ: int, length: int, name: str, fmt_raw: str, cols_raw: str) -> None:
+        struct_fmt = "<" + "".join(AP_TO_STRUCT.get(c, "") for c in fmt_raw)
+        struct_obj = struct.Struct(struct_fmt)
+
+        info = {
+            "Length": length,
+            "name": name,
+            "struct_obj": struct_obj,
+            "frame_size": max(length, 3 + struct_obj.size),  # bytes needed before decoding
+            "columns": cols_raw.split(","),
+            "format_chars": list(fmt_raw),
+        }
+        # Chunks are dropped once parsed: array/binary fields must not be views into them
+        info["decoder"] = compile_message_factory(info, self.records, detach=True)
+        self._fmt_cache[typ] = info
+
+    def _add_fmt_self(self) -> None:
+        # Add FMT message itself
+        self._add_fmt(FMT_MSG_TYPE, FMT_LENGTH, "FMT", FMT_FORMAT, "Type,Length,Name,Format,Columns")
@@ -1,24 +1,46 @@
+import asyncio
 import mmap
 import os
 import struct
-from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Dict, Iterator, List, Tuple
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import aclosing, nullcontext
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    ContextManager,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 from config import (
     AP_TO_STRUCT,
-    BINARY_FIELDS,
     BLOCK_SIZE,
+    BOUNDARY_SEARCH_LIMIT,
+    FMT_FORMAT,
     FMT_LENGTH,
     FMT_MSG_TYPE,
+    MAX_IN_FLIGHT,
     MAX_WORKERS,
     START_SYNC_MARKER,
-    CHAR_TO_DIVIDE,
 )
-
-
-def _decode_str(b: bytes) -> str:
-    """Fast ASCII decode + strip NUL bytes."""
-    return b.decode("ascii", errors="ignore").rstrip("\x00")
+from business_logic.boundaries import align_block, split_range
+from business_logic.columnar import Columns, columns_block, concat_columns, frame_lengths, gather_columns
+from business_logic.decoders import resolve_fields
+from business_logic.filters import FrameFilter, Where, WhereFilter, changed_columns, filter_types, parse_where
+from business_logic.log_index import LogIndex
+from business_logic.records import compile_message_factory
+from business_logic.schema import FmtScanner
+from business_logic.scheduling import Query, aflatten, aiter_ordered, iter_ordered, shutting_down, window_for_memory
+from business_logic.stats import ParseStats, acollect, collect, iter_offsets, iter_range, timed
+from business_logic.time_window import TimeSeeker, in_window, message_time, narrow_window, select_window
+from business_logic.type_search import MsgFilter, prefer_direct_search, resolve_types, search_hits
 
 
 def _ap_fmt_to_struct(fmt_chars: str) -> str:
@@ -26,98 +48,377 @@ def _ap_fmt_to_struct(fmt_chars: str) -> str:
     return "<" + "".join(AP_TO_STRUCT.get(c, "") for c in fmt_chars)
 
 
+# messages, or (messages, block stats) when the block is instrumented
+BlockResult = Union[List[Dict[str, Any]], Tuple[List[Dict[str, Any]], ParseStats]]
+
+
 def _process_block(
-    path: str,
+    mm: mmap.mmap,
     start: int,
     end: int,
     fmt_cache: Dict[int, Dict[str, Any]],
-    wanted_type: int | None,
-) -> List[Dict[str, Any]]:
-    """Parse one block of the file. Returns a plain list of messages."""
+    wanted_types: FrozenSet[int] | None,
+    records: bool = False,
+    with_stats: bool = False,
+    direct: bool = False,
+    fields: Tuple[str, ...] | None = None,
+    where: Where | None = None,
+) -> BlockResult:
+    """
+    Parse one block of the parser's shared mmap, its ends first moved onto
+    real frames. Returns a plain list of messages,
+    or (messages, block stats) when *with_stats* is set.
+    With *direct*, the wanted types are searched for instead of walking
+    every frame (see type_search). With *fields*, messages only have those
+    columns (see decoders.resolve_fields); with *where*, only the frames the
+    filter matches are decoded (see filters).
+    Array/binary fields are views over *mm*, so the map must outlive the block.
+    """
     messages: List[Dict[str, Any]] = []
+    lengths = frame_lengths(fmt_cache)
+    start, end = align_block(mm, start, end, lengths)
+    if direct:
+        stats = ParseStats() if with_stats else None
+        hits = search_hits(mm, start, end, wanted_types, lengths, stats)
+        return _process_offsets(mm, hits, fmt_cache, records, with_stats, fields, where, stats)
+
+    decoders = _decoders(fmt_cache, records, fields, where)
+
+    if with_stats:
+        stats = ParseStats()
+        return list(iter_range(mm, start, end, fmt_cache, decoders, wanted_types, stats)), stats
+
+    pos = start
+    while pos < end:
+        pos = mm.find(START_SYNC_MARKER, pos)
+        if pos == -1 or pos + 3 > end:
+            break
+
+        msg_type = mm[pos + 2]
+        info = fmt_cache.get(msg_type)
+        if info is None:  # unknown → skip one byte
+            pos += 1
+            continue
+
+        if wanted_types is not None and msg_type not in wanted_types:
+            pos += info["Length"]
+            continue
 
-    # Pre-compile struct objects for this block (very cheap)
-    structs = {typ: struct.Struct(info["struct_fmt"]) for typ, info in fmt_cache.items()}
+        # unpack
+        try:
+            msg = decoders[msg_type](mm, pos + 3)
+        except struct.error:
+            pos += 1
+            continue
 
-    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
-        pos = start
-        while pos < end:
-            pos = mm.find(START_SYNC_MARKER, pos)
-            if pos == -1 or pos + 3 > end:
-                break
-
-            msg_type = mm[pos + 2]
-            info = fmt_cache.get(msg_type)
-            if info is None:  # unknown → skip one byte
-                pos += 1
-                continue
-
-            if wanted_type is not None and wanted_type != msg_type:
-                pos += info["Length"]
-                continue
-
-            # unpack
-            try:
-                values = structs[msg_type].unpack_from(mm, pos + 3)
-            except struct.error:
-                pos += 1
-                continue
-
-            msg = dict(zip(info["columns"], values))
-
-            # decode string fields
-            for col, val in msg.items():
-                if isinstance(val, bytes) and col not in BINARY_FIELDS:
-                    msg[col] = _decode_str(val)
-
-            # scaling
-            for i, col in enumerate(info["columns"]):
-                val = msg[col]
-                if not isinstance(val, (int, float)):
-                    continue
-                fmt_char = info["format_chars"][i]
-                if fmt_char in CHAR_TO_DIVIDE:
-                    msg[col] = val / 100.0
-                elif fmt_char == "L":
-                    msg[col] = val / 1e7
-
-            msg["mavpackettype"] = info["name"]
+        if msg is not None:
             messages.append(msg)
+        pos += info["Length"]
 
-            pos += info["Length"]
+    return messages
+
+
+def _process_offsets(
+    mm: mmap.mmap,
+    offsets: Sequence[int],
+    fmt_cache: Dict[int, Dict[str, Any]],
+    records: bool = False,
+    with_stats: bool = False,
+    fields: Tuple[str, ...] | None = None,
+    where: Where | None = None,
+    stats: ParseStats | None = None,
+) -> BlockResult:
+    """
+    Decode the messages at the given (indexed) offsets; with *with_stats*,
+    recorded in *stats* (default new ones).
+    """
+    messages: List[Dict[str, Any]] = []
+    decoders = _decoders(fmt_cache, records, fields, where)
+
+    if with_stats:
+        stats = ParseStats() if stats is None else stats
+        return list(iter_offsets(mm, offsets, fmt_cache, decoders, stats)), stats
+
+    for pos in offsets:
+        msg_type = mm[pos + 2]
+        info = fmt_cache.get(msg_type)
+        if info is None:
+            continue
+        try:
+            msg = decoders[msg_type](mm, pos + 3)
+        except struct.error:
+            continue
+        if msg is not None:
+            messages.append(msg)
 
     return messages
 
 
+def _decoders(
+    fmt_cache: Dict[int, Dict[str, Any]], records: bool, fields: Tuple[str, ...] | None, where: Where | None
+) -> Dict[int, Any]:
+    """
+    Specialized decoders per type (compiled once per FMT definition, then
+    cached), behind the filter if any: its changed() state is the block's own.
+    """
+    decoders = {typ: compile_message_factory(info, records, fields=fields) for typ, info in fmt_cache.items()}
+    return decoders if where is None else FrameFilter(where).wrap(fmt_cache, decoders)
+
+
 class ParserThreadPool:
     def __init__(
         self,
         path: str,
         block_size: int = BLOCK_SIZE,
         max_workers: int = MAX_WORKERS,
+        use_index: bool = False,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        memory_limit: int | None = None,
+        records: bool = False,
+        stats: bool = False,
+        executor: Executor | None = None,
     ):
+        """
+        At most *max_in_flight* blocks are parsed ahead of the consumer.
+        *memory_limit* (bytes) caps that window further, shrinking blocks
+        if needed, so decoded-but-unread results stay under the limit.
+        With *records*, messages are lazy record objects over the shared
+        map (see records.compile_record_class) instead of dicts.
+        With *stats*, recv_match() records what it reads in self.stats (see
+        stats.ParseStats): the worker threads measure their blocks and the
+        consumer's waits on them count as ipc_wait.
+        With an *executor* (a thread pool shared by several parsers or
+        concurrent queries), blocks run there instead of on a pool created
+        per call; it is left running.
+        """
         self.path = os.path.abspath(path)
-        self.block_size = block_size
+        self._executor = executor
+        self.records = records
+        self.stats: ParseStats | None = ParseStats() if stats else None
+        self.block_size, self.max_in_flight = window_for_memory(block_size, memory_limit, max_in_flight)
         self.max_workers = max_workers
+        # One map shared by all worker threads; decoded views point into it
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
         self._fmt_cache: Dict[int, Dict[str, Any]] = {}
-        self._build_fmt_cache()
-
-    def recv_match(self, msg_name: str | None = None) -> Iterator[Dict[str, Any]]:
+        self._index: LogIndex | None = None
+        self._fmts: FmtScanner | None = None  # FMT records beyond the header are read block by block
+        self._seeker: TimeSeeker | None = None
+        self._seeker_key: Any = None
+        self.window_stats: Dict[str, int] = {}  # lookup/read cost of the last time-window query
+        if use_index:
+            self._index = LogIndex.load_or_build(self.path)
+            for entry in self._index.fmt_table:
+                self._add_fmt(*entry)
+        else:
+            self._fmts = FmtScanner(self._mm, self._add_fmt)
+        self._add_fmt_self()
+
+    def __del__(self) -> None:
+        try:
+            # Records reference the map: it is released with the last of them
+            if not self.records:
+                self._mm.close()
+            self._file.close()
+        except Exception:
+            pass  # still exported by decoded views: closed when they are gone
+
+    def recv_match(
+        self,
+        msg_name: MsgFilter = None,
+        start_us: int | None = None,
+        end_us: int | None = None,
+        fields: str | Iterable[str] | None = None,
+        where: WhereFilter = None,
+    ) -> Iterator[Dict[str, Any]]:
         """
         Yield messages in *file order*.
-        If *msg_name* is given, only messages of that type are returned.
+        If *msg_name* is given (one name or several), only messages of those
+        types are returned; workers search for rare types directly instead
+        of walking every frame (see type_search).
+        With *start_us* and/or *end_us*, only messages with
+        start_us <= TimeUS < end_us are returned: the window is found by
+        binary search on TimeUS and only its blocks are parsed
+        (self.window_stats reports the bytes touched).
+        With *fields*, messages only have those columns (TimeUS is kept for
+        time-window queries): the workers do not unpack nor decode the
+        others (see decoders.resolve_fields).
+        With *where* (an expression, or one per type name; see filters), the
+        workers only decode the frames it matches: the others are rejected
+        on their raw values and never reach the consumer.
         """
-        wanted_type = None
-        if msg_name:
-            for typ, info in self._fmt_cache.items():
-                if info["name"] == msg_name:
-                    wanted_type = typ
-                    break
+        messages = self._recv_match(msg_name, start_us, end_us, fields, where)
+        if self.stats is not None:
+            return timed(messages, self.stats, "total")
+        return messages
 
-        blocks = self._make_blocks()
+    def arecv_match(
+        self,
+        msg_name: MsgFilter = None,
+        start_us: int | None = None,
+        end_us: int | None = None,
+        batches: bool = False,
+        fields: str | Iterable[str] | None = None,
+        where: WhereFilter = None,
+    ) -> AsyncIterator[Any]:
+        """
+        recv_match() for asyncio: the same messages, for `async for`.
+        Blocks run on the pool and are awaited, so the event loop never
+        waits on them; with *batches*, each block's messages come as one
+        list. Cancelling the consuming task, or closing the iterator (e.g.
+        with contextlib.aclosing), cancels the blocks not started yet.
+        Concurrent queries share the parser's *executor* if it has one.
+        """
+        results = self._arecv_batches(msg_name, start_us, end_us, fields, where)
+        return results if batches else aflatten(results)
 
-        # Build a *picklable* version of the cache (only raw data, no struct objects)
-        fmt_cache_raw = {
+    async def _arecv_batches(
+        self,
+        msg_name: MsgFilter,
+        start_us: int | None,
+        end_us: int | None,
+        fields: str | Iterable[str] | None,
+        where: WhereFilter,
+    ) -> AsyncIterator[List[Any]]:
+        clause = parse_where(where)
+        # Planning touches the map (time search, selectivity samples): off the loop too
+        query = await asyncio.to_thread(self._query, msg_name, start_us, end_us, clause)
+        if query is None:
+            return
+        fn, tasks = self._tasks(*query, self._projection(query, fields, start_us, end_us, clause), clause)
+        frame_filter = FrameFilter(clause) if clause is not None else None
+        with self._pool(wait=False) as executor:
+            results = acollect(aiter_ordered(executor, fn, tasks, self.max_in_flight), self.stats)
+            async with aclosing(results):
+                async for batch in results:
+                    if frame_filter is not None:
+                        batch = list(frame_filter.changes(batch))
+                    batch = select_window(batch, start_us, end_us)
+                    if batch:
+                        yield batch
+
+    def _recv_match(
+        self,
+        msg_name: MsgFilter,
+        start_us: int | None,
+        end_us: int | None,
+        fields: str | Iterable[str] | None,
+        where: WhereFilter,
+    ) -> Iterator[Dict[str, Any]]:
+        clause = parse_where(where)
+        query = self._query(msg_name, start_us, end_us, clause)
+        if query is None:
+            return
+        projection = self._projection(query, fields, start_us, end_us, clause)
+
+        if start_us is None and end_us is None:
+            yield from self._recv(*query, projection, clause)
+            return
+
+        for msg in self._recv(*query, projection, clause):
+            if in_window(message_time(msg), start_us, end_us):
+                yield msg
+
+    def _query(
+        self, msg_name: MsgFilter, start_us: int | None, end_us: int | None, where: Where | None = None
+    ) -> Query | None:
+        """What to read for a query (see scheduling.Query); None if nothing can match."""
+        wanted_types = resolve_types(self._fmt_cache, msg_name, self._scan_all_fmts)
+        if wanted_types is not None and not wanted_types:
+            return None
+        wanted_types = filter_types(self._fmt_cache, wanted_types, where, self._scan_all_fmts)
+        indexed = wanted_types is not None and self._index is not None
+
+        if start_us is None and end_us is None:
+            if indexed:
+                return wanted_types, self._index.offsets_for_types(wanted_types), None, False
+            return wanted_types, None, self._make_blocks(), self._prefer_direct_search(wanted_types)
+
+        if self._seeker is None or self._seeker_key != len(self._fmt_cache):
+            self._seeker, self._seeker_key = TimeSeeker(self._fmt_cache), len(self._fmt_cache)
+        if wanted_types is not None:
+            wanted_types = wanted_types & self._seeker.timed.keys()
+            if not wanted_types:
+                self.window_stats = {"start": 0, "end": 0, "probes": 0, "bytes_touched": 0}
+                return None
+
+        indexed_offsets = None
+        length = 0
+        if indexed:
+            indexed_offsets = self._index.offsets_for_types(wanted_types)
+            length = max(self._fmt_cache[typ]["Length"] for typ in wanted_types)
+        offsets, start, end, self.window_stats = narrow_window(
+            self._mm, self._seeker, start_us, end_us, indexed_offsets, length
+        )
+        if offsets is not None:
+            return wanted_types, offsets, None, False
+        return wanted_types, None, self._make_blocks(start, end), self._prefer_direct_search(wanted_types)
+
+    def _projection(
+        self,
+        query: Query,
+        fields: str | Iterable[str] | None,
+        start_us: int | None,
+        end_us: int | None,
+        where: Where | None,
+    ) -> Tuple[str, ...] | None:
+        """
+        The decoders' projection for a planned query (see decoders.resolve_fields),
+        with the columns the consumer selects on: TimeUS and those of changed().
+        """
+        keep = ("TimeUS",) if start_us is not None or end_us is not None else ()
+        return resolve_fields(self._fmt_cache, query[0], fields, keep + changed_columns(where))
+
+    def _recv(
+        self,
+        wanted_types: FrozenSet[int] | None,
+        offsets: Sequence[int] | None,
+        blocks: List[Tuple[int, int]] | None,
+        direct: bool,
+        fields: Tuple[str, ...] | None = None,
+        where: Where | None = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Messages of a query, in file order."""
+        fn, tasks = self._tasks(wanted_types, offsets, blocks, direct, fields, where)
+        with self._pool() as executor:
+            messages = collect(iter_ordered(executor, fn, tasks, self.max_in_flight), self.stats)
+            # Blocks filter changed() on their own: drop the repeats where they meet
+            yield from messages if where is None else FrameFilter(where).changes(messages)
+
+    def _tasks(
+        self,
+        wanted_types: FrozenSet[int] | None,
+        offsets: Sequence[int] | None,
+        blocks: List[Tuple[int, int]] | None,
+        direct: bool,
+        fields: Tuple[str, ...] | None = None,
+        where: Where | None = None,
+    ) -> Tuple[Callable[..., Any], Iterator[Tuple[Any, ...]]]:
+        """Worker function and its arguments, block by block in file order."""
+        fmt_cache_raw = self._fmt_cache_raw()
+        with_stats = self.stats is not None
+
+        if offsets is not None:
+            step = max(1, self.block_size // max(self._fmt_cache[typ]["Length"] for typ in wanted_types))
+            tasks = (
+                (self._mm, offsets[i : i + step], fmt_cache_raw, self.records, with_stats, fields, where)
+                for i in range(0, len(offsets), step)
+            )
+            return _process_offsets, tasks
+
+        def block_tasks() -> Iterator[Tuple[Any, ...]]:
+            raw = fmt_cache_raw
+            for start, end in blocks:
+                # FMT records up to where the worker may move the block end
+                if self._scan_fmts(end + BOUNDARY_SEARCH_LIMIT):
+                    raw = self._fmt_cache_raw()
+                yield self._mm, start, end, raw, wanted_types, self.records, with_stats, direct, fields, where
+
+        return _process_block, block_tasks()
+
+    def _fmt_cache_raw(self) -> Dict[int, Dict[str, Any]]:
+        """Worker copy of fmt_cache (only raw data, no struct objects); a new dict per FMT change."""
+        return {
             typ: {
                 "Length": info["Length"],
                 "name": info["name"],
@@ -128,56 +429,75 @@ class ParserThreadPool:
             for typ, info in self._fmt_cache.items()
         }
 
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+    def _scan_fmts(self, end: int) -> bool:
+        """Read the FMT records before *end* not read yet; True if there were any."""
+        return self._fmts is not None and self._fmts.advance(self._mm, end)
+
+    def _scan_all_fmts(self, names: Iterable[str] | None = None) -> None:
+        """
+        Read the log's remaining FMT records, or, for a type lookup by *names*,
+        only up to theirs when the schema cache knows them (FmtScanner.seek).
+        """
+        if names is not None and self._fmts is not None and self._fmts.seek(self._mm, names):
+            return
+        self._scan_fmts(len(self._mm))
+
+    def _pool(self, wait: bool = True) -> ContextManager[Executor]:
+        """The shared executor (left running), or a pool for this call only."""
+        if self._executor is not None:
+            return nullcontext(self._executor)
+        return shutting_down(ThreadPoolExecutor(max_workers=self.max_workers), wait)
+
+    def _prefer_direct_search(self, wanted_types: FrozenSet[int] | None) -> bool:
+        return prefer_direct_search(self._mm, wanted_types, frame_lengths(self._fmt_cache))
+
+    def recv_columns(self, msg_name: str) -> Columns:
+        """
+        Return every message of type *msg_name* as one NumPy array per column,
+        with strings decoded and scaling applied. Blocks are gathered in
+        parallel and concatenated in file order. Requires numpy.
+        """
+        self._scan_all_fmts()  # every block is walked
+        wanted_type = None
+        for typ, info in self._fmt_cache.items():
+            if info["name"] == msg_name:
+                wanted_type = typ
+                break
+        if wanted_type is None:
+            raise ValueError(f"Unknown message type: {msg_name}")
+
+        info = self._fmt_cache[wanted_type]
+        info_raw = {
+            "Length": info["Length"],
+            "name": info["name"],
+            "columns": info["columns"],
+            "format_chars": info["format_chars"],
+        }
+
+        if self._index is not None:
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                columns = gather_columns(mm, self._index.offsets_for(wanted_type), info_raw)
+            return columns
+
+        lengths = frame_lengths(self._fmt_cache)
+        with self._pool() as executor:
             futures = [
-                executor.submit(
-                    _process_block,
-                    self.path,
-                    start,
-                    end,
-                    fmt_cache_raw,
-                    wanted_type,
-                )
-                for start, end in blocks
+                executor.submit(columns_block, self.path, start, end, lengths, wanted_type, info_raw)
+                for start, end in self._make_blocks()
             ]
-            for future in futures:
-                yield from future.result()
-
-    def _build_fmt_cache(self) -> None:
-        marker = START_SYNC_MARKER + bytes([FMT_MSG_TYPE])
-        fmt_struct = struct.Struct("<BB4s16s64s")
-
-        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
-            pos = 0
-            while True:
-                pos = mm.find(marker, pos)
-                if pos == -1:
-                    break
-                try:
-                    typ, length, name_b, fmt_b, cols_b = fmt_struct.unpack_from(mm, pos + 3)
-                except struct.error:
-                    pos += 1
-                    continue
-
-                name = _decode_str(name_b)
-                if not name.isalnum():
-                    pos += 1
-                    continue
-
-                fmt_raw = _decode_str(fmt_b)
-                cols_raw = _decode_str(cols_b)
-
-                struct_fmt = _ap_fmt_to_struct(fmt_raw)
-
-                self._fmt_cache[typ] = {
-                    "Length": length,
-                    "name": name,
-                    "struct_fmt": struct_fmt,
-                    "columns": cols_raw.split(","),
-                    "format_chars": list(fmt_raw),
-                }
-                pos += FMT_LENGTH
+            parts = [future.result() for future in futures]
+        return concat_columns(parts, info_raw)
+
+    def _add_fmt(self, typ: int, length: int, name: str, fmt_raw: str, cols_raw: str) -> None:
+        self._fmt_cache[typ] = {
+            "Length": length,
+            "name": name,
+            "struct_fmt": _ap_fmt_to_struct(fmt_raw),
+            "columns": cols_raw.split(","),
+            "format_chars": list(fmt_raw),
+        }
 
+    def _add_fmt_self(self) -> None:
         # Add the FMT message definition itself
         if FMT_MSG_TYPE not in self._fmt_cache:
             self._fmt_cache[FMT_MSG_TYPE] = {
@@ -185,21 +505,13 @@ class ParserThreadPool:
                 "name": "FMT",
                 "struct_fmt": "<BB4s16s64s",
                 "columns": ["Type", "Length", "Name", "Format", "Columns"],
-                "format_chars": [],
+                "format_chars": list(FMT_FORMAT),
             }
 
-    def _make_blocks(self) -> List[Tuple[int, int]]:
-        file_size = os.path.getsize(self.path)
-        blocks: List[Tuple[int, int]] = []
-        start = 0
-
-        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
-            while start < file_size:
-                end = min(start + self.block_size, file_size)
-                nxt = mm.find(START_SYNC_MARKER, end)
-                if nxt != -1:
-                    end = nxt
-                blocks.append((start, end))
-                start = end
-
-        return blocks
+    def _make_blocks(self, first: int = 0, last: int | None = None) -> List[Tuple[int, int]]:
+        """
+        Nominal blocks covering [first, last) (default: the whole file).
+        Workers move each cut onto a real frame themselves (boundaries.align_block).
+        """
+        last = os.path.getsize(self.path) if last is None else last
+        return split_range(first, last, self.block_size)
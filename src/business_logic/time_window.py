@@ -0,0 +1,199 @@
+import struct
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import START_SYNC_MARKER, TIME_SEEK_GRANULARITY, TIME_WINDOW_SLACK_US
+
+TIME_US = struct.Struct("<Q")
+
+Probe = Optional[Tuple[int, int]]  # (frame offset, TimeUS)
+
+
+def timed_types(fmt_cache: Dict[int, Dict[str, Any]]) -> Dict[int, int]:
+    """type → Length of the types whose first column is a uint64 TimeUS."""
+    return {
+        typ: info["Length"]
+        for typ, info in fmt_cache.items()
+        if info["columns"][:1] == ["TimeUS"] and info["format_chars"][:1] == ["Q"]
+    }
+
+
+def message_time(msg: Any) -> int | None:
+    """TimeUS of a decoded message (dict or record), None if it has none."""
+    if isinstance(msg, dict):
+        return msg.get("TimeUS")
+    return getattr(msg, "TimeUS", None)
+
+
+def in_window(time_us: int | None, start_us: int | None, end_us: int | None) -> bool:
+    """start_us <= time_us < end_us, either bound optional; untimed messages never match."""
+    if time_us is None:
+        return False
+    return (start_us is None or time_us >= start_us) and (end_us is None or time_us < end_us)
+
+
+def select_window(messages: List[Any], start_us: int | None, end_us: int | None) -> List[Any]:
+    """The messages of a decoded batch inside the window; the batch itself without bounds."""
+    if start_us is None and end_us is None:
+        return messages
+    return [msg for msg in messages if in_window(message_time(msg), start_us, end_us)]
+
+
+class TimeSeeker:
+    """
+    Binary search over the byte offsets of a log for a TimeUS value.
+
+    Each probe resyncs on the marker from an arbitrary offset to the next
+    frame that carries a TimeUS. Probes are checkpoints kept for the life
+    of the seeker, so later queries on the same file reuse them.
+    bytes_touched counts the bytes read by probes that were not cached.
+    """
+
+    def __init__(self, fmt_cache: Dict[int, Dict[str, Any]], granularity: int = TIME_SEEK_GRANULARITY):
+        self.lengths = {typ: info["Length"] for typ, info in fmt_cache.items()}
+        self.timed = timed_types(fmt_cache)
+        self.granularity = granularity
+        self.checkpoints: Dict[int, Probe] = {}  # probe offset → first timed frame at or after it
+        self.probes = 0
+        self.bytes_touched = 0
+
+    def frame_after(self, buf: Any, pos: int) -> Probe:
+        """
+        First frame at or after *pos* that carries a TimeUS, as (offset, TimeUS).
+        A candidate only counts if the frame after it starts with the marker
+        too (or the file ends there), so marker bytes inside a payload are
+        not mistaken for a frame.
+        """
+        if pos in self.checkpoints:
+            return self.checkpoints[pos]
+
+        size = len(buf)
+        start = pos
+        found: Probe = None
+        while True:
+            pos = buf.find(START_SYNC_MARKER, pos)
+            if pos == -1 or pos + 3 > size:
+                break
+            typ = buf[pos + 2]
+            length = self.lengths.get(typ)
+            if length is None:
+                pos += 1
+                continue
+            nxt = pos + length
+            if nxt + 2 <= size and buf[nxt : nxt + 2] != START_SYNC_MARKER:
+                pos += 1
+                continue
+            if typ in self.timed and pos + 3 + TIME_US.size <= size:
+                found = (pos, TIME_US.unpack_from(buf, pos + 3)[0])
+                break
+            pos = nxt
+
+        self.probes += 1
+        self.bytes_touched += (found[0] + 3 + TIME_US.size if found else size) - start
+        self.checkpoints[start] = found
+        return found
+
+    def bounds(self, buf: Any, time_us: int) -> Tuple[int, int]:
+        """
+        (lo, hi) byte offsets around the first frame with TimeUS >= *time_us*:
+        lo is a frame with an earlier TimeUS (or 0), and the first timed frame
+        at or after hi is not earlier (or hi is the end of the file).
+        hi - lo is at most the seeker's granularity.
+        """
+        lo, hi = 0, len(buf)
+        while hi - lo > self.granularity:
+            mid = (lo + hi) // 2
+            probe = self.frame_after(buf, mid)
+            if probe is None or probe[0] >= hi or probe[1] >= time_us:
+                hi = mid
+            else:
+                lo = probe[0]
+        return lo, hi
+
+    def byte_range(
+        self,
+        buf: Any,
+        start_us: int | None,
+        end_us: int | None,
+        slack_us: int = TIME_WINDOW_SLACK_US,
+    ) -> Tuple[int, int]:
+        """
+        [start, end) byte range holding every frame of the time window.
+        Both ends are widened by *slack_us*, because TimeUS is only roughly
+        ordered across message types; callers still filter on TimeUS.
+        """
+        start = 0 if start_us is None else self.bounds(buf, start_us - slack_us)[0]
+        end = len(buf) if end_us is None else self.bounds(buf, end_us + slack_us)[1]
+        return start, max(start, end)
+
+
+def offsets_window(
+    buf: Any,
+    offsets: Sequence[int],
+    start_us: int | None,
+    end_us: int | None,
+    slack_us: int = TIME_WINDOW_SLACK_US,
+) -> Tuple[Sequence[int], int]:
+    """
+    The part of a sorted (indexed) offset array whose frames fall in the
+    window, found by bisecting on the TimeUS of the frames themselves.
+    As in TimeSeeker.byte_range, TimeUS is only roughly ordered across
+    message types: the frames within *slack_us* of either bound are
+    checked one by one, those further inside are taken as they are.
+    Returns (offsets, bytes read to find them).
+    """
+    touched = 0
+
+    def time_at(i: int) -> int:
+        nonlocal touched
+        touched += TIME_US.size
+        return TIME_US.unpack_from(buf, offsets[i] + 3)[0]
+
+    def first_at(time_us: int, lo: int) -> int:
+        return bisect_left(range(lo, len(offsets)), time_us, key=time_at) + lo
+
+    def exact(first: int, last: int) -> Sequence[int]:
+        kept = [offsets[i] for i in range(first, last) if in_window(time_at(i), start_us, end_us)]
+        return array(offsets.typecode, kept) if isinstance(offsets, array) else kept
+
+    lo = 0 if start_us is None else first_at(start_us - slack_us, 0)
+    inner_lo = lo if start_us is None else first_at(start_us + slack_us, lo)
+    hi = len(offsets) if end_us is None else first_at(end_us + slack_us, lo)
+    inner_hi = hi if end_us is None else first_at(end_us - slack_us, lo)
+    if inner_lo >= inner_hi:
+        return exact(lo, hi), touched
+    return exact(lo, inner_lo) + offsets[inner_lo:inner_hi] + exact(inner_hi, hi), touched
+
+
+def narrow_window(
+    buf: Any,
+    seeker: TimeSeeker,
+    start_us: int | None,
+    end_us: int | None,
+    offsets: Sequence[int] | None = None,
+    frame_length: int = 0,
+) -> Tuple[Sequence[int] | None, int, int, Dict[str, int]]:
+    """
+    Narrow a time-window query down to what has to be read:
+    (offsets, start, end, stats). With the indexed *offsets* of one type
+    (frames of *frame_length*), their slice inside the window; otherwise
+    offsets is None and [start, end) is the byte range to parse.
+    stats holds the probes made and every byte touched, lookup included.
+    """
+    if offsets is not None:
+        offsets, lookup = offsets_window(buf, offsets, start_us, end_us)
+        touched = lookup + len(offsets) * frame_length
+        start, end = (offsets[0], offsets[-1] + frame_length) if len(offsets) else (0, 0)
+        stats = {"start": start, "end": end, "probes": lookup // TIME_US.size, "bytes_touched": touched}
+        return offsets, start, end, stats
+
+    probes, lookup = seeker.probes, seeker.bytes_touched
+    start, end = seeker.byte_range(buf, start_us, end_us)
+    stats = {
+        "start": start,
+        "end": end,
+        "probes": seeker.probes - probes,
+        "bytes_touched": seeker.bytes_touched - lookup + end - start,
+    }
+    return None, start, end, stats
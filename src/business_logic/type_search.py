@@ -0,0 +1,192 @@
+import heapq
+from typing import Any, Callable, Dict, FrozenSet, Generator, Iterable, Iterator, List
+
+from config import (
+    BOUNDARY_CHAIN_DEPTH,
+    DIRECT_SEARCH_MAX_SHARE,
+    DIRECT_SEARCH_MAX_TYPES,
+    SELECTIVITY_SAMPLE_BYTES,
+    SELECTIVITY_SAMPLES,
+    START_SYNC_MARKER,
+)
+from business_logic.boundaries import aligned_cut, frame_chain
+from business_logic.stats import ParseStats, timed
+
+MsgFilter = str | Iterable[str] | None  # recv_match msg_name: one name, several, or all
+
+
+def resolve_types(
+    fmt_cache: Dict[int, Dict[str, Any]], msg_name: MsgFilter, scan_rest: Callable[..., Any] | None = None
+) -> FrozenSet[int] | None:
+    """
+    Type ids matching *msg_name* (one name or an iterable of names); None
+    means no filter. If a name is not defined (yet), scan_rest(missing names)
+    is called to read the log's remaining FMT records first: types may be
+    defined late.
+    """
+    if msg_name is None or msg_name == "":
+        return None
+    names = {msg_name} if isinstance(msg_name, str) else set(msg_name)
+    found = {typ: info["name"] for typ, info in fmt_cache.items() if info["name"] in names}
+    if scan_rest is not None and len(set(found.values())) < len(names):
+        scan_rest(names - set(found.values()))
+        found = {typ: info["name"] for typ, info in fmt_cache.items() if info["name"] in names}
+    return frozenset(found)
+
+
+def wanted_share(
+    buf: Any,
+    types: FrozenSet[int],
+    lengths: Dict[int, int],
+    samples: int = SELECTIVITY_SAMPLES,
+    sample_bytes: int = SELECTIVITY_SAMPLE_BYTES,
+) -> float:
+    """Share of the frames that are of *types*, walked in a few samples spread over the buffer."""
+    size = len(buf)
+    frames = hits = 0
+    for k in range(samples):
+        pos = aligned_cut(buf, size * k // samples, lengths)
+        end = min(size, pos + sample_bytes)
+        while pos < end:
+            pos = buf.find(START_SYNC_MARKER, pos, end)
+            if pos == -1 or pos + 3 > end:
+                break
+            msg_type = buf[pos + 2]
+            length = lengths.get(msg_type)
+            if length is None:
+                pos += 1
+                continue
+            frames += 1
+            hits += msg_type in types
+            pos += length
+    return hits / frames if frames else 0.0
+
+
+def prefer_direct_search(buf: Any, types: FrozenSet[int] | None, lengths: Dict[int, int]) -> bool:
+    """
+    Selectivity heuristic: search for the types directly when they are few
+    and rare enough that skipping the other frames beats walking them.
+    """
+    if not types or len(types) > DIRECT_SEARCH_MAX_TYPES:
+        return False
+    return wanted_share(buf, types, lengths) <= DIRECT_SEARCH_MAX_SHARE
+
+
+def _walk_hits(buf: Any, start: int, end: int, types: FrozenSet[int], lengths: Dict[int, int]) -> Iterator[int]:
+    """Offsets of the frames of *types* starting in [start, end), found by walking every frame."""
+    pos = start
+    while pos < end:
+        pos = buf.find(START_SYNC_MARKER, pos, end + 2)
+        if pos == -1 or pos + 3 > len(buf):
+            return
+        length = lengths.get(buf[pos + 2])
+        if length is None:
+            pos += 1
+            continue
+        if buf[pos + 2] in types:
+            yield pos
+        pos += length
+
+
+def iter_type_hits(
+    buf: Any,
+    start: int,
+    end: int,
+    types: FrozenSet[int],
+    lengths: Dict[int, int],
+    depth: int = BOUNDARY_CHAIN_DEPTH,
+    stats: ParseStats | None = None,
+) -> Iterator[int]:
+    """
+    Offsets, in order, of the frames of *types* starting in [start, end),
+    found by searching for marker + type byte instead of walking every
+    frame. A hit counts only if the FMT length chain from it holds (see
+    boundaries.frame_chain) and it does not fall inside the previous hit,
+    so marker bytes in payloads are not taken for frames.
+
+    A real frame directly followed by corrupt bytes fails the chain too, so
+    a failed hit is never just dropped: the frames from the end of the last
+    confirmed one are walked, as a full walk would, up to a frame past it
+    whose chain holds, and the search goes on from there. A type filter
+    thus never returns less than walking and filtering. With *stats*, the
+    bytes those walks skip are recorded as resyncs.
+
+    Near the end of the buffer a chain is confirmed by running into the
+    end, which proves nothing, so the last few frames are walked instead.
+    """
+    reach = depth * max(lengths.values(), default=0)
+    tail = aligned_cut(buf, max(start, len(buf) - 2 * reach), lengths, depth)
+    end_search = min(end, tail)
+
+    patterns = {typ: START_SYNC_MARKER + bytes([typ]) for typ in types}
+    heap = []
+    for typ, pattern in patterns.items():
+        pos = buf.find(pattern, start, end_search)
+        if pos != -1:
+            heap.append((pos, typ))
+    heapq.heapify(heap)
+
+    covered = start  # end of the last frame returned (or walked past)
+    while heap:
+        pos, typ = heap[0]
+        if pos >= covered:
+            if frame_chain(buf, pos, lengths, depth):
+                yield pos
+                covered = pos + lengths[typ]
+            else:
+                walk = _walk_past(buf, covered, pos, end_search, types, lengths, depth, stats)
+                covered = yield from walk
+        nxt = buf.find(patterns[typ], max(pos + 1, covered), end_search)
+        if nxt == -1:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (nxt, typ))
+
+    if end > tail:
+        yield from _walk_hits(buf, max(tail, covered), end, types, lengths)
+
+
+def search_hits(
+    buf: Any, start: int, end: int, types: FrozenSet[int], lengths: Dict[int, int], stats: ParseStats | None = None
+) -> List[int]:
+    """iter_type_hits of a block; with *stats*, its time is recorded as search (and its resyncs)."""
+    hits = iter_type_hits(buf, start, end, types, lengths, stats=stats)
+    return list(hits if stats is None else timed(hits, stats, "search"))
+
+
+def _walk_past(
+    buf: Any,
+    pos: int,
+    failed: int,
+    end: int,
+    types: FrozenSet[int],
+    lengths: Dict[int, int],
+    depth: int,
+    stats: ParseStats | None,
+) -> Generator[int, None, int]:
+    """
+    Walk the frames from *pos* (a real frame) like a full walk, yielding
+    those of *types*, until the first frame past *failed* whose chain holds;
+    return where the walk stopped (at most *end*).
+    """
+    while pos < end:
+        nxt = buf.find(START_SYNC_MARKER, pos, end + 1)
+        if nxt == -1 or nxt + 3 > len(buf):
+            if stats is not None:
+                stats.skip(pos, end)
+            return end
+        if stats is not None:
+            stats.skip(pos, nxt)
+        pos = nxt
+        length = lengths.get(buf[pos + 2])
+        if length is None:
+            if stats is not None:
+                stats.skip(pos, pos + 1)
+            pos += 1
+            continue
+        if pos > failed and frame_chain(buf, pos, lengths, depth):
+            return pos
+        if buf[pos + 2] in types:
+            yield pos
+        pos += length
+    return pos
@@ -1,9 +1,11 @@
-from typing import Dict, Set
+import os
+from typing import Any, Dict, Set
 
 # File / parsing settings
 START_SYNC_MARKER = b"\xa3\x95"  # 2-byte header
 FMT_MSG_TYPE = 128  # Message type of FMT records
 FMT_LENGTH = 89  # Fixed size of a FMT message
+FMT_FORMAT = "BBnNZ"  # Format chars of the FMT message itself
 
 # ArduPilot → struct format mapping
 AP_TO_STRUCT: Dict[str, str] = {
@@ -29,6 +31,30 @@ AP_TO_STRUCT: Dict[str, str] = {
     "Q": "Q",  # uint64_t
 }
 
+# ArduPilot → NumPy dtype mapping (columnar output)
+AP_TO_NUMPY: Dict[str, Any] = {
+    "a": ("<i2", (32,)),
+    "b": "i1",
+    "B": "u1",
+    "h": "<i2",
+    "H": "<u2",
+    "i": "<i4",
+    "I": "<u4",
+    "f": "<f4",
+    "d": "<f8",
+    "n": "S4",
+    "N": "S16",
+    "Z": "S64",
+    "c": "<i2",
+    "C": "<u2",
+    "e": "<i4",
+    "E": "<u4",
+    "L": "<i4",
+    "M": "u1",
+    "q": "<i8",
+    "Q": "<u8",
+}
+
 # Scaling & special handling
 CHAR_TO_DIVIDE: Set[str] = {"c", "C", "e", "E"}  # divide by 100
 BINARY_FIELDS: Set[str] = {"Data", "Data0", "Data1"}  # keep raw bytes
@@ -36,3 +62,71 @@ BINARY_FIELDS: Set[str] = {"Data", "Data0", "Data1"}  # keep raw bytes
 # Default parser behaviour
 BLOCK_SIZE = 10 * 1024 * 1024  # 15 MiB
 MAX_WORKERS = 8  # for threaded version
+
+# Block boundaries (boundaries.py): cuts are moved onto confirmed frames
+BOUNDARY_CHAIN_DEPTH = 4  # consecutive frames that must chain by FMT Length from a cut
+BOUNDARY_SEARCH_LIMIT = 64 * 1024  # a cut moves at most this far; beyond it, it stays unconfirmed
+
+# Filtered reads (type_search.py): direct marker + type search for rare types
+DIRECT_SEARCH_MAX_SHARE = 0.2  # searched directly when at most this share of frames is wanted
+DIRECT_SEARCH_MAX_TYPES = 4  # one pattern search per type: more types always walk frames
+SELECTIVITY_SAMPLES = 4  # samples spread over the log to estimate the share
+SELECTIVITY_SAMPLE_BYTES = 64 * 1024
+
+# FMT discovery (schema.py)
+FMT_HEADER_BYTES = 1024 * 1024  # searched for FMT records when a log is opened
+FMT_SCAN_STEP = 8 * 1024 * 1024  # ParserSync scans for FMT records this far ahead of decoding
+SCHEMA_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ardupilot_parser", "schemas")
+
+# Offset index sidecar
+INDEX_SUFFIX = ".idx"  # written next to the log
+INDEX_HASH_BYTES = 1024 * 1024  # head/tail bytes hashed to detect changes
+
+# Fleet batch mode (fleet.py)
+FLEET_PATTERN = "*.bin"  # logs picked up when a directory is given
+FLEET_BLOCK_SIZE = 8 * 1024 * 1024  # files are split into blocks of about this size
+
+# Parser instrumentation (stats.py)
+STATS_MAX_SKIPPED_RANGES = 1000  # skipped byte ranges kept in detail; counters cover the rest
+
+# Columnar cache (column_cache.py)
+COLUMN_CACHE_SUFFIX = ".columns"  # cache directory written next to the log
+
+# Downsampling pyramid (pyramid.py)
+PYRAMID_SUFFIX = ".pyramid"  # directory written next to the log
+PYRAMID_BASE_BUCKET_US = 100_000  # finest level; closer zooms read the raw frames
+PYRAMID_FACTOR = 4  # each level's buckets are this many times wider than the previous one's
+PYRAMID_TOP_BUCKETS = 1000  # no coarser level once a level has at most this many buckets
+PYRAMID_CHUNK_ROWS = 256 * 1024  # frames reduced per parallel task
+PYRAMID_MAX_POINTS = 4000  # window() returns at most this many rows (raw frames or buckets)
+
+# Streaming scheduler (pool backends)
+MAX_IN_FLIGHT = 2 * MAX_WORKERS  # blocks submitted but not yet consumed
+RESULT_MEMORY_FACTOR = 16  # decoded dicts ≈ 16× the block size on disk
+ASYNC_BATCH_SIZE = 10_000  # messages per batch when arecv_match() drives a blocking parser
+
+# Streaming input (stream_parser.py): compressed files and pipes
+STREAM_CHUNK_SIZE = 1024 * 1024  # bytes handed over by the decompression thread at a time
+STREAM_QUEUE_DEPTH = 4  # chunks decompressed ahead of the parser
+STREAM_SUFFIXES = (".gz", ".xz", ".zst")  # opened by open_parser() as streams
+
+# Follow (tail) mode
+FOLLOW_POLL_INTERVAL = 0.05  # seconds between size checks while waiting
+
+# Time-window queries (recv_match start_us / end_us)
+TIME_SEEK_GRANULARITY = 64 * 1024  # binary search stops once the range is this small
+TIME_WINDOW_SLACK_US = 1_000_000  # TimeUS is only roughly ordered across types
+
+# Backend selection / auto-tuning (engine.py)
+MIN_BLOCK_SIZE = 1 * 1024 * 1024
+MAX_BLOCK_SIZE = 64 * 1024 * 1024
+BLOCKS_PER_WORKER = 4  # keeps workers busy while the consumer drains results
+PARALLEL_EFFICIENCY = 0.8
+CALIBRATION_SAMPLE = 4 * 1024 * 1024  # bytes parsed by a calibration pass
+CALIBRATION_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ardupilot_parser", "calibration.json")
+DEFAULT_CALIBRATION: Dict[str, float] = {
+    "sync_rate": 4e6,  # bytes/s, full decode
+    "filtered_rate": 2e7,  # bytes/s, walking past frames of other types
+    "ipc_rate": 2e7,  # bytes/s of log whose decoded result the parent can unpickle
+    "pool_startup": 0.1,  # seconds to start a process pool
+}
@@ -1,5 +1,12 @@
-from test.runtime import RuntimeTests
-from test.verify import VerifyTests
+import os
+import sys
+
+# test/ modules import each other as top-level modules, as under pytest and in the test/ scripts;
+# a "test" package would be shadowed by the standard library's
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "test"))
+
+from runtime import RuntimeTests
+from verify import VerifyTests
 
 if __name__ == "__main__":
     verify_tests_class = VerifyTests()
@@ -12,3 +19,4 @@ if __name__ == "__main__":
     runtime_tests_class.parsor_runtime()
     runtime_tests_class.threads_runtime()
     runtime_tests_class.multiprocessing_runtime()
+    runtime_tests_class.multiprocessing_shm_runtime()
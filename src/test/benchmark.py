@@ -0,0 +1,245 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import START_SYNC_MARKER
+from business_logic.decoders import compile_decoder
+from business_logic.multi_processing import ParserMultiprocessing, _apply_scaling_and_decode
+from business_logic.parser_sync import ParserSync
+from business_logic.thread_parser import ParserThreadPool
+from synthetic_log import generate_log, write_log
+
+try:
+    import resource
+except ImportError:  # Unix only: no peak RSS elsewhere
+    resource = None  # type: ignore[assignment]
+
+try:
+    from pymavlink import mavutil
+except ImportError:  # optional reference backend
+    mavutil = None
+
+
+def _frames(parser: ParserSync) -> List[Any]:
+    """(offset, fmt) of every frame in the log."""
+    frames = []
+    pos = 0
+    mm = parser._mm
+    while True:
+        pos = mm.find(START_SYNC_MARKER, pos)
+        if pos == -1 or pos + 3 > parser.file_size:
+            break
+        fmt = parser._fmt_cache.get(mm[pos + 2])
+        if fmt is None:
+            pos += 1
+            continue
+        frames.append((pos, fmt))
+        pos += fmt["Length"]
+    return frames
+
+
+def decoder_microbenchmark(path: str | None = None, repeat: int = 3) -> Dict[str, float]:
+    """
+    Messages/sec of the generic decode path (dict(zip) + per-field
+    isinstance/format-char checks) versus the specialized per-type decoders,
+    over the same frames of a synthetic (or given) log.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if path is None:
+            path = write_log(
+                os.path.join(tmp_dir, "bench.bin"),
+                {"IMU": 100_000, "GPS": 20_000, "BAT": 10_000, "MODE": 1_000, "MSG": 1_000, "PARM": 2_000},
+            )
+        parser = ParserSync(path)
+        frames = _frames(parser)
+        mm = parser._mm
+
+        def generic() -> None:
+            for pos, fmt in frames:
+                values = fmt["struct_obj"].unpack_from(mm, pos + 3)
+                msg = _apply_scaling_and_decode(dict(zip(fmt["columns"], values)), fmt)
+                msg["mavpackettype"] = fmt["name"]
+
+        decoders = {id(fmt): compile_decoder(fmt) for _, fmt in frames}
+        compiled_frames = [(pos, decoders[id(fmt)]) for pos, fmt in frames]
+
+        def specialized() -> None:
+            for pos, decode in compiled_frames:
+                decode(mm, pos + 3)
+
+        results = {"messages": float(len(frames))}
+        for name, fn in (("generic", generic), ("specialized", specialized)):
+            best = min(_timed(fn) for _ in range(repeat))
+            results[f"{name}_msgs_per_s"] = len(frames) / best
+        results["speedup"] = results["specialized_msgs_per_s"] / results["generic_msgs_per_s"]
+        del mm, parser
+    return results
+
+
+def _timed(fn: Any) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _pymavlink_messages(path: str, msg_name: Optional[str]) -> Iterator[Any]:
+    conn = mavutil.mavlink_connection(path)
+    while True:
+        msg = conn.recv_match(type=msg_name, blocking=False)
+        if msg is None:
+            return
+        yield msg
+
+
+# backend name → function (path, msg_name) returning a message iterator
+BACKENDS: Dict[str, Callable[[str, Optional[str]], Iterable[Any]]] = {
+    "sync": lambda path, msg_name: ParserSync(path).recv_match(msg_name),
+    "threads": lambda path, msg_name: ParserThreadPool(path).recv_match(msg_name),
+    "processes": lambda path, msg_name: ParserMultiprocessing(path).recv_match(msg_name),
+    "processes_shm": lambda path, msg_name: ParserMultiprocessing(path, transport="shm").recv_match(msg_name),
+}
+if mavutil is not None:
+    BACKENDS["pymavlink"] = _pymavlink_messages
+
+
+def _max_rss_mb(children: bool = False) -> Optional[float]:
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    return resource.getrusage(who).ru_maxrss / 1024  # KiB on Linux
+
+
+def _measure(backend: str, path: str, msg_name: Optional[str], conn: Any) -> None:
+    """Run one backend in this (fresh) process and send back its numbers."""
+    start = time.perf_counter()
+    first = None
+    messages = 0
+    for _ in BACKENDS[backend](path, msg_name):
+        if first is None:
+            first = time.perf_counter() - start
+        messages += 1
+    seconds = time.perf_counter() - start
+    conn.send(
+        {
+            "seconds": seconds,
+            "messages": messages,
+            "ttfm_s": first,
+            "peak_rss_mb": _max_rss_mb(),
+            "children_peak_rss_mb": _max_rss_mb(children=True),
+        }
+    )
+    conn.close()
+
+
+def run_backend(backend: str, path: str, msg_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Time one backend over *path* in a freshly spawned process, so peak RSS
+    is its own and nothing is cached from an earlier run (the page cache
+    aside). Process-pool workers are reported as children_peak_rss_mb.
+    Peak RSS is None where the resource module is missing (Windows).
+    """
+    ctx = multiprocessing.get_context("spawn")
+    recv, send = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_measure, args=(backend, path, msg_name, send))
+    proc.start()
+    send.close()
+    try:
+        result = recv.recv()
+    except EOFError:
+        raise RuntimeError(f"Benchmark of {backend} died (exit code {proc.join() or proc.exitcode})")
+    proc.join()
+
+    size_mb = os.path.getsize(path) / 1e6
+    result.update(
+        backend=backend,
+        filter=msg_name,
+        mb_per_s=size_mb / result["seconds"],
+        msgs_per_s=result["messages"] / result["seconds"],
+    )
+    return result
+
+
+def run_suite(
+    path: Optional[str] = None,
+    size_mb: float = 50,
+    filters: Iterable[Optional[str]] = (None, "GPS"),
+    backends: Optional[Iterable[str]] = None,
+    repeat: int = 1,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    MB/s, msgs/s, time to first message and peak RSS of every backend, with
+    and without each type filter, over *path* or a synthetic log of
+    *size_mb* (generated with *seed*, so runs are comparable). The best of
+    *repeat* runs is kept. Returns a JSON-serializable report.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        synthetic = path is None
+        if path is None:
+            path = os.path.join(tmp_dir, "bench.bin")
+            generate_log(path, int(size_mb * 1e6), seed=seed)
+
+        results = []
+        for backend in backends or BACKENDS:
+            for msg_name in filters:
+                runs = [run_backend(backend, path, msg_name) for _ in range(repeat)]
+                results.append(min(runs, key=lambda r: r["seconds"]))
+
+        return {
+            "machine": {
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "cpu_count": os.cpu_count(),
+            },
+            "log": {
+                "path": None if synthetic else path,
+                "size": os.path.getsize(path),
+                "seed": seed if synthetic else None,
+            },
+            "results": results,
+        }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"{'backend':<15}{'filter':<8}{'MB/s':>9}{'msgs/s':>12}{'TTFM ms':>10}{'RSS MB':>9}{'workers MB':>12}")
+    for r in report["results"]:
+        ttfm = "-" if r["ttfm_s"] is None else f"{r['ttfm_s'] * 1e3:.1f}"
+        rss, workers = ("-" if mb is None else f"{mb:.1f}" for mb in (r["peak_rss_mb"], r["children_peak_rss_mb"]))
+        print(
+            f"{r['backend']:<15}{r['filter'] or '-':<8}{r['mb_per_s']:>9.1f}{r['msgs_per_s']:>12,.0f}"
+            f"{ttfm:>10}{rss:>9}{workers:>12}"
+        )
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Parser benchmark suite")
+    cli.add_argument("--log", help="log to benchmark (default: synthetic)")
+    cli.add_argument("--size-mb", type=float, default=50, help="size of the synthetic log")
+    cli.add_argument("--filter", action="append", help="type filter to run (repeatable; default: none and GPS)")
+    cli.add_argument("--backend", action="append", choices=sorted(BACKENDS), help="backend to run (repeatable)")
+    cli.add_argument("--repeat", type=int, default=1)
+    cli.add_argument("--seed", type=int, default=0)
+    cli.add_argument("--json", help="write the report to this file")
+    cli.add_argument("--decoders", action="store_true", help="run the decoder microbenchmark instead")
+    args = cli.parse_args()
+
+    if args.decoders:
+        for key, value in decoder_microbenchmark(args.log).items():
+            print(f"{key}: {value:,.1f}")
+        sys.exit(0)
+
+    filters = [None if f in ("", "-", "none") else f for f in args.filter] if args.filter else (None, "GPS")
+    report = run_suite(args.log, args.size_mb, filters, args.backend, args.repeat, args.seed)
+    _print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,300 @@
+import argparse
+import glob
+import json
+import math
+import mmap
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import MAX_WORKERS
+from business_logic import multi_processing, thread_parser
+from business_logic.boundaries import align_block, split_range
+from business_logic.columnar import frame_lengths
+from business_logic.multi_processing import ParserMultiprocessing
+from business_logic.parser_sync import ParserSync
+from business_logic.thread_parser import ParserThreadPool
+
+try:
+    from pymavlink import DFReader
+except ImportError:  # optional reference backend
+    DFReader = None
+
+# Differential conformance against pymavlink's DFReader. The log is cut into
+# shards (moved onto confirmed frames, like the blocks of the pools) and
+# every shard is decoded twice in a worker process: by one of our backends
+# and by DFReader started at the shard's first frame. Messages are paired
+# by (type, TimeUS); the divergences of all shards are merged into one
+# report, grouped by type and field:
+#
+#   frames    "missing" (only pymavlink has it) / "extra" (only we have it)
+#   fields    "missing_field" / "extra_field", "nan", "string", "scaling"
+#             (off by a power of ten), "rounding" (equal to 1e-12), "type"
+#             (same value, other container), "value" (anything else)
+
+SHARD_SIZE = 4 * 1024 * 1024
+MAX_EXAMPLES = 5  # kept per type, field and kind
+
+# Per worker process, so each log is opened (and indexed by DFReader) once
+_READERS: Dict[str, Any] = {}  # path → DFReader
+_PARSERS: Dict[Tuple[str, str], Any] = {}  # (backend, path) → parser whose decode path is checked
+BACKENDS = {"processes": ParserMultiprocessing, "threads": ParserThreadPool, "sync": ParserSync}
+
+
+def require_pymavlink() -> None:
+    if DFReader is None:
+        raise ImportError("Conformance checks require pymavlink (pip install pymavlink)")
+
+
+def _is_nan(value: Any) -> bool:
+    return isinstance(value, float) and math.isnan(value)
+
+
+def classify(ours: Any, reference: Any) -> Optional[str]:
+    """Kind of divergence between two values of a field; None if they agree."""
+    if _is_nan(ours) and _is_nan(reference):
+        return None
+    if _is_nan(ours) or _is_nan(reference):
+        return "nan"
+    if type(ours) is type(reference) and ours == reference:
+        return None
+    if isinstance(ours, (str, bytes)) or isinstance(reference, (str, bytes)):
+        return "string"
+    if isinstance(ours, (list, tuple)) and isinstance(reference, (list, tuple)):
+        return "type" if list(ours) == list(reference) else "value"
+    if isinstance(ours, (int, float)) and isinstance(reference, (int, float)):
+        if ours == reference:
+            return None if isinstance(ours, float) == isinstance(reference, float) else "type"
+        if math.isclose(ours, reference, rel_tol=1e-12):
+            return "rounding"
+        if ours and reference and any(math.isclose(ours / reference, 10.0**k, rel_tol=1e-6) for k in range(-9, 10)):
+            return "scaling"
+    return "value"
+
+
+class Divergences:
+    """Divergences found so far: frame and field counts per type, a few examples of each."""
+
+    def __init__(self, max_examples: int = MAX_EXAMPLES) -> None:
+        self.max_examples = max_examples
+        self.messages = {"ours": 0, "reference": 0, "paired": 0}
+        self.frames: Dict[str, Dict[str, int]] = {}  # type → {"missing": n, "extra": n}
+        self.fields: Dict[str, Dict[str, int]] = {}  # "TYPE.field" → {kind: n}
+        self.examples: Dict[str, List[Dict[str, Any]]] = {}  # "TYPE.field kind" → examples
+
+    @property
+    def total(self) -> int:
+        frames = sum(n for kinds in self.frames.values() for n in kinds.values())
+        return frames + sum(n for kinds in self.fields.values() for n in kinds.values())
+
+    def frame(self, msg: Dict[str, Any], kind: str) -> None:
+        name = msg.get("mavpackettype", "?")
+        counts = self.frames.setdefault(name, {})
+        counts[kind] = counts.get(kind, 0) + 1
+        self._example(f"{name} {kind}", {"TimeUS": msg.get("TimeUS")})
+
+    def field(self, name: str, field: str, kind: str, ours: Any, reference: Any, time_us: Any) -> None:
+        counts = self.fields.setdefault(f"{name}.{field}", {})
+        counts[kind] = counts.get(kind, 0) + 1
+        self._example(f"{name}.{field} {kind}", {"TimeUS": time_us, "ours": repr(ours), "reference": repr(reference)})
+
+    def _example(self, key: str, example: Dict[str, Any]) -> None:
+        examples = self.examples.setdefault(key, [])
+        if len(examples) < self.max_examples:
+            examples.append(example)
+
+    def compare(self, ours: Sequence[Dict[str, Any]], reference: Sequence[Dict[str, Any]]) -> None:
+        """Pair two message sequences by (type, TimeUS) and record where they differ."""
+        self.messages["ours"] += len(ours)
+        self.messages["reference"] += len(reference)
+        ours_keys = [(m.get("mavpackettype"), m.get("TimeUS")) for m in ours]
+        ref_keys = [(m.get("mavpackettype"), m.get("TimeUS")) for m in reference]
+        if ours_keys == ref_keys:  # the common case: no frame missing on either side
+            opcodes = [("equal", 0, len(ours), 0, len(reference))]
+        else:
+            opcodes = SequenceMatcher(None, ours_keys, ref_keys, autojunk=False).get_opcodes()
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == "equal":
+                for a, b in zip(ours[i1:i2], reference[j1:j2]):
+                    self._compare_message(a, b)
+                continue
+            for a in ours[i1:i2]:
+                self.frame(a, "extra")
+            for b in reference[j1:j2]:
+                self.frame(b, "missing")
+
+    def _compare_message(self, ours: Dict[str, Any], reference: Dict[str, Any]) -> None:
+        self.messages["paired"] += 1
+        name, time_us = reference.get("mavpackettype", "?"), reference.get("TimeUS")
+        for field, value in reference.items():
+            if field not in ours:
+                self.field(name, field, "missing_field", None, value, time_us)
+                continue
+            kind = classify(ours[field], value)
+            if kind is not None:
+                self.field(name, field, kind, ours[field], value, time_us)
+        for field in ours.keys() - reference.keys():
+            self.field(name, field, "extra_field", ours[field], None, time_us)
+
+    def merge(self, other: "Divergences | Dict[str, Any]") -> None:
+        """Add the divergences of another shard (a Divergences or its to_dict())."""
+        data = other.to_dict() if isinstance(other, Divergences) else other
+        for key, n in data["messages"].items():
+            self.messages[key] += n
+        for target, source in ((self.frames, data["frames"]), (self.fields, data["fields"])):
+            for key, kinds in source.items():
+                counts = target.setdefault(key, {})
+                for kind, n in kinds.items():
+                    counts[kind] = counts.get(kind, 0) + n
+        for key, examples in data["examples"].items():
+            kept = self.examples.setdefault(key, [])
+            kept.extend(examples[: max(self.max_examples - len(kept), 0)])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "divergences": self.total,
+            "messages": dict(self.messages),
+            "frames": {name: dict(kinds) for name, kinds in sorted(self.frames.items())},
+            "fields": {key: dict(kinds) for key, kinds in sorted(self.fields.items())},
+            "examples": {key: list(examples) for key, examples in sorted(self.examples.items())},
+        }
+
+
+def _parser(backend: str, path: str) -> Any:
+    parser = _PARSERS.get((backend, path))
+    if parser is None:
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+        parser = _PARSERS[(backend, path)] = BACKENDS[backend](path)
+        parser._scan_all_fmts()
+    return parser
+
+
+def _reference_messages(path: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """DFReader's messages for the frames starting in [start, end)."""
+    reader = _READERS.get(path)
+    if reader is None:
+        reader = _READERS[path] = DFReader.DFReader_binary(path)
+    reader._rewind()
+    reader.offset = start
+    reader.remaining = reader.data_len - start
+    messages = []
+    while reader.offset < end:
+        msg = reader._parse_next()
+        if msg is None:
+            break
+        messages.append(msg.to_dict())
+    return messages
+
+
+def _our_messages(path: str, start: int, end: int, backend: str) -> List[Dict[str, Any]]:
+    """Our messages for the frames starting in [start, end), decoded by the block code of *backend*."""
+    parser = _parser(backend, path)
+    if backend == "processes":
+        return multi_processing._process_block(path, start, end, parser._fmt_cache_raw(), None)
+    if backend == "threads":
+        return thread_parser._process_block(parser._mm, start, end, parser._fmt_cache_raw(), None)
+    return list(parser._parse_all(None, start, end))
+
+
+def check_shard(path: str, start: int, end: int, backend: str, max_examples: int = MAX_EXAMPLES) -> Dict[str, Any]:
+    """Divergences of one nominal shard (pool task); its ends are moved onto confirmed frames first."""
+    require_pymavlink()
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start, end = align_block(mm, start, end, frame_lengths(_parser(backend, path)._fmt_cache))
+    divergences = Divergences(max_examples)
+    divergences.compare(_our_messages(path, start, end, backend), _reference_messages(path, start, end))
+    return divergences.to_dict()
+
+
+def check_log(
+    path: str,
+    backend: str = "processes",
+    sample: float = 1.0,
+    shard_size: int = SHARD_SIZE,
+    max_workers: int = MAX_WORKERS,
+    seed: int = 0,
+    max_examples: int = MAX_EXAMPLES,
+    executor: Optional[ProcessPoolExecutor] = None,
+) -> Dict[str, Any]:
+    """
+    Compare *backend* with pymavlink over *path*, shard by shard in
+    parallel. With *sample* < 1, only that share of the shards (picked with
+    *seed*, so runs are repeatable) is checked. Returns a JSON-serializable
+    report: every divergence, grouped by type and field.
+    """
+    require_pymavlink()
+    path = os.path.abspath(path)
+    shards = split_range(0, os.path.getsize(path), shard_size)
+    checked = shards
+    if sample < 1.0:
+        count = max(1, round(len(shards) * sample)) if shards else 0
+        checked = sorted(random.Random(seed).sample(shards, count))
+
+    divergences = Divergences(max_examples)
+    pool = executor or ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [pool.submit(check_shard, path, start, end, backend, max_examples) for start, end in checked]
+        for future in futures:
+            divergences.merge(future.result())
+    finally:
+        if executor is None:
+            pool.shutdown(cancel_futures=True)
+
+    report = divergences.to_dict()
+    report.update(path=path, backend=backend, shards=len(shards), shards_checked=len(checked))
+    return report
+
+
+def check_corpus(paths: Iterable[str], **kwargs: Any) -> Dict[str, Dict[str, Any]]:
+    """check_log() for every log (directories: their *.bin files), sharing one process pool."""
+    logs: List[str] = []
+    for path in paths:
+        logs.extend(sorted(glob.glob(os.path.join(path, "*.bin"))) if os.path.isdir(path) else [path])
+    with ProcessPoolExecutor(max_workers=kwargs.pop("max_workers", MAX_WORKERS)) as executor:
+        return {log: check_log(log, executor=executor, **kwargs) for log in logs}
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"{report['path']}: {report['divergences']} divergences, "
+        f"{report['messages']['paired']:,} messages paired, {report['shards_checked']}/{report['shards']} shards"
+    )
+    for name, kinds in report["frames"].items():
+        print(f"  {name:<24}" + ", ".join(f"{kind} {n}" for kind, n in kinds.items()))
+    for key, kinds in report["fields"].items():
+        print(f"  {key:<24}" + ", ".join(f"{kind} {n}" for kind, n in kinds.items()))
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Compare the parser with pymavlink's DFReader")
+    cli.add_argument("logs", nargs="+", help="logs or directories of logs")
+    cli.add_argument("--backend", default="processes", choices=sorted(BACKENDS))
+    cli.add_argument("--sample", type=float, default=1.0, help="share of the shards to check")
+    cli.add_argument("--shard-mb", type=float, default=SHARD_SIZE / 2**20)
+    cli.add_argument("--workers", type=int, default=MAX_WORKERS)
+    cli.add_argument("--seed", type=int, default=0)
+    cli.add_argument("--json", help="write the reports to this file")
+    args = cli.parse_args()
+
+    reports = check_corpus(
+        args.logs,
+        backend=args.backend,
+        sample=args.sample,
+        shard_size=int(args.shard_mb * 2**20),
+        max_workers=args.workers,
+        seed=args.seed,
+    )
+    for report in reports.values():
+        _print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+    # Non-zero exit on any divergence, so a release can be gated on a corpus
+    sys.exit(1 if any(r["divergences"] for r in reports.values()) else 0)
@@ -1,50 +1,73 @@
+import os
+import tempfile
 import time
 
 from typing import Any, Dict, Generator, Optional
 
-from pymavlink import mavutil
+try:
+    from pymavlink import mavutil
+except ImportError:  # optional reference backend
+    mavutil = None
 
 from business_logic.multi_processing import ParserMultiprocessing
 from business_logic.parser_sync import ParserSync
 from business_logic.thread_parser import ParserThreadPool
+from synthetic_log import generate_log
 
 
 class RuntimeTests:
+    """Quick wall-clock comparison; see test/benchmark.py for the full, machine-readable suite."""
 
-    def __init__(self, path : str =r"C:\Users\yos77\Documents\ness\overlap\log_file_test_01.bin") -> None:
+    def __init__(self, path : Optional[str] = None, size_mb : float = 20) -> None:
+        if path is None:
+            # Reproducible synthetic log instead of a machine-specific path
+            self._tmp_dir = tempfile.TemporaryDirectory()
+            path = os.path.join(self._tmp_dir.name, "runtime.bin")
+            generate_log(path, int(size_mb * 1e6))
         self.path = path
 
     def mavlink_runtime(self, msg_name : Optional[str] = None) -> None:
-        start_time = time.time()
+        if mavutil is None:
+            print("Mavlink runtime: skipped (pymavlink not installed)")
+            return
+        start_time = time.perf_counter()
         mavlink_conn = mavutil.mavlink_connection(self.path)
         while True:
             mav_msg = mavlink_conn.recv_match(type=msg_name, blocking=False)
             if not mav_msg:
                 break
-        end_time = time.time()
+        end_time = time.perf_counter()
         print(f"Mavlink runtime:{end_time - start_time:.3f}")
 
     def parsor_runtime(self, msg_name : Optional[str] = None) -> None:
-        start_time = time.time()
+        start_time = time.perf_counter()
         parsor = ParserSync(self.path)
         parsor_gen = parsor.recv_match(msg_name)
         for msg in parsor_gen:
             pass
-        end_time = time.time()
+        end_time = time.perf_counter()
         print(f"Parsor runtime:{end_time - start_time:.3f}")
 
     def threads_runtime(self, msg_name : Optional[str] = None) -> None:
-        start_time = time.time()
+        start_time = time.perf_counter()
         parsor = ParserThreadPool(self.path)
         for msg in parsor.recv_match(msg_name):
             pass
-        end_time = time.time()
+        end_time = time.perf_counter()
         print(f"Threading runtime:{end_time - start_time:.3f}")
 
     def multiprocessing_runtime(self, msg_name : Optional[str] = None) -> None:
-        start_time = time.time()
+        start_time = time.perf_counter()
         parsor = ParserMultiprocessing(self.path)
         for msg in parsor.recv_match(msg_name):
             pass
-        end_time = time.time()
+        end_time = time.perf_counter()
         print(f"Multiprocessing runtime:{end_time - start_time:.3f}")
+
+    def multiprocessing_shm_runtime(self, msg_name : Optional[str] = None) -> None:
+        start_time = time.perf_counter()
+        parsor = ParserMultiprocessing(self.path, transport="shm")
+        for msg in parsor.recv_match(msg_name):
+            pass
+        end_time = time.perf_counter()
+        print(f"Multiprocessing (shared memory) runtime:{end_time - start_time:.3f}")
@@ -0,0 +1,161 @@
+import random
+import struct
+from typing import Any, BinaryIO, Dict, Iterable, List, Sequence, Tuple
+
+from config import AP_TO_STRUCT, FMT_MSG_TYPE, START_SYNC_MARKER
+
+FMT_STRUCT = struct.Struct("<BB4s16s64s")
+
+# name → (type id, format chars, columns)
+MESSAGE_DEFS: Dict[str, Tuple[int, str, str]] = {
+    "IMU": (10, "QBffffff", "TimeUS,I,GyrX,GyrY,GyrZ,AccX,AccY,AccZ"),
+    "GPS": (11, "QBBLLeE", "TimeUS,Status,NSats,Lat,Lng,Alt,Spd"),
+    "BAT": (12, "QBfcC", "TimeUS,Inst,Volt,Curr,Temp"),
+    "MODE": (13, "QMBB", "TimeUS,Mode,ModeNum,Rsn"),
+    "MSG": (14, "QZ", "TimeUS,Message"),
+    "PARM": (15, "QNf", "TimeUS,Name,Value"),
+    "ISBD": (16, "QHHaaa", "TimeUS,N,seqno,x,y,z"),
+    "RAWD": (17, "QBZ", "TimeUS,Len,Data"),
+}
+
+
+def struct_for(fmt_chars: str) -> struct.Struct:
+    """struct.Struct used to pack a message payload of the given format."""
+    return struct.Struct("<" + "".join(AP_TO_STRUCT[c] for c in fmt_chars))
+
+
+def fmt_frame(typ: int, name: str, fmt_chars: str, columns: str) -> bytes:
+    """Build one complete FMT record (header included)."""
+    length = 3 + struct_for(fmt_chars).size
+    payload = FMT_STRUCT.pack(
+        typ, length, name.encode("ascii"), fmt_chars.encode("ascii"), columns.encode("ascii")
+    )
+    return START_SYNC_MARKER + bytes([FMT_MSG_TYPE]) + payload
+
+
+def msg_frame(typ: int, fmt_chars: str, values: Sequence[Any]) -> bytes:
+    """Build one complete data record (header included)."""
+    return START_SYNC_MARKER + bytes([typ]) + struct_for(fmt_chars).pack(*values)
+
+
+def header(names: Iterable[str]) -> bytes:
+    """FMT records for FMT itself plus every requested message type."""
+    out = [fmt_frame(FMT_MSG_TYPE, "FMT", "BBnNZ", "Type,Length,Name,Format,Columns")]
+    for name in names:
+        typ, fmt_chars, columns = MESSAGE_DEFS[name]
+        out.append(fmt_frame(typ, name, fmt_chars, columns))
+    return b"".join(out)
+
+
+def sample_values(name: str, i: int, time_us: int) -> Tuple[Any, ...]:
+    """Deterministic payload values for message *i* of type *name*."""
+    if name == "IMU":
+        return (time_us, i % 3, 0.25, -0.5, 1.0, 0.0, 0.5, -9.75)
+    if name == "GPS":
+        return (time_us, 3, 12, 321234567 + i, 348765432 - i, 12345 + i, 250)
+    if name == "BAT":
+        return (time_us, 0, 15.5 - i * 0.001, 1250, 3100)
+    if name == "MODE":
+        return (time_us, i % 5, i % 5, 1)
+    if name == "MSG":
+        return (time_us, f"message {i}".encode("ascii"))
+    if name == "PARM":
+        return (time_us, f"PARAM_{i % 10}".encode("ascii"), i * 0.5)
+    if name == "ISBD":
+        x = [(i + k) % 200 - 100 for k in range(32)]
+        return (time_us, 32, i, *x, *(-v for v in x), *(2 * v for v in x))
+    if name == "RAWD":
+        return (time_us, 4, bytes([i % 256, 0, 0, 1]) + bytes(60))
+    raise KeyError(name)
+
+
+def build_log(counts: Dict[str, int], pattern: List[str] | None = None) -> bytes:
+    """
+    Build a complete log: FMT header followed by data messages.
+    Messages are interleaved round-robin (or following *pattern*) until
+    every type has reached its count.
+    """
+    names = list(counts)
+    body: List[bytes] = []
+    emitted = {name: 0 for name in names}
+    time_us = 1_000_000
+    order = pattern or names
+    while any(emitted[n] < counts[n] for n in names):
+        for name in order:
+            if emitted[name] >= counts[name]:
+                continue
+            typ, fmt_chars, _ = MESSAGE_DEFS[name]
+            body.append(msg_frame(typ, fmt_chars, sample_values(name, emitted[name], time_us)))
+            emitted[name] += 1
+            time_us += 2_500
+    return header(names) + b"".join(body)
+
+
+def write_log(path: str, counts: Dict[str, int], pattern: List[str] | None = None) -> str:
+    with open(path, "wb") as f:
+        f.write(build_log(counts, pattern))
+    return path
+
+
+# Message mix of a typical copter log (relative weights)
+DEFAULT_MIX: Dict[str, float] = {"IMU": 50, "GPS": 5, "BAT": 5, "MODE": 0.1, "MSG": 0.5, "PARM": 1, "ISBD": 2}
+
+
+def _garbage(rng: random.Random, size: int) -> bytes:
+    """Random bytes that cannot contain a sync marker."""
+    return bytes(rng.randrange(256) for _ in range(size)).replace(START_SYNC_MARKER[:1], b"\x00")
+
+
+def generate_log(
+    path: str,
+    size_bytes: int = 10 * 1024 * 1024,
+    mix: Dict[str, float] | None = None,
+    corruption: float = 0.0,
+    seed: int = 0,
+) -> Dict[str, int]:
+    """
+    Write a valid log of about *size_bytes* whose messages are drawn at
+    random (deterministic per *seed*) with the relative weights of *mix*.
+    With *corruption* > 0, that fraction of the data frames is damaged:
+    half get their marker destroyed (the frame is lost), half are preceded
+    by random garbage (the frame survives once the parser resyncs).
+    Returns the count per type of the messages a parser must recover.
+    """
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    frames = {name: struct_for(MESSAGE_DEFS[name][1]) for name in names}
+
+    recovered = {name: 0 for name in names}
+    emitted = {name: 0 for name in names}
+    time_us = 1_000_000
+    written = 0
+    chunk: List[bytes] = []
+    with open(path, "wb") as f:
+        head = header(names)
+        f.write(head)
+        written += len(head)
+        while written < size_bytes:
+            for name in rng.choices(names, weights, k=1024):
+                typ = MESSAGE_DEFS[name][0]
+                payload = frames[name].pack(*sample_values(name, emitted[name], time_us))
+                frame = START_SYNC_MARKER + bytes([typ]) + payload
+                emitted[name] += 1
+                time_us += 2_500
+                damage = corruption and rng.random() < corruption
+                if damage and rng.random() < 0.5:
+                    frame = b"\x00\x00" + frame[2:]  # marker gone: frame lost
+                else:
+                    if damage:
+                        chunk.append(_garbage(rng, rng.randrange(1, 64)))
+                    recovered[name] += 1
+                chunk.append(frame)
+                written += len(frame)
+            _flush(f, chunk)
+    return {name: n for name, n in recovered.items() if n}
+
+
+def _flush(f: BinaryIO, chunk: List[bytes]) -> None:
+    f.write(b"".join(chunk))
+    chunk.clear()
@@ -0,0 +1,180 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from typing import Any, Dict, List
+
+import pytest
+
+from business_logic import thread_parser
+from business_logic.multi_processing import ParserMultiprocessing
+from business_logic.parser_sync import ParserSync
+from business_logic.scheduling import aiter_batches, aiter_ordered
+from business_logic.session import ParserSession
+from business_logic.stream_parser import ParserStream
+from business_logic.thread_parser import ParserThreadPool
+from synthetic_log import write_log
+
+COUNTS = {"IMU": 3000, "GPS": 300, "MODE": 10, "MSG": 20}
+
+
+async def _drain(messages: Any) -> List[Any]:
+    return [msg async for msg in messages]
+
+
+@pytest.fixture(scope="module")
+def log_path(tmp_path_factory: Any) -> str:
+    return write_log(str(tmp_path_factory.mktemp("async") / "async.bin"), COUNTS)
+
+
+def test_async_matches_blocking(log_path: str, subtests: Any) -> None:
+    parsers: Dict[str, Any] = {
+        "sync": lambda **kw: ParserSync(log_path, **kw),
+        "threads": lambda **kw: ParserThreadPool(log_path, block_size=16 * 1024, max_workers=2, **kw),
+        "processes": lambda **kw: ParserMultiprocessing(log_path, block_size=16 * 1024, max_workers=2, **kw),
+        "shm": lambda **kw: ParserMultiprocessing(
+            log_path, transport="shm", block_size=16 * 1024, max_workers=2, **kw
+        ),
+    }
+    queries = [(None, None, None), ("GPS", None, None), (["MODE", "MSG"], None, None), ("IMU", 1_200_000, 1_500_000)]
+    for name, make in parsers.items():
+        for use_index in (False, True):
+            for query in queries:
+                with subtests.test(f"{name} index={use_index} {query}"):
+                    expected = list(make(use_index=use_index).recv_match(*query))
+                    assert asyncio.run(_drain(make(use_index=use_index).arecv_match(*query))) == expected
+
+    with subtests.test("Records"):
+        expected = [r.to_dict() for r in ParserThreadPool(log_path, records=True).recv_match("GPS")]
+        got = asyncio.run(_drain(ParserThreadPool(log_path, records=True).arecv_match("GPS")))
+        assert [r.to_dict() for r in got] == expected
+
+    with subtests.test("Stream"):
+        expected = list(ParserSync(log_path).recv_match("GPS"))
+        assert asyncio.run(_drain(ParserStream(log_path, chunk_size=999).arecv_match("GPS"))) == expected
+
+    with subtests.test("Batches"):
+        parser = ParserThreadPool(log_path, block_size=16 * 1024, max_workers=2)
+        batches = asyncio.run(_drain(parser.arecv_match("IMU", batches=True)))
+        assert len(batches) > 1 and all(isinstance(b, list) and b for b in batches)
+        assert [m for b in batches for m in b] == list(parser.recv_match("IMU"))
+
+    with subtests.test("Stats"):
+        parser = ParserMultiprocessing(log_path, block_size=16 * 1024, max_workers=2, stats=True)
+        asyncio.run(_drain(parser.arecv_match("GPS")))
+        assert parser.stats is not None and parser.stats.counts["GPS"] == COUNTS["GPS"]
+
+
+def test_loop_keeps_running(subtests: Any) -> None:
+    async def main() -> List[int]:
+        # Each block waits until the loop itself has run: a blocked loop would deadlock (timeout)
+        started = threading.Event()
+        loop_ran = threading.Event()
+
+        def block(i: int) -> int:
+            started.set()
+            assert loop_ran.wait(5)
+            return i
+
+        async def ticker() -> None:
+            await asyncio.to_thread(started.wait, 5)
+            loop_ran.set()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            tick = asyncio.create_task(ticker())
+            results = [r async for r in aiter_ordered(executor, block, ((i,) for i in range(5)), 2)]
+            await tick
+        return results
+
+    with subtests.test("Results in order, loop never blocked"):
+        assert asyncio.run(main()) == list(range(5))
+
+
+def test_cancellation_stops_pending_blocks(log_path: str, monkeypatch: Any, subtests: Any) -> None:
+    with subtests.test("Blocks not started are cancelled"):
+        started: List[int] = []
+        release = threading.Event()
+
+        def block(i: int) -> int:
+            started.append(i)
+            release.wait(5)
+            return i
+
+        async def main() -> None:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                task = asyncio.create_task(_drain(aiter_ordered(executor, block, ((i,) for i in range(20)), 8)))
+                await asyncio.sleep(0.05)
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+                release.set()
+            assert started == [0]  # the running block finished, the 7 queued ones never ran
+
+        asyncio.run(main())
+
+    with subtests.test("Closing a parser query drops its queued blocks"):
+        calls: List[int] = []
+        process_block = thread_parser._process_block
+
+        def counted(*args: Any) -> Any:
+            calls.append(args[1])
+            time.sleep(0.01)
+            return process_block(*args)
+
+        monkeypatch.setattr(thread_parser, "_process_block", counted)
+
+        async def main() -> None:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                parser = ParserThreadPool(log_path, block_size=4096, max_in_flight=16, executor=executor)
+                async with aclosing(parser.arecv_match()) as messages:
+                    async for _ in messages:
+                        break
+                # Once the executor is idle again, nothing else of the query ran
+                await asyncio.wrap_future(executor.submit(int))
+
+        asyncio.run(main())
+        assert 1 <= len(calls) <= 2
+
+    with subtests.test("Blocking parsers are closed on cancel"):
+        closed = threading.Event()
+
+        def messages() -> Any:
+            try:
+                for i in range(10**9):
+                    yield i
+            finally:
+                closed.set()
+
+        async def main() -> None:
+            async with aclosing(aiter_batches(messages(), batch_size=10)) as batches:
+                async for batch in batches:
+                    assert batch == list(range(10))
+                    break
+            await asyncio.to_thread(closed.wait, 5)
+
+        asyncio.run(main())
+        assert closed.is_set()
+
+
+def test_concurrent_queries_share_executor(log_path: str, subtests: Any) -> None:
+    names = ["GPS", "MODE", "MSG", "IMU"]
+    expected = {name: list(ParserSync(log_path).recv_match(name)) for name in names}
+
+    with subtests.test("Thread pool"):
+
+        async def main() -> List[Any]:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                parser = ParserThreadPool(log_path, block_size=16 * 1024, executor=executor)
+                return await asyncio.gather(*(_drain(parser.arecv_match(name)) for name in names))
+
+        assert dict(zip(names, asyncio.run(main()))) == expected
+
+    with subtests.test("Process session"):
+
+        async def main() -> List[Any]:
+            with ParserSession([log_path], max_workers=2) as session:
+                parsers = [session.open(log_path, block_size=16 * 1024) for _ in names]
+                return await asyncio.gather(*(_drain(p.arecv_match(n)) for p, n in zip(parsers, names)))
+
+        assert dict(zip(names, asyncio.run(main()))) == expected
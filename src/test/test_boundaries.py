@@ -0,0 +1,77 @@
+from collections import Counter
+from typing import Any, Dict
+
+import pytest
+
+from business_logic.boundaries import aligned_cut, frame_chain, split_range
+from business_logic.fleet import iter_fleet
+from business_logic.multi_processing import ParserMultiprocessing
+from business_logic.parser_sync import ParserSync
+from business_logic.thread_parser import ParserThreadPool
+from config import START_SYNC_MARKER
+from synthetic_log import MESSAGE_DEFS, header, msg_frame, sample_values, struct_for
+
+RAWD_TYPE, RAWD_FMT, _ = MESSAGE_DEFS["RAWD"]
+IMU_TYPE, IMU_FMT, _ = MESSAGE_DEFS["IMU"]
+# A binary payload full of marker + valid type bytes: a phantom IMU frame every 3 bytes
+PHANTOM = (START_SYNC_MARKER + bytes([IMU_TYPE])) * 21 + b"\x00"
+LENGTHS = {RAWD_TYPE: 3 + struct_for(RAWD_FMT).size, IMU_TYPE: 3 + struct_for(IMU_FMT).size}
+
+
+def _phantom_log(n: int = 400) -> bytes:
+    body = []
+    for i in range(n):
+        body.append(msg_frame(RAWD_TYPE, RAWD_FMT, (1000 + i, 64, PHANTOM)))
+        body.append(msg_frame(IMU_TYPE, IMU_FMT, sample_values("IMU", i, 1000 + i)))
+    return header(["RAWD", "IMU"]) + b"".join(body)
+
+
+@pytest.fixture
+def phantom_path(tmp_path: Any) -> str:
+    path = tmp_path / "phantom.bin"
+    path.write_bytes(_phantom_log())
+    return str(path)
+
+
+def test_aligned_cut(subtests: Any) -> None:
+    body = _phantom_log(20)[len(header(["RAWD", "IMU"])) :]
+    pair = LENGTHS[RAWD_TYPE] + LENGTHS[IMU_TYPE]
+
+    with subtests.test("Markers inside a payload are not frames"):
+        assert not frame_chain(body, 3 + 8 + 1, LENGTHS)  # first phantom inside the RAWD payload
+        assert frame_chain(body, 0, LENGTHS)
+        assert aligned_cut(body, 1, LENGTHS) == LENGTHS[RAWD_TYPE]
+
+    with subtests.test("Every cut lands on a real frame"):
+        starts = {k * pair for k in range(20)} | {k * pair + LENGTHS[RAWD_TYPE] for k in range(20)}
+        assert all(aligned_cut(body, cut, LENGTHS) in starts | {len(body)} for cut in range(len(body)))
+
+    with subtests.test("Ends and unconfirmed regions"):
+        assert aligned_cut(body, 0, LENGTHS) == 0
+        assert aligned_cut(body, len(body) + 5, LENGTHS) == len(body)
+        junk = b"\x00" * 1000 + body
+        assert aligned_cut(junk, 10, LENGTHS, limit=100) == 110
+
+    with subtests.test("Nominal split"):
+        assert split_range(0, 10, 4) == [(0, 4), (4, 8), (8, 10)]
+        assert split_range(0, 0, 4) == []
+
+
+def test_blocks_match_sync_parser(phantom_path: str, subtests: Any) -> None:
+    expected = list(ParserSync(phantom_path).recv_match())
+    for block_size in (1000, 1017, 4096):
+        with subtests.test(f"threads block_size={block_size}"):
+            assert list(ParserThreadPool(phantom_path, block_size=block_size).recv_match()) == expected
+
+        with subtests.test(f"processes block_size={block_size}"):
+            got = list(ParserMultiprocessing(phantom_path, block_size=block_size, max_workers=2).recv_match())
+            assert got == expected
+
+        with subtests.test(f"processes shm block_size={block_size}"):
+            parser = ParserMultiprocessing(phantom_path, transport="shm", block_size=block_size, max_workers=2)
+            assert list(parser.recv_match("IMU")) == [m for m in expected if m["mavpackettype"] == "IMU"]
+
+    with subtests.test("Fleet summary"):
+        (summary,) = iter_fleet(phantom_path, max_workers=2, block_size=1017)
+        counts: Dict[str, int] = Counter(m["mavpackettype"] for m in expected)
+        assert summary["counts"] == counts
@@ -0,0 +1,66 @@
+import os
+from typing import Any
+
+import pytest
+
+from business_logic.column_cache import ColumnCache
+from business_logic.parser_sync import ParserSync
+from synthetic_log import write_log
+
+np = pytest.importorskip("numpy")
+
+COUNTS = {"IMU": 300, "GPS": 40, "MSG": 5, "ISBD": 4, "RAWD": 4}
+
+
+@pytest.fixture
+def log_path(tmp_path: Any) -> str:
+    return write_log(str(tmp_path / "flight.bin"), COUNTS)
+
+
+def _check_matches_parser(cache: ColumnCache, log_path: str, subtests: Any) -> None:
+    parser = ParserSync(log_path)
+    assert cache.types == sorted([*COUNTS, "FMT"])  # the FMT records are exported too
+    for msg_name in COUNTS:
+        with subtests.test(msg_name):
+            expected = parser.recv_columns(msg_name)
+            columns = cache.columns(msg_name)
+            assert cache.rows(msg_name) == COUNTS[msg_name]
+            assert list(columns) == list(expected)
+            for col, values in expected.items():
+                assert columns[col].dtype == values.dtype
+                assert np.array_equal(columns[col], values)
+
+
+def test_npy_cache(log_path: str, subtests: Any) -> None:
+    cache = ColumnCache.build(log_path, fmt="npy", max_workers=2)
+    _check_matches_parser(cache, log_path, subtests)
+
+    with subtests.test("Columns are memory-mapped"):
+        assert isinstance(ColumnCache.load(log_path).columns("IMU")["AccX"], np.memmap)
+
+
+def test_arrow_cache(log_path: str, subtests: Any) -> None:
+    pytest.importorskip("pyarrow")
+    cache = ColumnCache.build(log_path, fmt="arrow", max_workers=2)
+    assert os.path.exists(os.path.join(cache.cache_dir, "IMU.arrow"))
+    _check_matches_parser(cache, log_path, subtests)
+
+
+def test_cache_lifecycle(log_path: str, subtests: Any) -> None:
+    with subtests.test("Missing cache"):
+        assert ColumnCache.load(log_path) is None
+
+    cache = ColumnCache.load_or_build(log_path, fmt="npy", msg_names=["GPS"])
+
+    with subtests.test("Only the requested types"):
+        assert cache.types == ["GPS"]
+        with pytest.raises(ValueError):
+            cache.columns("IMU")
+
+    with subtests.test("Reused while the log is unchanged"):
+        assert ColumnCache.load(log_path) is not None
+
+    with subtests.test("Stale once the log changes"):
+        write_log(log_path, {"GPS": 41})
+        assert ColumnCache.load(log_path) is None
+        assert ColumnCache.load_or_build(log_path, fmt="npy").rows("GPS") == 41
@@ -0,0 +1,57 @@
+from typing import Any
+
+import pytest
+
+from business_logic.columnar import fmt_dtype, gather_columns
+from business_logic.multi_processing import ParserMultiprocessing
+from business_logic.parser_sync import ParserSync
+from business_logic.thread_parser import ParserThreadPool
+from synthetic_log import msg_frame, write_log
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def log_path(tmp_path: Any) -> str:
+    return write_log(str(tmp_path / "flight.bin"), {"IMU": 300, "GPS": 40, "BAT": 10, "MSG": 5})
+
+
+@pytest.mark.parametrize("parser_cls", [ParserSync, ParserThreadPool, ParserMultiprocessing])
+def test_columns_match_dicts(log_path: str, parser_cls: Any, subtests: Any) -> None:
+    parser = parser_cls(log_path)
+    for msg_name in ("IMU", "GPS", "BAT", "MSG"):
+        with subtests.test(msg_name):
+            expected = list(ParserSync(log_path).recv_match(msg_name))
+            columns = parser.recv_columns(msg_name)
+            assert set(columns) == set(expected[0]) - {"mavpackettype"}
+            for col, values in columns.items():
+                assert len(values) == len(expected)
+                assert values.tolist() == [m[col] for m in expected]
+
+
+def test_columns_dtypes(log_path: str, subtests: Any) -> None:
+    columns = ParserSync(log_path).recv_columns("GPS")
+
+    with subtests.test("TimeUS stays uint64"):
+        assert columns["TimeUS"].dtype == np.uint64
+
+    with subtests.test("'L' scaled to degrees"):
+        assert columns["Lat"].dtype == np.float64
+        assert columns["Lat"][0] == pytest.approx(32.1234567)
+
+    with subtests.test("'e' divided by 100"):
+        assert columns["Alt"][0] == pytest.approx(123.45)
+
+
+def test_unknown_type(log_path: str) -> None:
+    with pytest.raises(ValueError):
+        ParserSync(log_path).recv_columns("NOPE")
+
+
+def test_unknown_format_char() -> None:
+    # Like decoders.field_actions: the column takes no space and is left out
+    info = {"columns": ["TimeUS", "X", "Volt"], "format_chars": ["Q", "?", "f"]}
+    frame = msg_frame(12, "Qf", (7, 1.5))
+    assert fmt_dtype(info).names == ("TimeUS", "Volt")
+    columns = gather_columns(frame, [0], info)
+    assert columns["TimeUS"].tolist() == [7] and columns["Volt"].tolist() == [1.5]
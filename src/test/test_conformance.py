@@ -0,0 +1,87 @@
+from typing import Any
+
+import pytest
+
+from business_logic.parser_sync import ParserSync
+from conformance import Divergences, check_log, classify
+from synthetic_log import generate_log, write_log
+
+COUNTS = {"IMU": 300, "GPS": 40, "MSG": 10, "PARM": 10}
+
+
+@pytest.fixture
+def log_path(tmp_path: Any) -> str:
+    return write_log(str(tmp_path / "flight.bin"), COUNTS)
+
+
+def test_classify(subtests: Any) -> None:
+    cases = [
+        (1.5, 1.5, None),
+        (float("nan"), float("nan"), None),
+        (1.5, float("nan"), "nan"),
+        ("abc", b"abc", "string"),
+        ("abc", "abd", "string"),
+        (12.5, 1250, "scaling"),
+        (32.1234567, 321234567, "scaling"),
+        (0.1 + 0.2, 0.3, "rounding"),
+        (3, 3.0, "type"),
+        ([1, 2], (1, 2), "type"),
+        (1.5, 2.5, "value"),
+    ]
+    for ours, reference, kind in cases:
+        with subtests.test(f"{ours!r} vs {reference!r}"):
+            assert classify(ours, reference) == kind
+
+
+def test_divergences(log_path: str, subtests: Any) -> None:
+    ours = list(ParserSync(log_path).recv_match())
+
+    with subtests.test("Identical streams"):
+        divergences = Divergences()
+        divergences.compare(ours, [dict(m) for m in ours])
+        assert divergences.total == 0 and divergences.messages["paired"] == len(ours)
+
+    reference = [dict(m) for m in ours]
+    gps = [m for m in reference if m["mavpackettype"] == "GPS"]
+    for msg in gps[:3]:
+        msg["Alt"] *= 100  # unscaled
+    gps[3]["Lat"] = float("nan")
+    reference.remove(gps[4])  # a frame only we decoded
+    msg_msgs = [m for m in reference if m["mavpackettype"] == "MSG"]
+    msg_msgs[0]["Message"] = msg_msgs[0]["Message"].encode()
+    reference.insert(10, {"mavpackettype": "XKF1", "TimeUS": 1})  # a frame we missed
+
+    divergences = Divergences(max_examples=2)
+    divergences.compare(ours, reference)
+    report = divergences.to_dict()
+
+    with subtests.test("Grouped by type, field and kind"):
+        assert report["fields"] == {"GPS.Alt": {"scaling": 3}, "GPS.Lat": {"nan": 1}, "MSG.Message": {"string": 1}}
+        assert report["frames"] == {"GPS": {"extra": 1}, "XKF1": {"missing": 1}}
+        assert report["divergences"] == 7
+        assert len(report["examples"]["GPS.Alt scaling"]) == 2
+
+    with subtests.test("Shard reports merge"):
+        merged = Divergences(max_examples=2)
+        merged.merge(report)
+        merged.merge(divergences)
+        assert merged.to_dict()["fields"]["GPS.Alt"] == {"scaling": 6}
+        assert merged.messages["paired"] == 2 * report["messages"]["paired"]
+        assert len(merged.examples["GPS.Alt scaling"]) == 2
+
+
+def test_against_pymavlink(tmp_path: Any, subtests: Any) -> None:
+    pytest.importorskip("pymavlink")
+    path = str(tmp_path / "corpus.bin")
+    generate_log(path, 600_000, seed=3)
+
+    for backend in ("processes", "threads", "sync"):
+        with subtests.test(backend):
+            report = check_log(path, backend=backend, shard_size=64 * 1024, max_workers=2)
+            assert report["shards_checked"] == report["shards"] > 1
+            assert report["messages"]["paired"] > 0
+
+    with subtests.test("Sampling"):
+        report = check_log(path, sample=0.25, shard_size=64 * 1024, max_workers=2, seed=1)
+        assert report["shards_checked"] == round(report["shards"] * 0.25)
+        assert report == check_log(path, sample=0.25, shard_size=64 * 1024, max_workers=2, seed=1)
@@ -0,0 +1,148 @@
+import pickle
+import struct
+import tracemalloc
+from array import array
+from typing import Any, Dict
+
+import pytest
+
+from business_logic.decoders import compile_decoder, field_actions
+from business_logic.multi_processing import _apply_scaling_and_decode
+
+
+def _generic(info: Dict[str, Any], payload: bytes) -> Dict[str, Any]:
+    values = info["struct_obj"].unpack_from(payload, 0)
+    msg = _apply_scaling_and_decode(dict(zip(info["columns"], values)), info)
+    msg["mavpackettype"] = info["name"]
+    return msg
+
+
+def _info(name: str, fmt: str, columns: str) -> Dict[str, Any]:
+    from business_logic.multi_processing import _ap_fmt_to_struct
+
+    return {
+        "name": name,
+        "columns": columns.split(","),
+        "format_chars": list(fmt),
+        "struct_obj": struct.Struct(_ap_fmt_to_struct(list(fmt))),
+    }
+
+
+def test_decoder_matches_generic_path(subtests: Any) -> None:
+    cases = [
+        ("GPS", "QBBLLeE", "TimeUS,Status,NSats,Lat,Lng,Alt,Spd", (1, 3, 12, 321234567, -348765432, 12345, 250)),
+        ("BAT", "QBfcC", "TimeUS,Inst,Volt,Curr,Temp", (5, 0, 15.5, -1250, 3100)),
+        ("MSG", "QZ", "TimeUS,Message", (7, b"hello\x00\x00")),
+        ("PARM", "QNf", "TimeUS,Name,Value", (9, b"PARAM_1", 0.5)),
+        ("FMT", "BBnNZ", "Type,Length,Name,Format,Columns", (10, 20, b"GPS", b"QB", b"TimeUS,I")),
+        ("DATA", "QBZ", "TimeUS,Len,Data", (11, 4, b"\x01\x02\x00")),
+    ]
+    for name, fmt, columns, values in cases:
+        with subtests.test(name):
+            info = _info(name, fmt, columns)
+            payload = info["struct_obj"].pack(*values)
+            assert compile_decoder(info)(payload, 0) == _generic(info, payload)
+
+
+def test_decoder_offset_and_cache(subtests: Any) -> None:
+    info = _info("BAT", "QBfcC", "TimeUS,Inst,Volt,Curr,Temp")
+    payload = b"\xa3\x95\x0c" + info["struct_obj"].pack(5, 0, 15.5, 1250, 3100)
+
+    with subtests.test("Decodes at an offset"):
+        assert compile_decoder(info)(payload, 3)["Curr"] == 12.5
+
+    with subtests.test("Identical FMT definitions share one decoder"):
+        assert compile_decoder(dict(info)) is compile_decoder(info)
+
+
+def test_array_field_keeps_later_columns_aligned() -> None:
+    info = _info("ISBD", "QaB", "TimeUS,Vals,Flag")
+    values = (42, *range(32), 7)
+    msg = compile_decoder(info)(info["struct_obj"].pack(*values), 0)
+
+    assert msg["TimeUS"] == 42
+    assert list(msg["Vals"]) == list(range(32))
+    assert msg["Flag"] == 7
+
+
+def test_field_actions() -> None:
+    actions = field_actions(["A", "B", "C", "Data", "E", "F"], ["L", "c", "Z", "Z", "a", "f"])
+    assert [(col, action, idx) for col, action, idx, _, _ in actions] == [
+        ("A", "div1e7", 0),
+        ("B", "div100", 1),
+        ("C", "str", 2),
+        ("Data", "binary", -1),
+        ("E", "array", -1),
+        ("F", "raw", 3),
+    ]
+    layout = [(4 + 2 + 64, 64), (4 + 2 + 128, 64), (4 + 2 + 192, 4)]
+    assert [(offset, size) for _, _, _, offset, size in actions[3:]] == layout
+
+
+def test_array_and_binary_fields_are_views(subtests: Any) -> None:
+    isbd = _info("ISBD", "QHHaaa", "TimeUS,N,seqno,x,y,z")
+    x = list(range(-16, 16))
+    buf = bytearray(isbd["struct_obj"].pack(1, 32, 5, *x, *x[::-1], *(2 * v for v in x)))
+    msg = compile_decoder(isbd)(buf, 0)
+
+    with subtests.test("Array fields are int16 views over the buffer"):
+        assert isinstance(msg["x"], memoryview) and msg["x"].format == "h"
+        assert list(msg["x"]) == x and list(msg["y"]) == x[::-1] and list(msg["z"]) == [2 * v for v in x]
+        assert msg["seqno"] == 5
+
+    with subtests.test("Views follow the buffer instead of copying it"):
+        buf[12:14] = (1234).to_bytes(2, "little", signed=True)
+        assert msg["x"][0] == 1234
+
+    rawd = _info("RAWD", "QBZ", "TimeUS,Len,Data")
+    data = b"\x00\x01\x00" + bytes(61)
+    msg = compile_decoder(rawd)(rawd["struct_obj"].pack(2, 3, data), 0)
+
+    with subtests.test("Binary fields keep NUL bytes"):
+        assert isinstance(msg["Data"], memoryview) and msg["Data"].tobytes() == data
+
+
+def test_detached_decoder_is_picklable() -> None:
+    info = _info("ISBD", "QHHaaa", "TimeUS,N,seqno,x,y,z")
+    values = (1, 32, 5, *range(32), *range(32), *range(32))
+    msg = compile_decoder(info, detach=True)(info["struct_obj"].pack(*values), 0)
+
+    restored = pickle.loads(pickle.dumps(msg))
+    assert isinstance(restored["x"], array) and list(restored["z"]) == list(range(32))
+
+
+def test_array_fields_allocate_no_per_element_objects() -> None:
+    info = _info("ISBD", "QHHaaa", "TimeUS,N,seqno,x,y,z")
+    buf = info["struct_obj"].pack(1, 32, 5, *range(1000, 1096))
+    decode = compile_decoder(info)
+    decode(buf, 0)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    messages = [decode(buf, 0) for _ in range(100)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    # dict + a few scalars + 3 views per message, not 96 ints
+    assert len(messages) == 100 and blocks < 100 * 20
+
+
+def test_projected_decoder(subtests: Any) -> None:
+    info = _info("GPS", "QBBLLeEZa", "TimeUS,Status,NSats,Lat,Lng,Alt,Spd,Note,Vals")
+    payload = info["struct_obj"].pack(1, 3, 12, 321234567, -348765432, 12345, 250, b"note", *range(32))
+    full = compile_decoder(info)(payload, 0)
+
+    with subtests.test("Only the projected columns, scaled"):
+        decode = compile_decoder(info, fields=("Lng", "TimeUS", "Alt", "Nope"))
+        msg = decode(payload, 0)
+        assert msg == {"TimeUS": 1, "Lng": full["Lng"], "Alt": 123.45, "mavpackettype": "GPS"}
+        assert decode.unpack(payload, 0) == (1, -348765432, 12345)  # the rest are pad bytes
+
+    with subtests.test("Strings and arrays"):
+        msg = compile_decoder(info, fields=("Note", "Vals"))(payload, 0)
+        assert msg["Note"] == "note" and list(msg["Vals"]) == list(range(32)) and len(msg) == 3
+
+    with subtests.test("Truncated payloads still fail"):
+        with pytest.raises(struct.error):
+            compile_decoder(info, fields=("TimeUS",))(payload[:-1], 0)
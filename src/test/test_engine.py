@@ -0,0 +1,55 @@
+import json
+import os
+from typing import Any
+
+from config import MAX_BLOCK_SIZE, MIN_BLOCK_SIZE
+from business_logic.engine import calibrate, load_calibration, open_parser, plan
+from business_logic.parser_sync import ParserSync
+from synthetic_log import write_log
+
+
+def test_plan(subtests: Any) -> None:
+    with subtests.test("Small file stays in-process"):
+        assert plan(200_000, cpu_count=16)["backend"] == "sync"
+
+    with subtests.test("Single core never pays for a pool"):
+        assert plan(4 * 1024**3, cpu_count=1)["backend"] == "sync"
+
+    with subtests.test("Huge file uses every core"):
+        chosen = plan(4 * 1024**3, cpu_count=16)
+        assert chosen["backend"] == "processes"
+        assert chosen["max_workers"] == 16
+
+    with subtests.test("Block size clamped"):
+        for size in (10 * 1024**2, 4 * 1024**3, 400 * 1024**3):
+            block_size = plan(size, cpu_count=8)["block_size"]
+            assert MIN_BLOCK_SIZE <= block_size <= MAX_BLOCK_SIZE
+
+    with subtests.test("Slow pool startup keeps medium files in-process"):
+        slow = {"pool_startup": 30.0}
+        assert plan(64 * 1024**2, cpu_count=8, calibration=slow)["backend"] == "sync"
+
+
+def test_calibration_is_remembered(tmp_path: Any, subtests: Any) -> None:
+    log_path = write_log(str(tmp_path / "flight.bin"), {"IMU": 500, "GPS": 50})
+    cal_path = str(tmp_path / "cache" / "calibration.json")
+
+    result = calibrate(log_path, path=cal_path)
+
+    with subtests.test("Rates measured"):
+        assert set(result) == {"sync_rate", "filtered_rate", "ipc_rate", "pool_startup"}
+        assert all(value > 0 for value in result.values())
+
+    with subtests.test("Stored per machine"):
+        with open(cal_path, encoding="utf-8") as f:
+            assert list(json.load(f).values()) == [result]
+        assert load_calibration(cal_path) == result
+
+
+def test_open_parser_small_log(tmp_path: Any) -> None:
+    log_path = write_log(str(tmp_path / "flight.bin"), {"IMU": 50, "GPS": 5})
+    parser = open_parser(log_path, "GPS")
+
+    assert isinstance(parser, ParserSync)
+    assert len(list(parser.recv_match("GPS"))) == 5
+    assert os.path.getsize(log_path) < MIN_BLOCK_SIZE
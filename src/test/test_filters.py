@@ -0,0 +1,199 @@
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+
+from business_logic.filters import filter_tests, parse_where
+from business_logic.multi_processing import ParserMultiprocessing
+from business_logic.parser_sync import ParserSync
+from business_logic.session import ParserSession
+from business_logic.thread_parser import ParserThreadPool
+from synthetic_log import MESSAGE_DEFS, msg_frame, write_log
+
+COUNTS = {"IMU": 3000, "GPS": 300, "BAT": 100, "MODE": 50, "MSG": 20}
+QUERIES = [
+    ("GPS", "Lat > 32.12346 and NSats >= 12"),
+    ("BAT", "Volt < 15.45 or Curr == 12.5"),
+    (None, {"MODE": "Mode in (1, 3)", "BAT": "Temp >= 31 and Volt * 2 > 30.9"}),
+    (["GPS", "BAT"], "TimeUS >= 2_000_000"),
+    (None, "Mode not in (0, 4) and changed(Rsn)"),
+]
+
+
+@pytest.fixture(scope="module")
+def log_path(tmp_path_factory: Any) -> str:
+    return write_log(str(tmp_path_factory.mktemp("filters") / "flight.bin"), COUNTS)
+
+
+def _matches(msg: Dict[str, Any], expr: str, last: Dict[str, Any]) -> bool:
+    """Reference: the expression evaluated on the decoded message."""
+    terms = [term.strip() for term in expr.split(" and ")]
+    changed = [term[len("changed(") : -1] for term in terms if term.startswith("changed(")]
+    rest = " and ".join(term for term in terms if not term.startswith("changed(")) or "True"
+    if not eval(rest, {}, dict(msg)):
+        return False
+    if changed:
+        key = tuple(msg[col] for col in changed[0].split(","))
+        if last.get(msg["mavpackettype"], object()) == key:
+            return False
+        last[msg["mavpackettype"]] = key
+    return True
+
+
+def _reference(messages: List[Dict[str, Any]], where: Any) -> List[Dict[str, Any]]:
+    exprs = {None: where} if isinstance(where, str) else where
+    last: Dict[str, Any] = {}
+    kept = []
+    for msg in messages:
+        expr = exprs.get(msg["mavpackettype"], exprs.get(None))
+        if expr is None:
+            kept.append(msg)
+            continue
+        try:
+            if _matches(msg, expr, last):
+                kept.append(msg)
+        except NameError:
+            pass  # a plain expression leaves out the types without its columns
+    return kept
+
+
+def _dicts(messages: List[Any]) -> List[Dict[str, Any]]:
+    return [m if isinstance(m, dict) else m.to_dict() for m in messages]
+
+
+async def _drain(messages: Any) -> List[Any]:
+    return [msg async for msg in messages]
+
+
+def test_raw_tests(subtests: Any) -> None:
+    _, fmt_chars, columns = MESSAGE_DEFS["GPS"]
+    schema = {11: {"name": "GPS", "columns": columns.split(","), "format_chars": list(fmt_chars)}}
+
+    def passes(expr: str, lat: int, alt: int = 100) -> bool:
+        frame = msg_frame(11, fmt_chars, (1, 3, 12, lat, 0, alt, 0))
+        return filter_tests(schema, parse_where(expr))[11](frame, 3)
+
+    cases = [
+        ("Lat > 32.1234567", 321234567, False),
+        ("Lat > 32.1234567", 321234568, True),
+        ("Lat >= 32.1234567", 321234567, True),
+        ("Lat < 32.12345675", 321234567, True),
+        ("Lat < 32.12345675", 321234568, False),
+        ("Lat == 32.12345675", 321234567, False),
+        ("Lat != 32.12345675", 321234567, True),
+        ("32.1234567 < Lat", 321234568, True),
+        ("Alt == 1.0 and Lat > 0", 1, True),
+        ("Lat / 2 > 16.0", 320000001, True),
+        ("not Lat > 0", 1, False),
+        # Constants beyond the raw range of the column pass always or never
+        ("Lat < 1e20", 2**31 - 1, True),
+        ("Lat >= 1e20", 2**31 - 1, False),
+        ("Lat > -1e20", -(2**31), True),
+        ("Lat <= -1e20", -(2**31), False),
+        ("Lat == 1e16", 2**31 - 1, False),
+        ("Lat != -1e16", -(2**31), True),
+        ("Lat in (1e20, 32.1234567)", 321234567, True),
+    ]
+    for expr, lat, expected in cases:
+        with subtests.test(f"{expr} on {lat}"):
+            assert passes(expr, lat) == expected
+
+    alt_cases = [
+        ("Alt < 1e20", 2**31 - 1, True),
+        ("Alt > 1e20", 2**31 - 1, False),
+        ("Alt > -1e20", -(2**31), True),
+        ("Alt < -1e20", -(2**31), False),
+        ("Alt >= 21474836.47", 2**31 - 1, True),
+        ("Alt > 21474836.47", 2**31 - 1, False),
+        ("Alt <= -21474836.48", -(2**31), True),
+    ]
+    for expr, alt, expected in alt_cases:
+        with subtests.test(f"{expr} on {alt}"):
+            assert passes(expr, 1, alt) == expected
+
+
+def test_invalid_where(log_path: str, subtests: Any) -> None:
+    cases = [
+        "Lat >",
+        "len(Lat) > 1",
+        "Lat.real > 1",
+        "Lat > 1 or changed(Lat)",
+        "changed(Lat) and changed(Lng)",
+        "changed(Lat + 1)",
+    ]
+    for expr in cases:
+        with subtests.test(expr):
+            with pytest.raises(ValueError):
+                parse_where(expr)
+
+    for parser in (ParserSync(log_path), ParserThreadPool(log_path), ParserMultiprocessing(log_path, max_workers=2)):
+        with subtests.test(f"{type(parser).__name__} unknown columns"):
+            with pytest.raises(ValueError):
+                list(parser.recv_match("GPS", where="Volt < 14"))
+            with pytest.raises(ValueError):
+                list(parser.recv_match(where="Nope < 14"))
+            # Types that lack the columns of a plain expression are left out
+            assert {m["mavpackettype"] for m in parser.recv_match(["GPS", "BAT"], where="Volt < 15.49")} == {"BAT"}
+            assert list(parser.recv_match("NOPE", where="Volt < 14")) == []
+
+        with subtests.test(f"{type(parser).__name__} huge constants"):
+            assert len(list(parser.recv_match("GPS", where="Lat < 1e20"))) == COUNTS["GPS"]
+            assert list(parser.recv_match("GPS", where="Alt <= -1e20")) == []
+
+
+def test_where_matches_post_filter(log_path: str, subtests: Any) -> None:
+    parsers: Dict[str, Any] = {
+        "sync": lambda **kw: ParserSync(log_path, **kw),
+        "threads": lambda **kw: ParserThreadPool(log_path, block_size=16 * 1024, max_workers=2, **kw),
+        "processes": lambda **kw: ParserMultiprocessing(log_path, block_size=16 * 1024, max_workers=2, **kw),
+        "shm": lambda **kw: ParserMultiprocessing(
+            log_path, transport="shm", block_size=16 * 1024, max_workers=2, **kw
+        ),
+        "records": lambda **kw: ParserMultiprocessing(
+            log_path, records=True, block_size=16 * 1024, max_workers=2, **kw
+        ),
+    }
+    full = ParserSync(log_path)
+    for name, make in parsers.items():
+        for use_index in (False, True):
+            for msg_name, where in QUERIES:
+                with subtests.test(f"{name} index={use_index} {msg_name} {where}"):
+                    expected = _reference(list(full.recv_match(msg_name)), where)
+                    got = list(make(use_index=use_index).recv_match(msg_name, where=where))
+                    assert _dicts(got) == expected
+
+        with subtests.test(f"{name} time window and fields"):
+            got = list(make().recv_match("GPS", 1_200_000, 1_500_000, fields=["Alt"], where="Lat > 32.12346"))
+            expected = _reference(list(full.recv_match("GPS", 1_200_000, 1_500_000)), "Lat > 32.12346")
+            # Records keep every column (they are lazy already)
+            assert [{k: m[k] for k in ("TimeUS", "Alt", "mavpackettype")} for m in _dicts(got)] == [
+                {"TimeUS": m["TimeUS"], "Alt": m["Alt"], "mavpackettype": "GPS"} for m in expected
+            ]
+
+        with subtests.test(f"{name} changed() across blocks"):
+            got = _dicts(list(make().recv_match("GPS", where="changed(Status, NSats)")))
+            assert len(got) == 1 and got[0]["TimeUS"] == next(full.recv_match("GPS"))["TimeUS"]
+
+        with subtests.test(f"{name} async"):
+            got = asyncio.run(_drain(make().arecv_match("BAT", where="Volt < 15.45")))
+            assert _dicts(got) == _reference(list(full.recv_match("BAT")), "Volt < 15.45")
+
+    with subtests.test("Session"):
+        with ParserSession(max_workers=2) as session:
+            parser = session.open(log_path, block_size=16 * 1024)
+            got = list(parser.recv_match(where="Mode not in (0, 4) and changed(Rsn)"))
+            assert got == _reference(list(full.recv_match()), "Mode not in (0, 4) and changed(Rsn)")
+
+
+def test_rejected_stats(log_path: str, subtests: Any) -> None:
+    for parser in (
+        ParserSync(log_path, stats=True),
+        ParserThreadPool(log_path, block_size=16 * 1024, stats=True),
+        ParserMultiprocessing(log_path, block_size=16 * 1024, max_workers=2, stats=True),
+    ):
+        with subtests.test(type(parser).__name__):
+            messages = list(parser.recv_match("BAT", where="Volt < 15.45"))
+            assert messages == _reference(list(ParserSync(log_path).recv_match("BAT")), "Volt < 15.45")
+            assert 0 < len(messages) < COUNTS["BAT"]
+            assert parser.stats.counts["BAT"] == len(messages)
+            assert parser.stats.rejected == COUNTS["BAT"] - len(messages)
@@ -0,0 +1,89 @@
+import json
+import os
+from typing import Any, Dict, List
+
+import pytest
+
+from business_logic.fleet import find_logs, iter_fleet, main, run_fleet
+from business_logic.parser_sync import ParserSync
+from synthetic_log import write_log
+
+LOGS = {
+    "big.bin": {"IMU": 3000, "GPS": 300},
+    "small.bin": {"BAT": 20, "MSG": 3},
+    "nested/mid.bin": {"IMU": 500, "PARM": 10},
+}
+
+
+@pytest.fixture
+def fleet_dir(tmp_path: Any) -> str:
+    (tmp_path / "nested").mkdir()
+    for name, counts in LOGS.items():
+        write_log(str(tmp_path / name), counts)
+    (tmp_path / "empty.bin").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("not a log")
+    return str(tmp_path)
+
+
+def _expected(path: str) -> Dict[str, Any]:
+    messages = list(ParserSync(path).recv_match())
+    counts: Dict[str, int] = {}
+    for m in messages:
+        counts[m["mavpackettype"]] = counts.get(m["mavpackettype"], 0) + 1
+    times = [m["TimeUS"] for m in messages if "TimeUS" in m]
+    return {"counts": counts, "messages": len(messages), "start_us": min(times), "end_us": max(times)}
+
+
+def test_find_logs(fleet_dir: str, subtests: Any) -> None:
+    with subtests.test("Directory, recursive"):
+        assert [os.path.relpath(p, fleet_dir) for p in find_logs(fleet_dir)] == [
+            "big.bin",
+            "empty.bin",
+            os.path.join("nested", "mid.bin"),
+            "small.bin",
+        ]
+
+    with subtests.test("Glob"):
+        assert find_logs(os.path.join(fleet_dir, "s*.bin")) == [os.path.join(fleet_dir, "small.bin")]
+
+
+def test_fleet_summaries(fleet_dir: str, subtests: Any) -> None:
+    summaries = {
+        os.path.relpath(s["path"], fleet_dir): s for s in iter_fleet(fleet_dir, max_workers=2, block_size=16 * 1024)
+    }
+    assert len(summaries) == len(LOGS) + 1
+
+    for name in LOGS:
+        with subtests.test(name):
+            summary = summaries[name]
+            expected = _expected(os.path.join(fleet_dir, name))
+            assert {k: summary[k] for k in expected} == expected
+            assert summary["errors"] == [] and summary["skipped_bytes"] == 0
+
+    with subtests.test("Empty file"):
+        assert summaries["empty.bin"]["messages"] == 0
+
+
+def test_run_fleet_streams_to_sink(fleet_dir: str, subtests: Any) -> None:
+    received: List[Dict[str, Any]] = []
+    os.chmod(os.path.join(fleet_dir, "small.bin"), 0)
+    try:
+        unreadable = not os.access(os.path.join(fleet_dir, "small.bin"), os.R_OK)
+        totals = run_fleet(fleet_dir, received.append, max_workers=2)
+    finally:
+        os.chmod(os.path.join(fleet_dir, "small.bin"), 0o644)
+
+    with subtests.test("One summary per file"):
+        assert totals["files"] == len(received) == len(LOGS) + 1
+
+    with subtests.test("Errors are reported per file"):
+        failed = [s for s in received if s["errors"]]
+        assert totals["failed"] == len(failed) == (1 if unreadable else 0)
+
+
+def test_cli_writes_json_lines(fleet_dir: str, tmp_path: Any) -> None:
+    out = tmp_path / "fleet.jsonl"
+    assert main([fleet_dir, "--workers", "2", "--output", str(out)]) == 0
+
+    lines = [json.loads(line) for line in out.read_text().splitlines()]
+    assert sorted(os.path.basename(s["path"]) for s in lines) == ["big.bin", "empty.bin", "mid.bin", "small.bin"]
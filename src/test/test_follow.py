@@ -0,0 +1,72 @@
+import threading
+import time
+from typing import Any, List
+
+from business_logic.parser_sync import ParserSync
+from synthetic_log import MESSAGE_DEFS, build_log, fmt_frame, msg_frame, sample_values
+
+
+def _append_slowly(path: str, data: bytes, chunk: int) -> None:
+    for i in range(0, len(data), chunk):
+        time.sleep(0.005)
+        with open(path, "ab") as f:
+            f.write(data[i : i + chunk])
+
+
+def test_follow_growing_file(tmp_path: Any, subtests: Any) -> None:
+    path = str(tmp_path / "live.bin")
+    first = build_log({"IMU": 20, "GPS": 5})
+    # A type whose FMT only shows up after the parser was created
+    typ, fmt_chars, columns = MESSAGE_DEFS["BAT"]
+    late = fmt_frame(typ, "BAT", fmt_chars, columns) + b"".join(
+        msg_frame(typ, fmt_chars, sample_values("BAT", i, 5_000_000 + i)) for i in range(3)
+    )
+
+    with open(path, "wb") as f:
+        f.write(first[:500])
+
+    parser = ParserSync(path)
+    # chunk sizes that never line up with frame boundaries
+    writer = threading.Thread(target=_append_slowly, args=(path, first[500:] + late, 37))
+    writer.start()
+    got = list(parser.follow(poll_interval=0.001, idle_timeout=0.5))
+    writer.join()
+
+    expected = list(ParserSync(path).recv_match())
+
+    with subtests.test("Same messages as a full parse"):
+        assert got == expected
+
+    with subtests.test("Late FMT picked up"):
+        assert [m["mavpackettype"] for m in got].count("BAT") == 3
+
+    with subtests.test("Cursor at end of file"):
+        assert parser.cursor == len(first) + len(late)
+
+
+def test_follow_resumes_from_cursor(tmp_path: Any) -> None:
+    path = str(tmp_path / "live.bin")
+    with open(path, "wb") as f:
+        f.write(build_log({"IMU": 10, "GPS": 10}))
+
+    parser = ParserSync(path)
+    got: List[Any] = []
+    for msg in parser.follow("GPS", idle_timeout=0):
+        got.append(msg)
+        if len(got) == 4:
+            break
+    got.extend(parser.follow("GPS", idle_timeout=0))
+
+    assert got == list(ParserSync(path).recv_match("GPS"))
+
+
+def test_follow_empty_file(tmp_path: Any) -> None:
+    path = str(tmp_path / "live.bin")
+    open(path, "wb").close()
+
+    parser = ParserSync(path)
+    assert list(parser.follow(idle_timeout=0)) == []
+
+    with open(path, "wb") as f:
+        f.write(build_log({"MODE": 3}))
+    assert [m["mavpackettype"] for m in parser.follow(idle_timeout=0)] == ["FMT", "FMT", "MODE", "MODE", "MODE"]
@@ -0,0 +1,100 @@
+from typing import Any, Dict, List
+
+import pytest
+
+from business_logic.join import asof_indices, asof_join, join_log
+from business_logic.parser_sync import ParserSync
+from synthetic_log import write_log
+
+np = pytest.importorskip("numpy")
+
+COUNTS = {"IMU": 2000, "GPS": 200, "BAT": 50, "MSG": 5}
+
+
+@pytest.fixture
+def log_path(tmp_path: Any) -> str:
+    # BAT stops early: later GPS rows only match it within a tolerance they exceed
+    return write_log(str(tmp_path / "flight.bin"), COUNTS)
+
+
+def _reference(log_path: str, name: str, tolerance_us: int | None) -> List[Dict[str, Any] | None]:
+    """Reference: for every GPS message, the last *name* message at or before it, by hand."""
+    messages = list(ParserSync(log_path).recv_match(["GPS", name]))
+    last = None
+    matched: List[Dict[str, Any] | None] = []
+    for msg in messages:
+        if msg["mavpackettype"] == name:
+            last = msg
+        elif last is not None and (tolerance_us is None or msg["TimeUS"] - last["TimeUS"] <= tolerance_us):
+            matched.append(last)
+        else:
+            matched.append(None)
+    return matched
+
+
+def test_asof_indices(subtests: Any) -> None:
+    left = [5, 10, 15, 31, 40]
+    right = [10, 20, 30]
+
+    with subtests.test("Backward"):
+        idx, matched = asof_indices(left, right)
+        assert matched.tolist() == [False, True, True, True, True]
+        assert idx[matched].tolist() == [0, 0, 2, 2]
+
+    with subtests.test("Forward and nearest"):
+        idx, matched = asof_indices(left, right, direction="forward")
+        assert matched.tolist() == [True, True, True, False, False] and idx[:3].tolist() == [0, 0, 1]
+        idx, matched = asof_indices(left, right, direction="nearest")
+        assert matched.all() and idx.tolist() == [0, 0, 0, 2, 2]  # a tie takes the earlier
+
+    with subtests.test("Tolerance"):
+        _, matched = asof_indices(left, right, tolerance_us=4)
+        assert matched.tolist() == [False, True, False, True, False]
+
+    with subtests.test("Nothing to match"):
+        _, matched = asof_indices(left, [])
+        assert not matched.any()
+        with pytest.raises(ValueError):
+            asof_indices(left, right, direction="sideways")
+
+    with subtests.test("Unsorted right side, fill values"):
+        left_cols = {"TimeUS": np.array([5, 25])}
+        right_cols = {"TimeUS": np.array([20, 10]), "V": np.array([2.0, 1.0]), "N": np.array([2, 1])}
+        joined = asof_join(left_cols, right_cols, "R", tolerance_us=10)
+        assert joined["R.TimeUS"].tolist() == [0, 20] and joined["R.N"].tolist() == [0, 2]
+        assert np.isnan(joined["R.V"][0]) and joined["R.V"][1] == 2.0
+        assert joined["R.matched"].tolist() == [False, True]
+
+
+def test_join_log_matches_reference(log_path: str, subtests: Any) -> None:
+    gps = list(ParserSync(log_path).recv_match("GPS"))
+
+    for tolerance_us in (None, 20_000):
+        table = join_log(
+            log_path, "GPS", {"IMU": ["AccX"], "BAT": None}, ["Lat", "Alt"], tolerance_us=tolerance_us, max_workers=2
+        )
+        with subtests.test(f"Base columns tolerance={tolerance_us}"):
+            assert table["TimeUS"].tolist() == [m["TimeUS"] for m in gps]
+            assert table["GPS.Alt"].tolist() == [m["Alt"] for m in gps]
+            assert "GPS.Status" not in table and "IMU.GyrX" not in table
+
+        for name, col in (("IMU", "AccX"), ("BAT", "Volt")):
+            with subtests.test(f"{name} tolerance={tolerance_us}"):
+                expected = _reference(log_path, name, tolerance_us)
+                assert table[f"{name}.matched"].tolist() == [m is not None for m in expected]
+                got = table[f"{name}.{col}"]
+                assert [None if np.isnan(v) else v for v in got.tolist()] == [
+                    None if m is None else pytest.approx(m[col]) for m in expected
+                ]
+
+    with subtests.test("Unmatched rows past the tolerance only"):
+        assert join_log(log_path, "GPS", {"BAT": ["Volt"]}, max_workers=2)["BAT.matched"][1:].all()
+        assert not join_log(log_path, "GPS", {"BAT": ["Volt"]}, tolerance_us=20_000)["BAT.matched"][1:].all()
+
+    with subtests.test("Errors"):
+        with pytest.raises(ValueError):
+            join_log(log_path, "GPS", {"NOPE": None})
+        with pytest.raises(ValueError):
+            join_log(log_path, "GPS", {"IMU": ["Nope"]})
+        with pytest.raises(ValueError):
+            join_log(log_path, "GPS", {"GPS": None})
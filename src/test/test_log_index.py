@@ -0,0 +1,55 @@
+import os
+import time
+from typing import Any
+
+import pytest
+
+from business_logic.log_index import LogIndex, default_sidecar_path
+from business_logic.multi_processing import ParserMultiprocessing
+from business_logic.parser_sync import ParserSync
+from business_logic.thread_parser import ParserThreadPool
+from synthetic_log import MESSAGE_DEFS, write_log
+
+COUNTS = {"IMU": 200, "GPS": 20, "BAT": 10, "MSG": 5}
+
+
+@pytest.fixture
+def log_path(tmp_path: Any) -> str:
+    return write_log(str(tmp_path / "flight.bin"), COUNTS)
+
+
+def test_build_and_reload(log_path: str, subtests: Any) -> None:
+    index = LogIndex.load_or_build(log_path)
+
+    with subtests.test("Sidecar written"):
+        assert os.path.exists(default_sidecar_path(log_path))
+
+    with subtests.test("Counts per type"):
+        for name, count in COUNTS.items():
+            assert index.counts[MESSAGE_DEFS[name][0]] == count
+
+    with subtests.test("Reload gives the same index"):
+        loaded = LogIndex.load(log_path)
+        assert loaded is not None
+        assert loaded.fmt_table == index.fmt_table
+        assert loaded.counts == index.counts
+        gps = MESSAGE_DEFS["GPS"][0]
+        assert list(loaded.offsets_for(gps)) == list(index.offsets_for(gps))
+
+
+def test_sidecar_invalidated_on_change(log_path: str) -> None:
+    LogIndex.load_or_build(log_path)
+    time.sleep(0.01)
+    write_log(log_path, {"IMU": 5, "GPS": 3})
+
+    assert LogIndex.load(log_path) is None
+    index = LogIndex.load_or_build(log_path)
+    assert index.counts[MESSAGE_DEFS["GPS"][0]] == 3
+
+
+@pytest.mark.parametrize("parser_cls", [ParserSync, ParserThreadPool, ParserMultiprocessing])
+def test_parsers_with_index_match_scan(log_path: str, parser_cls: Any) -> None:
+    for msg_name in ("GPS", "MSG", None):
+        expected = list(parser_cls(log_path).recv_match(msg_name))
+        got = list(parser_cls(log_path, use_index=True).recv_match(msg_name))
+        assert got == expected
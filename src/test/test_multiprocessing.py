@@ -101,6 +101,50 @@ def test_make_blocks(subtests: Any) -> None:
         os.remove(tmp_path)
 
 
-    
-
-   
+def test_shm_transport_matches_pickle(subtests: Any) -> None:
+    from synthetic_log import write_log
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = write_log(os.path.join(tmp_dir, "flight.bin"), {"IMU": 400, "GPS": 40, "MSG": 5})
+
+        for msg_name in (None, "GPS", "MSG"):
+            with subtests.test(f"Same output ({msg_name})"):
+                expected = list(ParserMultiprocessing(tmp_path).recv_match(msg_name))
+                # small blocks force several segments
+                got = list(ParserMultiprocessing(tmp_path, transport="shm", block_size=4096).recv_match(msg_name))
+                assert got == expected
+
+        with subtests.test("Segments released on early exit"):
+            before = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+            gen = ParserMultiprocessing(tmp_path, transport="shm", block_size=4096).recv_match()
+            next(gen)
+            gen.close()
+            after = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+            assert not {name for name in after - before if name.startswith("psm_")}
+
+        with subtests.test("Unknown transport"):
+            with pytest.raises(ValueError):
+                ParserMultiprocessing(tmp_path, transport="carrier-pigeon")
+
+
+def test_bounded_window(subtests: Any) -> None:
+    from synthetic_log import write_log
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = write_log(os.path.join(tmp_dir, "flight.bin"), {"IMU": 400, "GPS": 40})
+        expected = list(ParserMultiprocessing(tmp_path).recv_match())
+
+        with subtests.test("File order kept with a window of one block"):
+            parser = ParserMultiprocessing(tmp_path, block_size=2048, max_in_flight=1)
+            assert len(parser._make_blocks()) > 1
+            assert list(parser.recv_match()) == expected
+
+        with subtests.test("Memory limit shrinks the window"):
+            parser = ParserMultiprocessing(tmp_path, block_size=1024 * 1024, memory_limit=64 * 1024 * 1024)
+            assert parser.max_in_flight == 3
+            assert list(parser.recv_match()) == expected
+
+        with subtests.test("Memory limit shrinks blocks"):
+            parser = ParserMultiprocessing(tmp_path, memory_limit=8 * 1024 * 1024)
+            assert parser.max_in_flight == 1
+            assert parser.block_size * 16 * 2 <= 8 * 1024 * 1024
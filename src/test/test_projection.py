@@ -0,0 +1,78 @@
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+
+from business_logic.multi_processing import ParserMultiprocessing
+from business_logic.parser_sync import ParserSync
+from business_logic.session import ParserSession
+from business_logic.thread_parser import ParserThreadPool
+from synthetic_log import write_log
+
+COUNTS = {"IMU": 3000, "GPS": 300, "BAT": 100, "MSG": 20}
+FIELDS = ["TimeUS", "Lat", "Lng", "Alt"]
+
+
+@pytest.fixture(scope="module")
+def log_path(tmp_path_factory: Any) -> str:
+    return write_log(str(tmp_path_factory.mktemp("projection") / "flight.bin"), COUNTS)
+
+
+def _project(messages: List[Dict[str, Any]], fields: List[str]) -> List[Dict[str, Any]]:
+    return [{**{k: m[k] for k in fields if k in m}, "mavpackettype": m["mavpackettype"]} for m in messages]
+
+
+async def _drain(messages: Any) -> List[Any]:
+    return [msg async for msg in messages]
+
+
+def test_projection_matches_full_decode(log_path: str, subtests: Any) -> None:
+    parsers: Dict[str, Any] = {
+        "sync": lambda **kw: ParserSync(log_path, **kw),
+        "threads": lambda **kw: ParserThreadPool(log_path, block_size=16 * 1024, max_workers=2, **kw),
+        "processes": lambda **kw: ParserMultiprocessing(log_path, block_size=16 * 1024, max_workers=2, **kw),
+        "shm": lambda **kw: ParserMultiprocessing(
+            log_path, transport="shm", block_size=16 * 1024, max_workers=2, **kw
+        ),
+    }
+    queries = [("GPS", None, None), (["GPS", "BAT"], None, None), (None, None, None)]
+    full = ParserSync(log_path)
+    for name, make in parsers.items():
+        for use_index in (False, True):
+            for msg_name, start_us, end_us in queries:
+                with subtests.test(f"{name} index={use_index} {msg_name}"):
+                    expected = _project(list(full.recv_match(msg_name)), FIELDS)
+                    got = list(make(use_index=use_index).recv_match(msg_name, fields=FIELDS))
+                    assert got == expected
+
+        with subtests.test(f"{name} stats"):
+            parser = make(stats=True)
+            assert list(parser.recv_match("GPS", fields=["Alt"])) == _project(list(full.recv_match("GPS")), ["Alt"])
+            assert parser.stats.counts["GPS"] == COUNTS["GPS"]
+
+        with subtests.test(f"{name} time window keeps TimeUS"):
+            got = list(make().recv_match("IMU", 1_200_000, 1_500_000, fields=["AccX"]))
+            assert got == _project(list(full.recv_match("IMU", 1_200_000, 1_500_000)), ["TimeUS", "AccX"])
+
+        with subtests.test(f"{name} async"):
+            got = asyncio.run(_drain(make().arecv_match("GPS", fields="Alt")))
+            assert got == _project(list(full.recv_match("GPS")), ["Alt"])
+
+    with subtests.test("Session"):
+        with ParserSession(max_workers=2) as session:
+            parser = session.open(log_path, block_size=16 * 1024)
+            assert list(parser.recv_match("GPS", fields=FIELDS)) == _project(list(full.recv_match("GPS")), FIELDS)
+
+    with subtests.test("Records are lazy already"):
+        records = list(ParserThreadPool(log_path, records=True).recv_match("GPS", fields=FIELDS))
+        assert [r.to_dict() for r in records] == list(full.recv_match("GPS"))
+
+
+def test_unknown_fields(log_path: str, subtests: Any) -> None:
+    for parser in (ParserSync(log_path), ParserThreadPool(log_path), ParserMultiprocessing(log_path, max_workers=2)):
+        with subtests.test(type(parser).__name__):
+            with pytest.raises(ValueError):
+                list(parser.recv_match("GPS", fields=["Lat", "AccX"]))
+            # A field of one of the types is enough: the others leave it out
+            messages = list(parser.recv_match(["GPS", "BAT"], fields=["Lat", "Volt"]))
+            assert {tuple(m) for m in messages} == {("Lat", "mavpackettype"), ("Volt", "mavpackettype")}
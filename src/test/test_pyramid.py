@@ -0,0 +1,108 @@
+from typing import Any, Dict
+
+import pytest
+
+from business_logic import pyramid as pyramid_module
+from business_logic.parser_sync import ParserSync
+from business_logic.pyramid import Pyramid
+from synthetic_log import write_log
+
+np = pytest.importorskip("numpy")
+
+COUNTS = {"IMU": 6000, "GPS": 1500, "BAT": 1500, "MSG": 10}
+BASE_US = 20_000
+
+
+@pytest.fixture
+def log_path(tmp_path: Any) -> str:
+    return write_log(str(tmp_path / "flight.bin"), COUNTS)
+
+
+def _expected_level(log_path: str, msg_name: str, col: str, bucket_us: int) -> Dict[str, Any]:
+    """Reference: bucket the full columns of the sync parser in plain Python."""
+    columns = ParserSync(log_path).recv_columns(msg_name)
+    buckets: Dict[int, list] = {}
+    for time_us, value in zip(columns["TimeUS"].tolist(), columns[col].tolist()):
+        buckets.setdefault(time_us // bucket_us, []).append(value)
+    keys = sorted(buckets)
+    return {
+        "TimeUS": [k * bucket_us for k in keys],
+        "count": [len(buckets[k]) for k in keys],
+        "min": [min(buckets[k]) for k in keys],
+        "max": [max(buckets[k]) for k in keys],
+        "mean": [sum(buckets[k]) / len(buckets[k]) for k in keys],
+        "last": [buckets[k][-1] for k in keys],
+    }
+
+
+def test_levels_match_reference(log_path: str, monkeypatch: Any, subtests: Any) -> None:
+    monkeypatch.setattr(pyramid_module, "PYRAMID_CHUNK_ROWS", 100)  # many chunks, buckets split across them
+    monkeypatch.setattr(pyramid_module, "PYRAMID_TOP_BUCKETS", 20)
+    pyramid = Pyramid.build(log_path, {"GPS": ["Lat", "Alt"], "BAT": None}, base_us=BASE_US, max_workers=2)
+
+    with subtests.test("Columns and levels"):
+        assert pyramid.types == ["BAT", "GPS"]
+        assert pyramid.columns("BAT") == ["Inst", "Volt", "Curr", "Temp"]  # numeric columns, TimeUS excluded
+        levels = pyramid.levels("GPS")
+        assert levels[:2] == [BASE_US, 4 * BASE_US] and len(pyramid.level("GPS", len(levels) - 1)["TimeUS"]) <= 20
+
+    for msg_name, col in (("GPS", "Lat"), ("GPS", "Alt"), ("BAT", "Volt")):
+        for k, bucket_us in enumerate(pyramid.levels(msg_name)):
+            with subtests.test(f"{msg_name}.{col} level {k}"):
+                expected = _expected_level(log_path, msg_name, col, bucket_us)
+                level = pyramid.level(msg_name, k)
+                assert level["TimeUS"].tolist() == expected["TimeUS"]
+                assert level["count"].tolist() == expected["count"]
+                for stat in ("min", "max", "last"):
+                    assert level[f"{col}.{stat}"].tolist() == expected[stat]
+                assert np.allclose(level[f"{col}.mean"], expected["mean"])
+
+    with subtests.test("Unknown types and columns"):
+        with pytest.raises(ValueError):
+            Pyramid.build(log_path, {"NOPE": None})
+        with pytest.raises(ValueError):
+            Pyramid.build(log_path, {"MSG": ["Message"]})  # not numeric
+
+
+def test_window(log_path: str, monkeypatch: Any, subtests: Any) -> None:
+    monkeypatch.setattr(pyramid_module, "PYRAMID_TOP_BUCKETS", 20)
+    pyramid = Pyramid.build(log_path, {"GPS": ["Lat", "Alt"]}, base_us=BASE_US, max_workers=2)
+    gps = ParserSync(log_path).recv_columns("GPS")
+
+    with subtests.test("Zoomed in: raw frames of the window"):
+        bucket_us, columns = pyramid.window("GPS", 2_000_000, 2_500_000, max_points=500)
+        inside = (gps["TimeUS"] >= 2_000_000) & (gps["TimeUS"] < 2_500_000)
+        assert bucket_us == 0 and list(columns) == ["TimeUS", "Lat", "Alt"]
+        assert np.array_equal(columns["TimeUS"], gps["TimeUS"][inside])
+        assert np.array_equal(columns["Alt"], gps["Alt"][inside])
+
+    with subtests.test("Zoomed out: the finest level that fits"):
+        bucket_us, columns = pyramid.window("GPS", max_points=500)
+        assert bucket_us > BASE_US and len(columns["TimeUS"]) <= 500
+        finer = pyramid.level("GPS", pyramid.levels("GPS").index(bucket_us) - 1)
+        assert len(finer["TimeUS"]) > 500
+        assert columns["count"].sum() == COUNTS["GPS"]
+
+    with subtests.test("Buckets overlapping the window"):
+        bucket_us, columns = pyramid.window("GPS", 3_010_000, 6_000_000, max_points=200)
+        assert bucket_us and columns["TimeUS"][0] <= 3_010_000 < columns["TimeUS"][0] + bucket_us
+        assert columns["TimeUS"][-1] < 6_000_000
+
+
+def test_pyramid_lifecycle(log_path: str, subtests: Any) -> None:
+    with subtests.test("Missing pyramid"):
+        assert Pyramid.load(log_path) is None
+
+    pyramid = Pyramid.load_or_build(log_path, {"GPS": ["Lat"]}, base_us=BASE_US)
+
+    with subtests.test("Reused while the log is unchanged"):
+        again = Pyramid.load_or_build(log_path, {"GPS": ["Lat"]})
+        assert again.manifest == pyramid.manifest
+
+    with subtests.test("Rebuilt for columns it lacks"):
+        assert Pyramid.load_or_build(log_path, {"GPS": ["Lat", "Alt"]}).columns("GPS") == ["Lat", "Alt"]
+
+    with subtests.test("Stale once the log changes"):
+        write_log(log_path, {"GPS": 41})
+        assert Pyramid.load(log_path) is None
+        assert Pyramid.load_or_build(log_path, {"GPS": ["Lat"]}).level("GPS", 0)["count"].sum() == 41
@@ -0,0 +1,92 @@
+import struct
+import sys
+from typing import Any, Dict, List
+
+import pytest
+
+from business_logic.decoders import compile_decoder
+from business_logic.multi_processing import ParserMultiprocessing
+from business_logic.parser_sync import ParserSync
+from business_logic.records import compile_record_class
+from business_logic.thread_parser import ParserThreadPool
+from synthetic_log import MESSAGE_DEFS, struct_for, write_log
+
+COUNTS = {"IMU": 200, "GPS": 40, "MSG": 10, "ISBD": 5, "RAWD": 5}
+
+
+def _info(name: str) -> Dict[str, Any]:
+    _, fmt, columns = MESSAGE_DEFS[name]
+    return {"name": name, "columns": columns.split(","), "format_chars": list(fmt)}
+
+
+def _plain(msg: Dict[str, Any]) -> Dict[str, Any]:
+    """Views/arrays → lists, so dict and record output compare across backends."""
+    return {k: (v if isinstance(v, (int, float, str)) else list(v)) for k, v in msg.items()}
+
+
+@pytest.fixture
+def log_path(tmp_path: Any) -> str:
+    return write_log(str(tmp_path / "records.bin"), COUNTS)
+
+
+def test_record_fields_match_decoder(subtests: Any) -> None:
+    values = {
+        "GPS": (1, 3, 12, 321234567, -348765432, 12345, 250),
+        "MSG": (7, b"hello\x00\x00"),
+        "ISBD": (9, 32, 1, *range(96)),
+    }
+    for name, payload_values in values.items():
+        with subtests.test(name):
+            info = _info(name)
+            buf = b"\xa3\x95\x00" + struct_for("".join(info["format_chars"])).pack(*payload_values)
+            record = compile_record_class(info)(buf, 3)
+            expected = compile_decoder(info)(buf, 3)
+
+            assert record.get_type() == name
+            assert record._fieldnames == info["columns"]
+            assert _plain(record.to_dict()) == _plain(expected)
+            for col in info["columns"]:
+                value = getattr(record, col)
+                assert (value if isinstance(value, (int, float, str)) else list(value)) == _plain(expected)[col]
+
+
+def test_record_class_behaviour(subtests: Any) -> None:
+    info = _info("GPS")
+    record_cls = compile_record_class(info)
+    buf = b"\xa3\x95\x0b" + struct_for("QBBLLeE").pack(1, 3, 12, 321234567, -348765432, 12345, 250)
+
+    with subtests.test("Two slots, no per-instance dict"):
+        record = record_cls(buf, 3)
+        assert not hasattr(record, "__dict__")
+        assert sys.getsizeof(record) < sys.getsizeof(compile_decoder(info)(buf, 3))
+
+    with subtests.test("Truncated payload raises struct.error"):
+        with pytest.raises(struct.error):
+            record_cls(buf[:-1], 3)
+
+    with subtests.test("One class per FMT definition"):
+        assert compile_record_class(dict(info)) is record_cls
+
+    with subtests.test("repr in pymavlink style"):
+        assert repr(record_cls(buf, 3)).startswith("GPS {TimeUS : 1, Status : 3")
+
+
+def test_parsers_record_mode(log_path: str, subtests: Any) -> None:
+    expected: List[Dict[str, Any]] = [_plain(m) for m in ParserSync(log_path).recv_match()]
+    parsers = {
+        "sync": lambda **kw: ParserSync(log_path, **kw),
+        "threads": lambda **kw: ParserThreadPool(log_path, block_size=4096, max_workers=2, **kw),
+        "processes": lambda **kw: ParserMultiprocessing(log_path, block_size=4096, max_workers=2, **kw),
+        "processes shm": lambda **kw: ParserMultiprocessing(
+            log_path, transport="shm", block_size=4096, max_workers=2, **kw
+        ),
+    }
+    for name, make in parsers.items():
+        for use_index in (False, True):
+            with subtests.test(f"{name} index={use_index}"):
+                parser = make(records=True, use_index=use_index)
+                records = list(parser.recv_match())
+                assert [_plain(r.to_dict()) for r in records] == expected
+
+                gps = list(parser.recv_match("GPS"))
+                assert [r.Lat for r in gps] == [m["Lat"] for m in expected if m["mavpackettype"] == "GPS"]
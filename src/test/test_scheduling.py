@@ -0,0 +1,46 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+from business_logic.scheduling import iter_ordered, window_for_memory
+
+
+def test_iter_ordered_bounds_in_flight(subtests: Any) -> None:
+    lock = threading.Lock()
+    submitted: List[int] = []
+    consumed: List[int] = []
+    max_ahead = 0
+
+    def work(i: int) -> int:
+        return i * i
+
+    def tasks() -> Any:
+        nonlocal max_ahead
+        for i in range(50):
+            with lock:
+                submitted.append(i)
+                max_ahead = max(max_ahead, len(submitted) - len(consumed))
+            yield (i,)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for result in iter_ordered(executor, work, tasks(), max_in_flight=3):
+            consumed.append(result)
+
+    with subtests.test("Results in submission order"):
+        assert consumed == [i * i for i in range(50)]
+
+    with subtests.test("Never more than the window ahead of the consumer"):
+        assert max_ahead <= 3
+
+
+def test_window_for_memory(subtests: Any) -> None:
+    with subtests.test("No limit"):
+        assert window_for_memory(1 << 20, None, 16) == (1 << 20, 16)
+
+    with subtests.test("Limit caps the window"):
+        assert window_for_memory(1 << 20, 64 << 20, 16) == (1 << 20, 3)
+
+    with subtests.test("Tiny limit shrinks blocks"):
+        block_size, in_flight = window_for_memory(10 << 20, 4 << 20, 16)
+        assert in_flight == 1
+        assert block_size == (4 << 20) // 32
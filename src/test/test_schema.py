@@ -0,0 +1,160 @@
+import os
+from typing import Any, Dict, List
+
+import pytest
+
+from business_logic import parser_sync, schema
+from business_logic.multi_processing import ParserMultiprocessing
+from business_logic.parser_sync import ParserSync
+from business_logic.stream_parser import ParserStream
+from business_logic.thread_parser import ParserThreadPool
+from config import FMT_HEADER_BYTES
+from synthetic_log import MESSAGE_DEFS, fmt_frame, header, msg_frame, sample_values
+
+IMU_TYPE, IMU_FMT, _ = MESSAGE_DEFS["IMU"]
+
+
+def _late_log(imu: int = 80_000, late: Dict[str, int] | None = None) -> bytes:
+    """
+    IMU from the start; MODE and MSG (or the *late* name → type id) defined
+    on first use, past the header region.
+    """
+    late = {"MODE": MESSAGE_DEFS["MODE"][0], "MSG": MESSAGE_DEFS["MSG"][0]} if late is None else late
+    body: List[bytes] = []
+    for i in range(imu):
+        time_us = 1000 * (i + 1)
+        body.append(msg_frame(IMU_TYPE, IMU_FMT, sample_values("IMU", i, time_us)))
+        for name, first in (("MODE", imu // 2), ("MSG", imu - 50)):
+            if name not in late:
+                continue
+            typ, (_, fmt_chars, columns) = late[name], MESSAGE_DEFS[name]
+            if i == first:
+                body.append(fmt_frame(typ, name, fmt_chars, columns))
+            if i >= first and i % 25 == 0:
+                body.append(msg_frame(typ, fmt_chars, sample_values(name, i, time_us)))
+    return header(["IMU"]) + b"".join(body)
+
+
+@pytest.fixture(autouse=True)
+def schema_cache(tmp_path: Any, monkeypatch: Any) -> str:
+    cache_dir = str(tmp_path / "schemas")
+    monkeypatch.setattr(schema, "SCHEMA_CACHE_DIR", cache_dir)
+    monkeypatch.setattr(schema, "_TABLES", {})
+    return cache_dir
+
+
+@pytest.fixture
+def late_path(tmp_path: Any) -> str:
+    path = tmp_path / "late.bin"
+    path.write_bytes(_late_log())
+    return str(path)
+
+
+def _names(messages: Any) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for msg in messages:
+        counts[msg["mavpackettype"]] = counts.get(msg["mavpackettype"], 0) + 1
+    return counts
+
+
+def test_late_fmt_records(late_path: str, monkeypatch: Any, subtests: Any) -> None:
+    monkeypatch.setattr(parser_sync, "FMT_SCAN_STEP", 256 * 1024)
+    expected = list(ParserSync(late_path).recv_match())
+    assert _names(expected)["MODE"] > 0 and _names(expected)["MSG"] > 0
+
+    parsers = {
+        "threads": lambda **kw: ParserThreadPool(late_path, block_size=64 * 1024, max_workers=2, **kw),
+        "processes": lambda **kw: ParserMultiprocessing(late_path, block_size=64 * 1024, max_workers=2, **kw),
+        "shm": lambda **kw: ParserMultiprocessing(
+            late_path, transport="shm", block_size=64 * 1024, max_workers=2, **kw
+        ),
+    }
+    for name, make in parsers.items():
+        with subtests.test(name):
+            assert list(make().recv_match()) == expected
+
+        with subtests.test(f"{name} late type"):
+            assert list(make().recv_match("MSG")) == [m for m in expected if m["mavpackettype"] == "MSG"]
+
+    with subtests.test("Late type by name, index and stream"):
+        modes = [m for m in expected if m["mavpackettype"] == "MODE"]
+        assert list(ParserSync(late_path).recv_match("MODE")) == modes
+        assert list(ParserSync(late_path, use_index=True).recv_match("MODE")) == modes
+        assert list(ParserStream(late_path, chunk_size=9999).recv_match("MODE")) == modes
+
+    with subtests.test("Time window past a late record"):
+        window = (45_000_000, 50_000_000)
+        got = list(ParserSync(late_path).recv_match(["MODE", "IMU"], *window))
+        timed = [m for m in expected if m["mavpackettype"] in ("MODE", "IMU")]
+        assert got == [m for m in timed if window[0] <= m["TimeUS"] < window[1]]
+        assert any(m["mavpackettype"] == "MODE" for m in got)
+
+    with subtests.test("Columns"):
+        columns = ParserThreadPool(late_path, max_workers=2).recv_columns("MODE")
+        assert len(columns["TimeUS"]) == len(modes)
+
+
+def test_open_reads_header_only(late_path: str, monkeypatch: Any, subtests: Any) -> None:
+    monkeypatch.setattr(parser_sync, "FMT_SCAN_STEP", 256 * 1024)
+    size = os.path.getsize(late_path)
+
+    with subtests.test("Only the header is searched on open"):
+        for parser in (ParserSync(late_path), ParserThreadPool(late_path), ParserMultiprocessing(late_path)):
+            assert parser._fmts is not None and parser._fmts.scanned == FMT_HEADER_BYTES
+            assert "MODE" not in {info["name"] for info in parser._fmt_cache.values()}
+
+    with subtests.test("The first message needs no pass over the file"):
+        parser = ParserSync(late_path)
+        messages = parser.recv_match()
+        next(messages)
+        assert parser._fmts is not None and parser._fmts.scanned < size
+        assert "MODE" not in {info["name"] for info in parser._fmt_cache.values()}
+
+    with subtests.test("Unknown names read the remaining records"):
+        parser = ParserSync(late_path)
+        assert list(parser.recv_match("NOPE")) == []
+        assert parser._fmts is not None and parser._fmts.complete(size)
+
+
+def test_schema_cache(late_path: str, schema_cache: str, tmp_path: Any, monkeypatch: Any, subtests: Any) -> None:
+    list(ParserSync(late_path).recv_match())
+
+    with subtests.test("Late records are stored under the header key"):
+        (cached,) = os.listdir(schema_cache)
+        table = schema.load_table(cached[: -len(".json")], schema_cache)
+        assert table is not None and [entry[2] for entry in table] == ["FMT", "IMU", "MODE", "MSG"]
+
+    with subtests.test("A log with the same header looks late types up by their cached records"):
+        schema._TABLES.clear()  # from disk
+        other = tmp_path / "other.bin"
+        other.write_bytes(_late_log(imu=70_000))
+        parser = ParserSync(str(other))
+        assert "MODE" not in {info["name"] for info in parser._fmt_cache.values()}  # not applied before it is found
+        parser._scan_all_fmts({"MODE"})  # the lookup of recv_match("MODE")
+        assert parser._fmts is not None and FMT_HEADER_BYTES < parser._fmts.scanned < os.path.getsize(other)
+        assert "MODE" in {info["name"] for info in parser._fmt_cache.values()}
+        modes = list(parser.recv_match("MODE"))
+        assert modes == [m for m in ParserSync(str(other)).recv_match() if m["mavpackettype"] == "MODE"]
+
+    with subtests.test("Late type ids and names are this log's own"):
+        # Same header, but MODE got another id and MSG was never used
+        other = tmp_path / "renumbered.bin"
+        other.write_bytes(_late_log(imu=70_000, late={"MODE": 20}))
+        for parser_cls in (ParserSync, ParserThreadPool, ParserMultiprocessing):
+            parser = parser_cls(str(other))
+            assert list(parser.recv_match("MSG")) == []
+            modes = list(parser.recv_match("MODE"))
+            assert len(modes) > 0 and {typ for typ, info in parser._fmt_cache.items() if info["name"] == "MODE"} == {20}
+
+    with subtests.test("Another header does not use it"):
+        other = tmp_path / "short.bin"
+        other.write_bytes(header(["IMU", "GPS"]) + msg_frame(IMU_TYPE, IMU_FMT, sample_values("IMU", 0, 1000)))
+        parser = ParserSync(str(other))
+        assert {info["name"] for info in parser._fmt_cache.values()} == {"FMT", "IMU", "GPS"}
+
+    with subtests.test("An unwritable cache is not an error"):
+        blocked = tmp_path / "blocked"
+        blocked.write_bytes(b"")
+        monkeypatch.setattr(schema, "SCHEMA_CACHE_DIR", str(blocked / "schemas"))
+        schema._TABLES.clear()
+        assert len(list(ParserThreadPool(late_path, max_workers=2).recv_match("MSG"))) > 0
@@ -0,0 +1,56 @@
+import os
+from typing import Any, List
+
+import pytest
+
+import business_logic.multi_processing as multi_processing
+from business_logic.multi_processing import ParserMultiprocessing
+from business_logic.session import ParserSession
+from synthetic_log import write_log
+
+
+def _worker_state() -> List[Any]:
+    return [os.getpid(), sorted(multi_processing._WORKER_SCHEMAS), sorted(multi_processing._WORKER_MMAPS)]
+
+
+@pytest.fixture
+def log_paths(tmp_path: Any) -> List[str]:
+    return [
+        write_log(str(tmp_path / "a.bin"), {"IMU": 300, "GPS": 30}),
+        write_log(str(tmp_path / "b.bin"), {"BAT": 50, "MSG": 10}),
+    ]
+
+
+def test_session_matches_standalone(log_paths: List[str], subtests: Any) -> None:
+    with ParserSession(log_paths[:1], max_workers=2) as session:
+        for path in log_paths:
+            for msg_name in (None, "GPS", "MSG"):
+                with subtests.test(f"{os.path.basename(path)} {msg_name}"):
+                    expected = list(ParserMultiprocessing(path).recv_match(msg_name))
+                    assert list(session.open(path).recv_match(msg_name)) == expected
+
+        with subtests.test("Index path"):
+            expected = list(ParserMultiprocessing(log_paths[0]).recv_match("GPS"))
+            assert list(session.open(log_paths[0], use_index=True).recv_match("GPS")) == expected
+
+
+def test_session_keeps_workers_warm(log_paths: List[str], subtests: Any) -> None:
+    with ParserSession(log_paths[:1], max_workers=1) as session:
+        parser = session.open(log_paths[0])
+
+        with subtests.test("Parser cached per file"):
+            assert session.open(log_paths[0]) is parser
+
+        with subtests.test("Schema installed by the initializer"):
+            pid, schemas, _ = session.executor.submit(_worker_state).result()
+            key, raw = session.schema_args(parser._fmt_cache_raw())
+            assert raw is None
+            assert schemas == [key]
+
+        list(parser.recv_match())
+        list(parser.recv_match("GPS"))
+
+        with subtests.test("Same worker, mmap cached"):
+            pid_after, _, mmaps = session.executor.submit(_worker_state).result()
+            assert pid_after == pid
+            assert mmaps == [parser.path]
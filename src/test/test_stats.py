@@ -0,0 +1,126 @@
+import json
+from collections import Counter
+from typing import Any, Callable, Dict
+
+import pytest
+
+from business_logic.multi_processing import ParserMultiprocessing
+from business_logic.parser_sync import ParserSync
+from business_logic.stats import ParseStats
+from business_logic.thread_parser import ParserThreadPool
+from config import START_SYNC_MARKER
+from synthetic_log import MESSAGE_DEFS, build_log, struct_for
+
+COUNTS = {"IMU": 300, "GPS": 60, "BAT": 30, "MSG": 10}
+JUNK = b"junk" * 5  # no marker inside
+
+
+@pytest.fixture
+def corrupt_log(tmp_path: Any) -> Dict[str, Any]:
+    """A log with one run of junk bytes spliced in between two frames."""
+    data = build_log(COUNTS)
+    cut = data.find(START_SYNC_MARKER, len(data) // 2)
+    path = tmp_path / "stats.bin"
+    path.write_bytes(data[:cut] + JUNK + data[cut:])
+    return {"path": str(path), "junk": [cut, cut + len(JUNK)]}
+
+
+PARSERS: Dict[str, Callable[..., Any]] = {
+    "sync": lambda path, **kw: ParserSync(path, **kw),
+    "threads": lambda path, **kw: ParserThreadPool(path, block_size=4096, max_workers=2, **kw),
+    "processes": lambda path, **kw: ParserMultiprocessing(path, block_size=4096, max_workers=2, **kw),
+}
+
+
+def _frame_length(name: str) -> int:
+    return 3 + struct_for(MESSAGE_DEFS[name][1]).size
+
+
+def test_stats_per_backend(corrupt_log: Dict[str, Any], subtests: Any) -> None:
+    for name, make in PARSERS.items():
+        with subtests.test(name):
+            parser = make(corrupt_log["path"], stats=True)
+            messages = list(parser.recv_match())
+            stats = parser.stats.to_dict()
+
+            assert stats["types"] == {
+                typ: {"count": n, "bytes": n * (89 if typ == "FMT" else _frame_length(typ))}
+                for typ, n in Counter(m["mavpackettype"] for m in messages).items()
+            }
+            assert stats["messages"] == len(messages)
+            assert stats["resyncs"] == 1
+            assert stats["skipped_bytes"] == len(JUNK)
+            assert stats["skipped_ranges"] == [corrupt_log["junk"]]
+            assert stats["timings"]["search"] > 0 and stats["timings"]["decode"] > 0
+            assert stats["timings"]["total"] > 0
+            if name != "sync":
+                assert stats["timings"]["ipc_wait"] > 0
+
+    with subtests.test("Filtered read counts the frames walked past"):
+        # IMU is most of the log: walked, not searched directly
+        parser = ParserSync(corrupt_log["path"], stats=True)
+        assert len(list(parser.recv_match("IMU"))) == COUNTS["IMU"]
+        assert parser.stats.counts == {"IMU": COUNTS["IMU"]}
+        assert parser.stats.filtered == sum(COUNTS.values()) - COUNTS["IMU"] + len(COUNTS) + 1  # + FMT records
+
+    with subtests.test("Indexed read"):
+        parser = ParserThreadPool(corrupt_log["path"], use_index=True, stats=True)
+        assert len(list(parser.recv_match("GPS"))) == COUNTS["GPS"]
+        assert parser.stats.counts == {"GPS": COUNTS["GPS"]}
+        assert parser.stats.skipped_bytes == 0
+
+    with subtests.test("shm transport: counts and waits measured in the parent"):
+        parser = ParserMultiprocessing(corrupt_log["path"], transport="shm", block_size=4096, max_workers=2, stats=True)
+        messages = list(parser.recv_match())
+        assert parser.stats.counts == dict(Counter(m["mavpackettype"] for m in messages))
+        assert parser.stats.timings["ipc_wait"] > 0
+
+
+def test_stats_disabled_and_accumulated(corrupt_log: Dict[str, Any], subtests: Any) -> None:
+    with subtests.test("Off by default"):
+        parser = ParserSync(corrupt_log["path"])
+        assert parser.stats is None
+        assert len(list(parser.recv_match("GPS"))) == COUNTS["GPS"]
+
+    with subtests.test("Same messages with and without stats"):
+        assert list(ParserSync(corrupt_log["path"], stats=True).recv_match()) == list(
+            ParserSync(corrupt_log["path"]).recv_match()
+        )
+
+    with subtests.test("Calls accumulate until reset"):
+        parser = ParserSync(corrupt_log["path"], stats=True)
+        list(parser.recv_match("GPS"))
+        list(parser.recv_match("GPS"))
+        assert parser.stats.counts == {"GPS": 2 * COUNTS["GPS"]}
+        parser.stats.reset()
+        assert parser.stats.to_dict()["messages"] == 0
+
+
+def test_parse_stats_merge_and_json(subtests: Any) -> None:
+    a = ParseStats()
+    a.message("GPS", 40)
+    a.skip(10, 12)
+    a.skip(12, 15)  # continues the same resync
+    b = ParseStats()
+    b.message("GPS", 40)
+    b.message("IMU", 50)
+    b.skip(100, 101)
+    b.unknown_types[200] = 2
+
+    with subtests.test("Adjacent skips form one resync"):
+        assert a.resyncs == 1 and a.skipped_ranges == [[10, 15]]
+
+    with subtests.test("Merge of an object and of its JSON"):
+        merged = ParseStats()
+        merged.merge(a)
+        merged.merge(json.loads(b.to_json()))
+        assert merged.counts == {"GPS": 2, "IMU": 1}
+        assert merged.bytes == {"GPS": 80, "IMU": 50}
+        assert merged.resyncs == 2 and merged.skipped_bytes == 6
+        assert merged.skipped_ranges == [[10, 15], [100, 101]]
+        assert merged.unknown_types == {200: 2}
+
+    with subtests.test("JSON export"):
+        exported = json.loads(a.to_json())
+        assert exported["types"] == {"GPS": {"count": 1, "bytes": 40}}
+        assert set(exported["timings"]) == {"search", "unpack", "decode", "ipc_wait", "total"}
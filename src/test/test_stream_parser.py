@@ -0,0 +1,99 @@
+import gzip
+import io
+import lzma
+import threading
+from typing import Any, Dict, List
+
+import pytest
+
+from business_logic.engine import open_parser
+from business_logic.parser_sync import ParserSync
+from business_logic.stream_parser import ParserStream, zstandard
+from synthetic_log import generate_log, write_log
+
+COUNTS = {"IMU": 300, "GPS": 60, "MSG": 10, "ISBD": 10, "RAWD": 5}
+
+
+def _plain(msg: Dict[str, Any]) -> Dict[str, Any]:
+    """Views/arrays → lists, so mapped and streamed output compare."""
+    return {k: (v if isinstance(v, (int, float, str)) else list(v)) for k, v in msg.items()}
+
+
+def _compress(path: str, kind: str) -> str:
+    with open(path, "rb") as f:
+        data = f.read()
+    if kind == "gz":
+        out = gzip.compress(data)
+    elif kind == "xz":
+        out = lzma.compress(data)
+    else:
+        out = zstandard.ZstdCompressor().compress(data)
+    with open(f"{path}.{kind}", "wb") as f:
+        f.write(out)
+    return f"{path}.{kind}"
+
+
+@pytest.fixture
+def log_path(tmp_path: Any) -> str:
+    return write_log(str(tmp_path / "stream.bin"), COUNTS)
+
+
+def test_stream_matches_mapped_parser(log_path: str, subtests: Any) -> None:
+    expected = [_plain(m) for m in ParserSync(log_path).recv_match()]
+
+    for kind in ("bin", "gz", "xz", "zst"):
+        with subtests.test(kind):
+            if kind == "zst" and zstandard is None:
+                pytest.skip("zstandard not installed")
+            path = log_path if kind == "bin" else _compress(log_path, kind)
+            # Chunks that never line up with frame boundaries
+            parser = ParserStream(path, chunk_size=37, queue_depth=2)
+            assert [_plain(m) for m in parser.recv_match()] == expected
+            assert parser.bytes_read == len(open(log_path, "rb").read())
+
+    with subtests.test("File object"):
+        with open(_compress(log_path, "gz"), "rb") as f:
+            parser = ParserStream(io.BytesIO(f.read()), chunk_size=1000)
+        assert [_plain(m) for m in parser.recv_match()] == expected
+
+    with subtests.test("Records"):
+        records = list(ParserStream(log_path, chunk_size=100, records=True).recv_match())
+        assert [_plain(r.to_dict()) for r in records] == expected
+
+
+def test_stream_filters(log_path: str, subtests: Any) -> None:
+    mapped = ParserSync(log_path)
+    gz = _compress(log_path, "gz")
+
+    with subtests.test("Type filter"):
+        assert list(ParserStream(gz, chunk_size=500).recv_match("GPS")) == list(mapped.recv_match("GPS"))
+
+    with subtests.test("Time window"):
+        window = (1_200_000, 1_400_000)
+        got = list(ParserStream(gz, chunk_size=500).recv_match("IMU", *window))
+        assert got and got == list(mapped.recv_match("IMU", *window))
+
+    with subtests.test("Corrupt log resyncs like the mapped parser"):
+        path = log_path + ".corrupt"
+        generate_log(path, 200_000, corruption=0.01, seed=3)
+        expected = [_plain(m) for m in ParserSync(path).recv_match()]
+        assert [_plain(m) for m in ParserStream(_compress(path, "xz"), chunk_size=4096).recv_match()] == expected
+
+
+def test_stream_lifecycle(log_path: str, subtests: Any) -> None:
+    with subtests.test("Read once"):
+        parser = ParserStream(log_path)
+        list(parser.recv_match())
+        with pytest.raises(ValueError):
+            list(parser.recv_match())
+
+    with subtests.test("Stopping early stops the reader thread"):
+        before = threading.active_count()
+        messages = ParserStream(_compress(log_path, "gz"), chunk_size=64, queue_depth=1).recv_match()
+        got: List[Any] = [next(messages) for _ in range(5)]
+        messages.close()
+        assert len(got) == 5 and threading.active_count() == before
+
+    with subtests.test("open_parser streams compressed logs"):
+        assert isinstance(open_parser(_compress(log_path, "gz")), ParserStream)
+        assert isinstance(open_parser(log_path), ParserSync)
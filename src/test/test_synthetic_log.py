@@ -0,0 +1,54 @@
+import os
+from collections import Counter
+from typing import Any
+
+from benchmark import resource, run_backend
+from business_logic.parser_sync import ParserSync
+from business_logic.thread_parser import ParserThreadPool
+from synthetic_log import generate_log
+
+
+def _counts(parser: Any) -> Counter:
+    counts = Counter(m["mavpackettype"] for m in parser.recv_match())
+    del counts["FMT"]
+    return counts
+
+
+def test_generate_log(tmp_path: Any, subtests: Any) -> None:
+    path = str(tmp_path / "gen.bin")
+    expected = generate_log(path, 200_000, mix={"IMU": 9, "GPS": 1}, seed=3)
+
+    with subtests.test("Size and mix"):
+        assert 200_000 <= os.path.getsize(path) < 260_000
+        assert set(expected) == {"IMU", "GPS"}
+        assert 6 < expected["IMU"] / expected["GPS"] < 13
+
+    with subtests.test("Parsers read back every message"):
+        assert _counts(ParserSync(path)) == expected
+
+    with subtests.test("Deterministic per seed"):
+        again = str(tmp_path / "again.bin")
+        generate_log(again, 200_000, mix={"IMU": 9, "GPS": 1}, seed=3)
+        with open(path, "rb") as a, open(again, "rb") as b:
+            assert a.read() == b.read()
+
+
+def test_corrupted_log_recovery(tmp_path: Any, subtests: Any) -> None:
+    path = str(tmp_path / "corrupt.bin")
+    expected = generate_log(path, 300_000, corruption=0.05, seed=7)
+
+    for parser_cls in (ParserSync, ParserThreadPool):
+        with subtests.test(parser_cls.__name__):
+            assert _counts(parser_cls(path)) == expected
+
+
+def test_benchmark_backend_report(tmp_path: Any) -> None:
+    path = str(tmp_path / "bench.bin")
+    expected = generate_log(path, 100_000, seed=1)
+
+    result = run_backend("sync", path, "GPS")
+    assert result["messages"] == expected["GPS"]
+    assert result["mb_per_s"] > 0
+    if resource is not None:
+        assert result["peak_rss_mb"] > 0
+    assert 0 < result["ttfm_s"] <= result["seconds"]
@@ -0,0 +1,107 @@
+import os
+from typing import Any, Dict, List
+
+import pytest
+
+from business_logic.multi_processing import ParserMultiprocessing
+from business_logic.parser_sync import ParserSync
+from business_logic.thread_parser import ParserThreadPool
+from business_logic.time_window import TimeSeeker, offsets_window
+from synthetic_log import MESSAGE_DEFS, build_log, header, msg_frame, sample_values, write_log
+
+START_US = 40_000_000
+END_US = 55_000_000
+
+
+def _brute_force(path: str, msg_name: str | None) -> List[Dict[str, Any]]:
+    return [
+        m
+        for m in ParserSync(path).recv_match(msg_name)
+        if "TimeUS" in m and START_US <= m["TimeUS"] < END_US
+    ]
+
+
+@pytest.fixture(scope="module")
+def log_path(tmp_path_factory: Any) -> str:
+    path = tmp_path_factory.mktemp("window") / "window.bin"
+    return write_log(str(path), {"IMU": 30000, "GPS": 3000, "MSG": 50}, pattern=["IMU"] * 10 + ["GPS", "MSG"])
+
+
+def test_window_matches_brute_force(log_path: str, subtests: Any) -> None:
+    parsers = {
+        "sync": lambda **kw: ParserSync(log_path, **kw),
+        "threads": lambda **kw: ParserThreadPool(log_path, block_size=64 * 1024, max_workers=2, **kw),
+        "processes": lambda **kw: ParserMultiprocessing(log_path, block_size=64 * 1024, max_workers=2, **kw),
+    }
+    for name, make in parsers.items():
+        for use_index in (False, True):
+            parser = make(use_index=use_index)
+            for msg_name in (None, "GPS"):
+                with subtests.test(f"{name} index={use_index} {msg_name}"):
+                    expected = _brute_force(log_path, msg_name)
+                    assert expected
+                    assert list(parser.recv_match(msg_name, start_us=START_US, end_us=END_US)) == expected
+                    assert 0 < parser.window_stats["bytes_touched"] < os.path.getsize(log_path) // 3
+
+
+def test_window_edges(log_path: str, subtests: Any) -> None:
+    parser = ParserSync(log_path)
+
+    with subtests.test("Open-ended windows"):
+        tail = list(parser.recv_match("GPS", start_us=END_US))
+        head = list(parser.recv_match("GPS", end_us=START_US))
+        assert len(head) + len(_brute_force(log_path, "GPS")) + len(tail) == len(list(parser.recv_match("GPS")))
+
+    with subtests.test("Window outside the log"):
+        assert list(parser.recv_match(start_us=10**12)) == []
+        assert list(parser.recv_match(end_us=0)) == []
+
+    with subtests.test("Types without TimeUS never match"):
+        assert list(parser.recv_match("FMT", start_us=0, end_us=10**12)) == []
+
+    with subtests.test("Checkpoints are reused by later queries"):
+        list(parser.recv_match("GPS", start_us=START_US, end_us=END_US))
+        list(parser.recv_match("GPS", start_us=START_US, end_us=END_US))
+        assert parser.window_stats["probes"] == 0
+
+
+def test_seeker_resyncs_past_garbage(tmp_path: Any) -> None:
+    clean = build_log({"IMU": 5000})
+    cut = len(clean) // 2
+    # Garbage holding marker bytes in the middle of the log
+    data = clean[:cut] + b"\xa3\x95\x0a\x00\xa3\x95" * 100 + clean[cut:]
+    path = tmp_path / "garbage.bin"
+    path.write_bytes(data)
+
+    seeker = TimeSeeker(ParserSync(str(path))._fmt_cache, granularity=256)
+    for target in (1_000_000, 5_000_000, 7_000_000, 13_000_000):
+        lo, hi = seeker.bounds(data, target)
+        assert hi - lo <= 256
+        frame = seeker.frame_after(data, lo)
+        assert frame is not None and (frame[1] < target or lo == 0)
+
+
+def test_offsets_window_across_types(subtests: Any) -> None:
+    # GPS frames are logged late: in file order their TimeUS lags the IMU frames around them by 40 ms
+    frames, offsets, times = [], [], []
+    pos = len(header(["IMU", "GPS"]))
+    for i in range(2000):
+        name, time_us = ("GPS", 1_000_000 + i * 2_500 - 40_000) if i % 10 == 9 else ("IMU", 1_000_000 + i * 2_500)
+        typ, fmt_chars, _ = MESSAGE_DEFS[name]
+        frames.append(msg_frame(typ, fmt_chars, sample_values(name, i, time_us)))
+        offsets.append(pos)
+        times.append(time_us)
+        pos += len(frames[-1])
+    buf = header(["IMU", "GPS"]) + b"".join(frames)
+
+    for start_us, end_us in ((2_000_000, 4_000_000), (None, 2_001_000), (3_990_000, None), (2_000_000, 2_010_000)):
+        with subtests.test(f"[{start_us}, {end_us})"):
+            expected = [
+                pos
+                for pos, time_us in zip(offsets, times)
+                if (start_us is None or time_us >= start_us) and (end_us is None or time_us < end_us)
+            ]
+            got, touched = offsets_window(buf, offsets, start_us, end_us, slack_us=50_000)
+            assert list(got) == expected
+            if start_us == 2_000_000 and end_us == 4_000_000:
+                assert touched < len(offsets) * 8 // 2  # only the edges are read frame by frame
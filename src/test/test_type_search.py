@@ -0,0 +1,121 @@
+from typing import Any, Dict, List
+
+import pytest
+
+from business_logic.columnar import frame_lengths
+from business_logic.multi_processing import ParserMultiprocessing
+from business_logic.parser_sync import ParserSync
+from business_logic.stream_parser import ParserStream
+from business_logic.thread_parser import ParserThreadPool
+from business_logic.type_search import iter_type_hits, prefer_direct_search, resolve_types
+from config import START_SYNC_MARKER
+from synthetic_log import MESSAGE_DEFS, generate_log, header, msg_frame, sample_values, write_log
+
+COUNTS = {"IMU": 600, "GPS": 40, "MODE": 5, "MSG": 10, "RAWD": 20}
+
+
+def _walked(path: str, names: List[str]) -> List[Dict[str, Any]]:
+    """Reference: the unfiltered sync walk, filtered afterwards."""
+    return [m for m in ParserSync(path).recv_match() if m["mavpackettype"] in names]
+
+
+@pytest.fixture
+def log_path(tmp_path: Any) -> str:
+    return write_log(str(tmp_path / "types.bin"), COUNTS)
+
+
+def test_selectivity_heuristic(log_path: str, subtests: Any) -> None:
+    parser = ParserSync(log_path)
+    lengths = frame_lengths(parser._fmt_cache)
+
+    with subtests.test("Rare types are searched directly"):
+        assert prefer_direct_search(parser._mm, resolve_types(parser._fmt_cache, ["MODE", "GPS"]), lengths)
+
+    with subtests.test("Dense types are walked"):
+        assert not prefer_direct_search(parser._mm, resolve_types(parser._fmt_cache, "IMU"), lengths)
+        assert not prefer_direct_search(parser._mm, None, lengths)
+
+    with subtests.test("Name resolution"):
+        assert resolve_types(parser._fmt_cache, None) is None
+        assert resolve_types(parser._fmt_cache, "GPS") == {MESSAGE_DEFS["GPS"][0]}
+        assert resolve_types(parser._fmt_cache, ["GPS", "NOPE"]) == {MESSAGE_DEFS["GPS"][0]}
+
+
+def test_direct_search_skips_payload_markers(subtests: Any) -> None:
+    rawd_type, rawd_fmt, _ = MESSAGE_DEFS["RAWD"]
+    mode_type, mode_fmt, _ = MESSAGE_DEFS["MODE"]
+    # RAWD payloads full of marker + MODE type bytes: phantom MODE frames
+    phantom = (START_SYNC_MARKER + bytes([mode_type])) * 21 + b"\x00"
+    body = []
+    for i in range(50):
+        body.append(msg_frame(rawd_type, rawd_fmt, (1000 + i, 64, phantom)))
+        if i % 10 == 0:
+            body.append(msg_frame(mode_type, mode_fmt, sample_values("MODE", i, 1000 + i)))
+    data = header(["RAWD", "MODE"]) + b"".join(body)
+    lengths = {rawd_type: len(body[0]), mode_type: len(body[1])}
+
+    with subtests.test("Only real frames are hits"):
+        hits = list(iter_type_hits(data, 0, len(data), frozenset([mode_type]), lengths))
+        assert [data[pos : pos + lengths[mode_type]] for pos in hits] == body[1::11]
+
+    with subtests.test("Hits are bounded by the range"):
+        first = data.index(body[1])
+        assert list(iter_type_hits(data, first + 1, len(data), frozenset([mode_type]), lengths))[0] > first
+
+
+def test_multi_type_filters_match_walk(log_path: str, subtests: Any) -> None:
+    parsers = {
+        "sync": lambda **kw: ParserSync(log_path, **kw),
+        "threads": lambda **kw: ParserThreadPool(log_path, block_size=4096, max_workers=2, **kw),
+        "processes": lambda **kw: ParserMultiprocessing(log_path, block_size=4096, max_workers=2, **kw),
+        "shm": lambda **kw: ParserMultiprocessing(log_path, transport="shm", block_size=4096, max_workers=2, **kw),
+    }
+    # Direct search (rare types) and walk (IMU dominates) both covered
+    for names in (["MODE"], ["GPS", "MODE"], ["IMU", "MSG"]):
+        expected = _walked(log_path, names)
+        for name, make in parsers.items():
+            for use_index in (False, True):
+                with subtests.test(f"{name} index={use_index} {names}"):
+                    assert list(make(use_index=use_index).recv_match(names)) == expected
+
+        with subtests.test(f"stream {names}"):
+            assert list(ParserStream(log_path, chunk_size=999).recv_match(names)) == expected
+
+    with subtests.test("Time window with several types"):
+        window = (1_100_000, 1_300_000)
+        expected = list(ParserSync(log_path).recv_match("GPS", *window))
+        expected += list(ParserSync(log_path).recv_match("MODE", *window))
+        got = list(ParserMultiprocessing(log_path, max_workers=2).recv_match({"GPS", "MODE"}, *window))
+        assert sorted(got, key=lambda m: m["TimeUS"]) == sorted(expected, key=lambda m: m["TimeUS"])
+
+    with subtests.test("Unknown names yield nothing"):
+        assert list(ParserSync(log_path).recv_match("NOPE")) == []
+        assert list(ParserThreadPool(log_path).recv_match(["NOPE"])) == []
+
+
+def test_direct_search_on_corrupt_log(tmp_path: Any, subtests: Any) -> None:
+    path = str(tmp_path / "corrupt.bin")
+    generate_log(path, 1_000_000, corruption=0.02, seed=11)
+    parsers = {
+        "sync": lambda **kw: ParserSync(path, **kw),
+        "threads": lambda **kw: ParserThreadPool(path, block_size=64 * 1024, max_workers=2, **kw),
+        "processes": lambda **kw: ParserMultiprocessing(path, block_size=64 * 1024, max_workers=2, **kw),
+        "shm": lambda **kw: ParserMultiprocessing(path, transport="shm", block_size=64 * 1024, max_workers=2, **kw),
+        "records": lambda **kw: ParserMultiprocessing(path, records=True, block_size=64 * 1024, max_workers=2, **kw),
+    }
+    lengths = frame_lengths(ParserSync(path)._fmt_cache)
+    for names in (["GPS"], ["MODE", "MSG"]):
+        expected = _walked(path, names)
+        with open(path, "rb") as f:
+            assert prefer_direct_search(f.read(), resolve_types(ParserSync(path)._fmt_cache, names), lengths)
+        for name, make in parsers.items():
+            with subtests.test(f"{name} {names}"):
+                # A wanted frame directly followed by corrupt bytes fails the chain check: it is walked to
+                got = list(make().recv_match(names))
+                assert [m if isinstance(m, dict) else m.to_dict() for m in got] == expected
+
+    for name in ("sync", "threads", "processes"):
+        with subtests.test(f"{name} stats"):
+            parser = parsers[name](stats=True)
+            list(parser.recv_match("GPS"))
+            assert parser.stats.resyncs > 0 and parser.stats.timings["search"] > 0